@@ -0,0 +1,16 @@
+"""
+Celery application for app project.
+
+Workers are started with ``celery -A app worker`` and the periodic tasks
+with ``celery -A app beat``.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+app = Celery('app')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
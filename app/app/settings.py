@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 from pathlib import Path
+from celery.schedules import crontab
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'core',
     'home',
@@ -49,10 +51,18 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.RoleMiddleware',
+    'core.middleware.ShardMiddleware',
+    'core.middleware.AuditActorMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# database queries per response, read by the load tests (core.loadtest)
+if os.environ.get('QUERY_COUNT_HEADER') == '1':
+    MIDDLEWARE.insert(0, 'core.middleware.QueryCountMiddleware')
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -79,7 +89,8 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # PostgreSQL writing the audit history as transactions commit
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
@@ -87,6 +98,38 @@ DATABASES = {
     }
 }
 
+# Read replicas: comma separated hosts streaming from the primary, used
+# for the reporting reads (core.replicas)
+for number, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Owner shards: comma separated [host/]database entries, each holding the
+# scheduling data of the owners the directory places there (core.sharding)
+for number, entry in enumerate(
+        filter(None, os.environ.get('DB_SHARDS', '').split(',')), 1):
+    host, _, name = entry.strip().rpartition('/')
+    DATABASES[f'shard{number}'] = {
+        **DATABASES['default'],
+        'HOST': host or DATABASES['default']['HOST'],
+        'NAME': name,
+    }
+
+DATABASE_ROUTERS = [
+    'core.sharding.ShardRouter',
+    'core.replicas.ReplicaRouter',
+]
+REPLICA_MAX_LAG_SECONDS = 10
+REPLICA_LAG_CHECK_SECONDS = 5
+REPLICA_STICKY_SECONDS = 30
+# apps whose writes pin the client to the primary; sessions, admin log
+# entries and the other framework tables are never read on a replica
+REPLICA_PIN_APPS = ['core']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -124,6 +167,22 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    # printable rosters, named by the hash of their content
+    'rosters': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {
+            'location': os.environ.get('ROSTER_ROOT', '/vol/rosters'),
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -133,3 +192,135 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Shared by the web processes and the workers: a refresh or invalidation
+# written by one process has to reach the others. locmem:// keeps a cache
+# per process, for single process runs outside docker compose only.
+
+CACHE_URL = os.environ.get('CACHE_URL', 'redis://redis:6379/1')
+if CACHE_URL.startswith('locmem://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+
+
+# Celery
+# https://docs.celeryq.dev/en/stable/django/first-steps-with-django.html
+
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://redis:6379/0')
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER') == '1'
+# rosters are rendered by their own worker pool, see docker-compose.yml
+CELERY_TASK_ROUTES = {
+    'core.tasks.render_owner_rosters': {'queue': 'rosters'},
+}
+CELERY_BEAT_SCHEDULE = {
+    'send-shift-digests': {
+        'task': 'core.tasks.send_shift_digests',
+        'schedule': 60.0,
+    },
+    'materialize-shift-templates': {
+        'task': 'core.tasks.materialize_shift_templates',
+        'schedule': 3600.0,
+    },
+    'forecast-staffing-demand': {
+        'task': 'core.tasks.forecast_staffing_demand',
+        'schedule': 7 * 24 * 3600.0,
+    },
+    'render-rosters': {
+        'task': 'core.tasks.render_rosters',
+        'schedule': crontab(hour=4, minute=0, day_of_week='mon'),
+    },
+    'reconcile-attendance': {
+        'task': 'core.tasks.reconcile_attendance',
+        'schedule': 60.0,
+    },
+}
+
+# Email
+
+EMAIL_BACKEND = os.environ.get(
+    'EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@smdonline.it')
+
+# Shift change notifications: an owner's changes are sent once they have
+# been quiet for the debounce window, or at the latest after max wait
+SHIFT_DIGEST_DEBOUNCE = 300
+SHIFT_DIGEST_MAX_WAIT = 1800
+SHIFT_DIGEST_BATCH_SIZE = 100
+
+# Recurring shift templates are written as shifts this many days ahead
+SHIFT_TEMPLATE_WINDOW_DAYS = 14
+
+# Payroll: local time zone of the premium windows and night work hours
+PAYROLL_TIME_ZONE = 'Europe/Rome'
+PAYROLL_NIGHT_START = 22
+PAYROLL_NIGHT_END = 6
+
+# Recurring shift templates: local time zone of their start and end times
+SHIFT_TEMPLATE_TIME_ZONE = PAYROLL_TIME_ZONE
+
+# Working time rules checked by core.labor_rules
+LABOR_MIN_DAILY_REST_HOURS = 11
+LABOR_MIN_WEEKLY_REST_HOURS = 24
+LABOR_MAX_WEEKLY_HOURS = 48
+
+# Owner dashboard: how long figures are kept and how long a queued
+# refresh holds off the next one, should its task be lost
+DASHBOARD_CACHE_TTL = 3600
+DASHBOARD_QUEUED_TTL = 300
+DASHBOARD_EXPIRING_DAYS = 30
+
+# Staffing demand: local time buckets, days of shifts the forecast learns
+# from and days ahead checked by the gap analysis
+STAFFING_TIME_ZONE = PAYROLL_TIME_ZONE
+STAFFING_BUCKET_MINUTES = 30
+STAFFING_HISTORY_DAYS = 364
+STAFFING_HORIZON_DAYS = 14
+
+# Printable rosters: weeks rendered ahead by the Monday bulk run
+ROSTER_WEEKS_AHEAD = 2
+
+# Owner purge: ids deleted per transaction, longest wait for a row lock
+# and attempts of a batch that timed out
+PURGE_BATCH_SIZE = 1000
+PURGE_LOCK_TIMEOUT_MS = 2000
+PURGE_RETRIES = 3
+
+# Parquet export for analytics: target directory and rows per record batch
+EXPORT_ROOT = os.environ.get('EXPORT_ROOT', '/vol/exports')
+EXPORT_CHUNK_ROWS = 50000
+
+# Longest django.setup() of a fresh process, guarded by the test suite
+STARTUP_BUDGET_SECONDS = 1.5
+
+# Owner sharding: how long a process trusts its copy of the directory,
+# rows copied per batch when moving an owner and the ids each shard hands
+# out, shard n starting at n * SHARD_ID_SPAN
+SHARD_DIRECTORY_SECONDS = 5
+SHARD_BATCH_SIZE = 1000
+SHARD_ID_SPAN = 10 ** 12
+
+# Attendance: events buffered per process before one bulk write and the
+# longest they wait, most events held while the database cannot take
+# them, most events of one request, minutes around a shift an event still
+# belongs to it, minutes after its end a shift without events counts as
+# an absence and events reconciled per owner and run
+ATTENDANCE_BATCH_SIZE = 500
+ATTENDANCE_FLUSH_SECONDS = 2
+ATTENDANCE_MAX_BUFFERED = 50000
+ATTENDANCE_MAX_EVENTS = 1000
+ATTENDANCE_MATCH_MINUTES = 120
+ATTENDANCE_ABSENT_AFTER_MINUTES = 30
+ATTENDANCE_RECONCILE_BATCH = 10000
@@ -2,16 +2,25 @@
 """
 Django admin costumisation
 """
-from django.contrib import admin
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from core import models
-from django.utils.translation import gettext_lazy as _
+from django.core.exceptions import ValidationError
+from django.template.response import TemplateResponse
+from core import models, sharding
+from django.utils.translation import gettext_lazy as _, ngettext
+from django.utils import timezone
 
 
 class UserAdmin(BaseUserAdmin):
     """Define the admin pages for users"""
     ordering = ['id']
     list_display = ['email', 'completion_percentage']
+    search_fields = models.USER_SEARCH_FIELDS
     fieldsets = (
         (None, {"fields": ('email', 'password')}),
 
@@ -70,10 +79,282 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+def _owned(model):
+    """whether the rows of a model belong to an owner"""
+    return any(field.name == 'owner' for field in model._meta.fields)
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """List the rows of one shard, default until another is chosen"""
+    title = _('shard')
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        aliases = sharding.shards()
+        return [(alias, alias) for alias in aliases] if len(aliases) > 1 \
+            else []
+
+    def choices(self, changelist):
+        # no choice of every shard: the changelist reads one database
+        choices = list(super().choices(changelist))[1:]
+        if self.value() is None and choices:
+            choices[0]['selected'] = True
+        return choices
+
+    def queryset(self, request, queryset):
+        if self.value() in sharding.shards():
+            return queryset.using(self.value())
+        return queryset
+
+
+class OwnerScopedAdmin(admin.ModelAdmin):
+    """Limit staff owners to their own rows, and to their own rows as the
+    choices of every relation; superusers see every owner, one shard at a
+    time"""
+
+    def has_module_permission(self, request):
+        return super().has_module_permission(request) and (
+            request.user.is_superuser or request.role.is_owner
+        )
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.user.is_superuser:
+            return queryset
+        return queryset.filter(owner_id=request.role.owner_id)
+
+    def get_list_filter(self, request):
+        filters = super().get_list_filter(request)
+        if request.user.is_superuser:
+            return [ShardFilter, *filters]
+        return filters
+
+    def _on_shard(self, request, object_id):
+        """run a superuser's view of a row on the shard holding it; staff
+        owners' views already run on the shard of their owner"""
+        if request.user.is_superuser and object_id is not None:
+            for alias in sharding.placed():
+                try:
+                    owner_id = self.model._base_manager.using(
+                        alias).filter(pk=object_id).values_list(
+                        'owner_id', flat=True).first()
+                except (ValueError, ValidationError):
+                    break
+                if owner_id is not None:
+                    return sharding.for_owner(owner_id)
+        return nullcontext()
+
+    def changeform_view(self, request, object_id=None, form_url='',
+                        extra_context=None):
+        with self._on_shard(request, object_id):
+            return super().changeform_view(
+                request, object_id, form_url, extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        with self._on_shard(request, object_id):
+            return super().delete_view(request, object_id, extra_context)
+
+    def get_search_results(self, request, queryset, search_term):
+        # the autocomplete of the relations of other admins searches here
+        if not request.user.is_superuser:
+            queryset = queryset.filter(owner_id=request.role.owner_id)
+        return super().get_search_results(request, queryset, search_term)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        related = db_field.related_model
+        if request.user.is_superuser:
+            pass
+        elif related is models.Owner:
+            kwargs['queryset'] = models.Owner.objects.filter(
+                pk=request.role.owner_id)
+        elif _owned(related):
+            kwargs['queryset'] = related._default_manager.filter(
+                owner_id=request.role.owner_id)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class ActiveTodayFilter(admin.SimpleListFilter):
+    """Filter employees on their activity period"""
+    title = _('active today')
+    parameter_name = 'active_today'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('yes', _('Yes')),
+            ('no', _('No')),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        active = queryset.active_on(None, timezone.localdate())
+        if self.value() == 'yes':
+            return active
+        return queryset.exclude(pk__in=active.values('pk'))
+
+
+class EmployeeAdmin(OwnerScopedAdmin):
+    """Define the admin pages for employees"""
+    list_display = ['__str__', 'owner', 'startDate', 'endDate']
+    list_filter = [ActiveTodayFilter]
+    list_select_related = ['user', 'owner__user']
+    # the autocomplete of the shift pages paginates on it
+    ordering = ['user__last_name', 'user__first_name', 'pk']
+    search_fields = [
+        f'user__{field}' for field in models.USER_SEARCH_FIELDS
+    ]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'user', 'owner__user'
+        ).defer(
+            *models.user_detail_fields('user__'),
+            *models.user_detail_fields('owner__user__')
+        )
+
+
+class TaskAdmin(OwnerScopedAdmin):
+    """Define the admin pages for tasks"""
+    list_display = ['name', 'owner']
+    list_select_related = ['owner__user']
+    search_fields = ['name']
+
+
+class ShiftBulkEditForm(forms.Form):
+    """Changes applied together to the selected shifts"""
+    minutes = forms.IntegerField(
+        label=_('move by minutes'), initial=0, required=False)
+    task = forms.ModelChoiceField(
+        models.Task.objects.all(), label=_('task'), required=False)
+    employee = forms.ModelChoiceField(
+        models.Employee.objects.with_user(), label=_('employee'),
+        required=False)
+
+    def __init__(self, *args, owner_id=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if owner_id is not None:
+            for name in ('task', 'employee'):
+                self.fields[name].queryset = self.fields[
+                    name].queryset.filter(owner_id=owner_id)
+
+
+class ShiftAdmin(OwnerScopedAdmin):
+    """Define the admin pages for shifts"""
+    actions = ['edit_selected', 'move_later', 'move_earlier']
+    autocomplete_fields = ['employee', 'task']
+    search_fields = [
+        'employee__user__first_name',
+        'employee__user__last_name',
+        'employee__user__email',
+        'task__name',
+    ]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_names()
+
+    def save_model(self, request, obj, form, change):
+        """save and warn about the working time rules the shift breaks"""
+        # imported here: core.labor_rules pulls in numpy, the admin is
+        # registered at startup
+        from core import labor_rules
+
+        super().save_model(request, obj, form, change)
+        violations = labor_rules.validate(
+            obj.owner,
+            obj.shift_date,
+            obj.shift_date + timedelta(days=1),
+            employees=[obj.employee_id]
+        )
+        for violation in violations:
+            self.message_user(
+                request, f'{obj.employee}: {violation}', messages.WARNING
+            )
+
+    @admin.action(description=_('Edit the selected shifts together'))
+    def edit_selected(self, request, queryset):
+        owner_id = None if request.user.is_superuser \
+            else request.role.owner_id
+        form = ShiftBulkEditForm(
+            request.POST if 'apply' in request.POST else None,
+            owner_id=owner_id)
+        if form.is_valid():
+            self.bulk_edit(
+                request, queryset,
+                minutes=form.cleaned_data['minutes'] or 0,
+                task=form.cleaned_data['task'],
+                employee=form.cleaned_data['employee'])
+            return None
+        return TemplateResponse(request, 'admin/core/shift/bulk_edit.html', {
+            **self.admin_site.each_context(request),
+            'title': _('Edit the selected shifts'),
+            'opts': self.model._meta,
+            'form': form,
+            'shifts': queryset,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+
+    @admin.action(description=_('Move the selected shifts 30 minutes later'))
+    def move_later(self, request, queryset):
+        self.bulk_edit(request, queryset, minutes=30)
+
+    @admin.action(
+        description=_('Move the selected shifts 30 minutes earlier'))
+    def move_earlier(self, request, queryset):
+        self.bulk_edit(request, queryset, minutes=-30)
+
+    def bulk_edit(self, request, queryset, **changes):
+        """apply the changes to every shift or to none, then warn about the
+        working time rules the edited shifts break"""
+        # imported here: both pull in numpy, the admin is registered at
+        # startup
+        from core import bulk_edit, labor_rules
+
+        try:
+            shifts = bulk_edit.edit(queryset, **changes)
+        except ValidationError as error:
+            for message in error.messages:
+                self.message_user(request, message, messages.ERROR)
+            return
+        self.message_user(request, ngettext(
+            '%(count)d shift edited', '%(count)d shifts edited', len(shifts)
+        ) % {'count': len(shifts)}, messages.SUCCESS)
+
+        by_owner = {}
+        for shift in shifts:
+            by_owner.setdefault(shift.owner_id, []).append(shift)
+        for owner_id, owned in by_owner.items():
+            days = [shift.shift_date for shift in owned]
+            for violation in labor_rules.validate(
+                    owner_id, min(days), max(days) + timedelta(days=1),
+                    employees={shift.employee_id for shift in owned}):
+                self.message_user(request, str(violation), messages.WARNING)
+
+
+class ShiftRequestAdmin(OwnerScopedAdmin):
+    """Define the admin pages for cover and swap requests"""
+    list_display = ['__str__', 'kind', 'status', 'requested_by',
+                    'accepted_by', 'created']
+    list_filter = ['status', 'kind']
+    raw_id_fields = ['shift', 'requested_by', 'accepted_by',
+                     'swapped_shift']
+
+
+class AttendanceRecordAdmin(OwnerScopedAdmin):
+    """Define the admin pages for the reconciled attendance"""
+    list_display = ['shift', 'employee', 'shift_date', 'clock_in',
+                    'clock_out', 'late_minutes', 'overtime_minutes', 'absent']
+    list_filter = ['absent', 'shift_date']
+    raw_id_fields = ['shift', 'employee']
+
+
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Owner)
-admin.site.register(models.Contract)
-admin.site.register(models.Task)
-admin.site.register(models.Employee)
-admin.site.register(models.Shift)
-admin.site.register(models.Schedule)
+admin.site.register(models.Contract, OwnerScopedAdmin)
+admin.site.register(models.Task, TaskAdmin)
+admin.site.register(models.Employee, EmployeeAdmin)
+admin.site.register(models.Shift, ShiftAdmin)
+admin.site.register(models.Schedule, OwnerScopedAdmin)
+admin.site.register(models.ShiftTemplate, OwnerScopedAdmin)
+admin.site.register(models.StaffingDemand, OwnerScopedAdmin)
+admin.site.register(models.ShiftRequest, ShiftRequestAdmin)
+admin.site.register(models.AttendanceRecord, AttendanceRecordAdmin)
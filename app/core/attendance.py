@@ -0,0 +1,313 @@
+"""
+    Clock-in ingestion and reconciliation against the planned shifts
+
+Badge readers and the mobile app post clock-in and clock-out events in
+bursts around the shift changes. accept() adds the checked events to a
+buffer of the process, written with one bulk INSERT per shard once it
+holds ATTENDANCE_BATCH_SIZE events or its oldest event is
+ATTENDANCE_FLUSH_SECONDS old, so a burst costs a few statements instead
+of one per event. A batch that cannot be written for a while, the
+database being unreachable, is logged and kept for the next flush, up to
+ATTENDANCE_MAX_BUFFERED events: past that accept() refuses new ones. A
+batch the database rejects is split until the events it refuses, logged
+and dropped, are found. Events are acknowledged once buffered: a process killed
+without running its exit handlers loses at most the last interval of
+events, which the devices send again on their next sync; an event sent
+twice is written once.
+
+reconcile() then matches, per owner, the events past its cursor to the
+shifts of their employees, read by employee and day, and writes the
+attendance record of every shift they touch: first clock-in, last
+clock-out, minutes late and minutes of overtime. Shifts ended more than
+ATTENDANCE_ABSENT_AFTER_MINUTES ago without any event are recorded
+absent. Each run only reads the new events and the shifts they concern.
+The event writers and the reconciliation of an owner are serialized
+until commit, so the events of an owner commit in id order and none is
+committed behind the cursor.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db import DataError, DatabaseError, IntegrityError, \
+    OperationalError, connections, transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core import sharding
+from core.models import AttendanceCursor, AttendanceEvent, \
+    AttendanceRecord, Shift
+
+RECORD_FIELDS = ['clock_in', 'clock_out', 'late_minutes', 'overtime_minutes',
+                 'absent', 'updated']
+# advisory lock namespace serializing the event writers and the
+# reconciliation of an owner
+LOCK_NAMESPACE = 30
+
+logger = logging.getLogger(__name__)
+
+
+def _lock(using, owner_ids):
+    """hold the owners' locks until the end of the transaction"""
+    with connections[using].cursor() as cursor:
+        for owner_id in sorted(owner_ids):
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)',
+                           [LOCK_NAMESPACE, owner_id])
+
+
+def _write(using, events):
+    """insert events of one shard under the locks of their owners"""
+    with transaction.atomic(using=using):
+        _lock(using, {event.owner_id for event in events})
+        AttendanceEvent.objects.using(using).bulk_create(
+            events, batch_size=settings.ATTENDANCE_BATCH_SIZE,
+            ignore_conflicts=True)
+
+
+def _insert(using, events):
+    """write events, halving a batch the database rejects until the
+    refused events are dropped, returns the number written"""
+    try:
+        _write(using, events)
+    except (DataError, IntegrityError):
+        if len(events) > 1:
+            middle = len(events) // 2
+            return _insert(using, events[:middle]) + \
+                _insert(using, events[middle:])
+        [event] = events
+        logger.exception(
+            'attendance event refused on %s, dropped: employee %s %s at %s',
+            using, event.employee_id, event.kind, event.occurred)
+        return 0
+    return len(events)
+
+
+class BufferFull(Exception):
+    """the process holds ATTENDANCE_MAX_BUFFERED events it cannot write"""
+
+
+class _Buffer:
+    """events waiting to be written, shared by the threads of a process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.timer = None
+
+    def _schedule(self):
+        if self.timer is None:
+            self.timer = threading.Timer(
+                settings.ATTENDANCE_FLUSH_SECONDS, self._expire)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def add(self, events):
+        with self.lock:
+            if len(self.events) + len(events) > \
+                    settings.ATTENDANCE_MAX_BUFFERED:
+                raise BufferFull(f'{len(self.events)} events not written')
+            self.events.extend(events)
+            full = len(self.events) >= settings.ATTENDANCE_BATCH_SIZE
+            if not full:
+                self._schedule()
+        if full:
+            self.flush()
+
+    def _expire(self):
+        try:
+            self.flush()
+        finally:
+            # the timer thread opened its own connections
+            connections.close_all()
+
+    def flush(self):
+        with self.lock:
+            events, self.events = self.events, []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        by_alias = defaultdict(list)
+        for event in events:
+            by_alias[sharding.db_for(event.owner_id)].append(event)
+        written = 0
+        for alias, batch in by_alias.items():
+            try:
+                written += _insert(alias, batch)
+            except OperationalError:
+                logger.exception('%d attendance events not written on %s, '
+                                 'kept for the next flush', len(batch), alias)
+                with self.lock:
+                    self.events[:0] = batch
+                    self._schedule()
+            except DatabaseError:
+                logger.exception('%d attendance events not written on %s, '
+                                 'dropped', len(batch), alias)
+        return written
+
+
+_buffer = _Buffer()
+atexit.register(_buffer.flush)
+
+
+def accept(events):
+    """buffer unsaved AttendanceEvent instances, returns how many
+
+    Raises BufferFull while the buffered events cannot be written.
+    """
+    _buffer.add(events)
+    return len(events)
+
+
+def flush():
+    """write the buffered events now, returns how many"""
+    return _buffer.flush()
+
+
+def _match(shifts, kind, occurred, window):
+    """the shift an event belongs to: of those around it, the one
+    starting (clock-in) or ending (clock-out) nearest to it"""
+    edge = 'start_time' if kind == AttendanceEvent.IN else 'end_time'
+    around = [
+        shift for shift in shifts
+        if shift.start_time - window <= occurred <= shift.end_time + window
+    ]
+    return min(around, default=None,
+               key=lambda shift: abs(getattr(shift, edge) - occurred))
+
+
+def _minutes(delta):
+    return max(0, int(delta.total_seconds() // 60))
+
+
+def _record(shift, events):
+    ins = [occurred for kind, occurred in events if kind == AttendanceEvent.IN]
+    outs = [occurred for kind, occurred in events
+            if kind == AttendanceEvent.OUT]
+    clock_in = min(ins, default=None)
+    clock_out = max(outs, default=None)
+    return AttendanceRecord(
+        owner_id=shift.owner_id,
+        shift=shift,
+        employee_id=shift.employee_id,
+        shift_date=shift.shift_date,
+        clock_in=clock_in,
+        clock_out=clock_out,
+        late_minutes=_minutes(clock_in - shift.start_time) if clock_in else 0,
+        overtime_minutes=_minutes(
+            clock_out - shift.end_time) if clock_out else 0,
+        absent=False
+    )
+
+
+def _worked(using, events, window):
+    """records of the shifts the new events concern, from all their
+    events"""
+    days = [occurred.date() for _pk, _employee, _kind, occurred in events]
+    shifts = defaultdict(list)
+    for shift in Shift.objects.using(using).filter(
+            employee_id__in={employee for _pk, employee, *_ in events},
+            shift_date__range=(min(days) - timedelta(days=1),
+                               max(days) + timedelta(days=1))
+    ).only('owner_id', 'employee_id', 'shift_date', 'start_time',
+           'end_time'):
+        shifts[shift.employee_id].append(shift)
+    touched = {
+        _match(shifts[employee], kind, occurred, window)
+        for _pk, employee, kind, occurred in events
+    } - {None}
+    if not touched:
+        return []
+
+    matched = defaultdict(list)
+    for employee, kind, occurred in AttendanceEvent.objects.using(
+            using).filter(
+            employee_id__in={shift.employee_id for shift in touched},
+            occurred__range=(
+                min(shift.start_time for shift in touched) - window,
+                max(shift.end_time for shift in touched) + window)
+    ).values_list('employee_id', 'kind', 'occurred'):
+        shift = _match(shifts[employee], kind, occurred, window)
+        if shift in touched:
+            matched[shift].append((kind, occurred))
+    return [_record(shift, matched[shift]) for shift in touched]
+
+
+def _absent(using, owner_id, after, upto):
+    """absence records of the shifts ended in (after, upto] with no
+    attendance"""
+    return [
+        AttendanceRecord(
+            owner_id=owner_id,
+            shift=shift,
+            employee_id=shift.employee_id,
+            shift_date=shift.shift_date,
+            absent=True
+        )
+        for shift in Shift.objects.using(using).filter(
+            owner_id=owner_id,
+            shift_date__range=(after.date() - timedelta(days=1),
+                               upto.date() + timedelta(days=1)),
+            end_time__gt=after,
+            end_time__lte=upto,
+            attendance__isnull=True
+        ).only('owner_id', 'employee_id', 'shift_date')
+    ]
+
+
+def reconcile(owner_id, now=None):
+    """bring the attendance records of an owner up to date, returns the
+    number of records written
+
+    Reads at most ATTENDANCE_RECONCILE_BATCH new events; absences are
+    only recorded once every pending event has been matched.
+    """
+    now = now or timezone.now()
+    using = sharding.db_for(owner_id)
+    window = timedelta(minutes=settings.ATTENDANCE_MATCH_MINUTES)
+    size = settings.ATTENDANCE_RECONCILE_BATCH
+    with transaction.atomic(using=using):
+        # the events of the owner written before are all committed
+        _lock(using, [owner_id])
+        cursor, _created = AttendanceCursor.objects.using(
+            using).select_for_update().get_or_create(owner_id=owner_id)
+        events = list(AttendanceEvent.objects.using(using).filter(
+            owner_id=owner_id, pk__gt=cursor.last_event
+        ).order_by('pk').values_list(
+            'pk', 'employee_id', 'kind', 'occurred')[:size])
+
+        records = []
+        if events:
+            records = _worked(using, events, window)
+            AttendanceRecord.objects.using(using).bulk_create(
+                records, update_conflicts=True, unique_fields=['shift'],
+                update_fields=RECORD_FIELDS)
+            cursor.last_event = events[-1][0]
+
+        if len(events) < size:
+            upto = now - timedelta(
+                minutes=settings.ATTENDANCE_ABSENT_AFTER_MINUTES)
+            after = cursor.checked_until or upto - timedelta(days=1)
+            if after < upto:
+                absent = _absent(using, owner_id, after, upto)
+                AttendanceRecord.objects.using(using).bulk_create(
+                    absent, ignore_conflicts=True)
+                records += absent
+                cursor.checked_until = upto
+        cursor.save(using=using)
+    return len(records)
+
+
+def pending_owners():
+    """ids of the owners with attendance to reconcile, on every shard"""
+    cursors = AttendanceCursor.objects.filter(owner_id=OuterRef('owner_id'))
+    unread = AttendanceEvent.objects.filter(
+        pk__gt=Coalesce(Subquery(cursors.values('last_event')), 0)
+    ).values_list('owner_id', flat=True).distinct()
+    tracked = AttendanceCursor.objects.values_list('owner_id', flat=True)
+    return set(chain.from_iterable(
+        sharding.everywhere(unread) + sharding.everywhere(tracked)))
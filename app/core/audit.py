@@ -0,0 +1,153 @@
+"""
+    Audit history of shifts and schedules
+
+ChangeLog.record hands over the shifts and schedules a transaction
+writes, under the owner's change log lock. They are collected on the
+connection, and the core.backends.postgresql backend writes their
+versions once, as the outermost atomic block commits: their rows are
+read back and compared with the last audited version, so a transaction
+adds at most one version per entity whatever the number of saves, the
+history commits or rolls back with the change it describes and the
+writers of an entity never interleave.
+"""
+import json
+from contextvars import ContextVar
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.db import connections
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.db.models import Exists, F, Func, OuterRef, Value
+from django.db.models.functions import Greatest
+
+from core.models import AuditVersion, Schedule, Shift
+
+# id of the user making the changes, set by AuditActorMiddleware
+actor = ContextVar('audit_actor', default=None)
+
+
+def _fields(model, *excluded):
+    return [
+        field.attname for field in model._meta.concrete_fields
+        if not field.primary_key and not field.generated
+        and field.attname not in excluded
+    ]
+
+
+# entity: (model, day field, audited fields)
+ENTITIES = {
+    'shift': (Shift, 'shift_date', _fields(Shift)),
+    'schedule': (Schedule, 'date', _fields(Schedule, 'version')),
+}
+
+
+def _encode(state):
+    return json.loads(json.dumps(state, cls=DjangoJSONEncoder))
+
+
+def _fold(versions):
+    """{key: (last version, state)} of ordered versions"""
+    states = {}
+    for version in versions:
+        key = (version.entity, version.entity_id)
+        state = dict(states[key][1]) if key in states else {}
+        state.update(version.data)
+        states[key] = (version, state)
+    return states
+
+
+def touch(using, keys):
+    """note the (entity, id) keys changed by the current transaction"""
+    audited = connections[using].audited
+    user_id = actor.get()
+    for key in keys:
+        if key[0] in ENTITIES:
+            audited[key] = user_id
+
+
+def flush(using):
+    """write the versions of the keys noted by the transaction, returns
+    the versions added"""
+    keys, connections[using].audited = connections[using].audited, {}
+
+    current = {}
+    for entity, (model, day_field, fields) in ENTITIES.items():
+        ids = [pk for name, pk in keys if name == entity]
+        if ids:
+            for row in model.objects.using(using).filter(
+                    pk__in=ids).values('pk', *fields):
+                current[(entity, row.pop('pk'))] = row
+    last_versions = _fold(AuditVersion.objects.using(using).filter(
+        entity__in=ENTITIES,
+        entity_id__in={pk for _, pk in keys}
+    ).order_by('entity', 'entity_id', 'valid'))
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT transaction_timestamp()')
+        now = cursor.fetchone()[0]
+
+    closing, versions = [], []
+    for key, user_id in keys.items():
+        row = current.get(key)
+        state = _encode(row) if row is not None else None
+        last, before = last_versions.get(key, (None, None))
+        if last is not None and last.valid.upper is not None:
+            # deleted, ids are not reused
+            last, before = None, None
+        if state == before:
+            continue
+        if last is not None:
+            closing.append(last.pk)
+        if state is not None:
+            versions.append(AuditVersion(
+                owner_id=row['owner_id'],
+                entity=key[0],
+                entity_id=key[1],
+                day=row[ENTITIES[key[0]][1]],
+                # a transaction started later may have written it first
+                valid=DateTimeTZRange(
+                    max(now, last.valid.lower) if last else now, None, '[)'),
+                changed_by_id=user_id,
+                data={
+                    name: value for name, value in state.items()
+                    if before is None or before.get(name) != value
+                }
+            ))
+
+    audited = AuditVersion.objects.using(using)
+    if closing:
+        audited.filter(pk__in=closing).update(valid=Func(
+            Func(F('valid'), function='lower'),
+            Greatest(Func(F('valid'), function='lower'), Value(now)),
+            function='tstzrange', output_field=DateTimeRangeField()))
+    return audited.bulk_create(versions)
+
+
+def history(entity, entity_id):
+    """versions of a shift or schedule, oldest first"""
+    return AuditVersion.objects.filter(
+        entity=entity, entity_id=entity_id).order_by('valid')
+
+
+def as_of(owner, start, end, when):
+    """schedules and shifts of an owner's days as they were at a time
+
+    One query: the versions current at `when` on the days are found
+    through the (owner, day, valid) index, and all the earlier versions
+    of the same entities are folded into their state.
+    """
+    current = AuditVersion.objects.filter(
+        owner=owner,
+        day__range=(start, end),
+        valid__contains=when,
+        entity=OuterRef('entity'),
+        entity_id=OuterRef('entity_id')
+    )
+    versions = AuditVersion.objects.filter(
+        Exists(current),
+        valid__startswith__lte=when
+    ).order_by('entity', 'entity_id', 'valid')
+
+    result = {entity: [] for entity in ENTITIES}
+    for (entity, entity_id), (_, state) in _fold(versions).items():
+        result[entity].append(dict(state, id=entity_id))
+    return result
@@ -0,0 +1,39 @@
+"""
+    PostgreSQL backend writing the audit history before each commit
+
+The audit versions of a transaction are written once, with the keys
+core.audit collected from its change log entries, as the outermost
+atomic block commits: they commit or roll back with the changes they
+describe, whatever the number of saves.
+"""
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # {(entity, id): id of the user}, changed by the open transaction
+        self.audited = {}
+
+    def commit(self):
+        if self.audited:
+            # imported here: core.audit imports the models, not loaded
+            # with the database backends
+            from core import audit
+
+            # the writes of the hook join the transaction being committed
+            self.in_atomic_block = True
+            try:
+                audit.flush(self.alias)
+            finally:
+                self.in_atomic_block = False
+        super().commit()
+
+    def rollback(self):
+        self.audited.clear()
+        super().rollback()
+
+    def close(self):
+        self.audited.clear()
+        super().close()
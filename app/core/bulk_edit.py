@@ -0,0 +1,129 @@
+"""
+    Set-based edits of many shifts at once
+
+edit() moves a selection of shifts by some minutes, gives them another
+task or another employee as one change set. The selection is locked and
+changed in memory, then checked as a whole with the rules of Shift.clean:
+the employee is active and of the schedule's owner, the times fall within
+the schedule and no shift overlaps another of the same employee, loaded
+for all the employees and days involved with one query. A valid set is
+written with a single UPDATE, followed by the schedule version bump and
+the change log entries the shifts' save() would have written, so the
+query count does not grow with the selection.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils.translation import gettext as _
+
+from core import dashboard
+from core.models import ChangeLog, Schedule, Shift
+
+
+def _overlapping(rows):
+    """ids of the selected shifts overlapping another of their employee
+
+    rows are (id, selected, start, end) of one employee and day, a few.
+    """
+    found = set()
+    for index, (pk, selected, start, end) in enumerate(rows):
+        for other, chosen, begin, finish in rows[index + 1:]:
+            if start < finish and begin < end:
+                found.update(key for key, flag in ((pk, selected),
+                                                   (other, chosen)) if flag)
+    return found
+
+
+def validate(shifts):
+    """[(shift, message)] of the changed, unsaved shifts breaking a rule
+
+    The shifts need their schedule and employee; their other shifts are
+    read with one query.
+    """
+    if not shifts:
+        return []
+    errors = []
+    for shift in shifts:
+        if not shift.employee.is_active_on(shift.schedule.date):
+            errors.append((shift, _(
+                'employee’s contract is not active on this date')))
+        if shift.employee.owner_id != shift.schedule.owner_id:
+            errors.append((shift, _(
+                'Schedule and Employee mut have the same owner')))
+        if shift.task is not None and \
+                shift.task.owner_id != shift.schedule.owner_id:
+            errors.append((shift, _(
+                'Task and Shift must have the same owner')))
+        if not (shift.schedule.start <= shift.start_time <
+                shift.end_time <= shift.schedule.end):
+            errors.append((shift, _(
+                'Shift times must fall within the schedule boundaries')))
+
+    days = defaultdict(list)
+    for shift in shifts:
+        days[shift.employee_id, shift.shift_date].append(
+            (shift.pk, True, shift.start_time, shift.end_time))
+    for employee_id, shift_date, *times in Shift.objects.using(
+            shifts[0]._state.db).filter(
+            employee_id__in={shift.employee_id for shift in shifts},
+            shift_date__in={shift.shift_date for shift in shifts}
+    ).exclude(pk__in=[shift.pk for shift in shifts]).values_list(
+            'employee_id', 'shift_date', 'pk', 'start_time', 'end_time'):
+        days[employee_id, shift_date].append(
+            (times[0], False, times[1], times[2]))
+    overlapping = set()
+    for rows in days.values():
+        overlapping |= _overlapping(rows)
+    errors.extend(
+        (shift, _('already has a shift that overlaps with this period.'))
+        for shift in shifts if shift.pk in overlapping)
+    return errors
+
+
+def edit(queryset, minutes=0, task=None, employee=None):
+    """move, retask or reassign the shifts of a queryset, all or none
+
+    Returns the edited shifts; raises ValidationError listing every
+    shift breaking a rule, leaving them all unchanged.
+    """
+    delta = timedelta(minutes=minutes)
+    values = {}
+    if delta:
+        values.update(start_time=F('start_time') + delta,
+                      end_time=F('end_time') + delta)
+    if task is not None:
+        values['task'] = task
+    if employee is not None:
+        values['employee'] = employee
+    if not values:
+        return []
+
+    locked = queryset.select_for_update(of=('self',)).with_names(
+    ).select_related('schedule').order_by('pk')
+    with transaction.atomic(using=locked.db):
+        shifts = list(locked)
+        for shift in shifts:
+            shift.start_time += delta
+            shift.end_time += delta
+            if task is not None:
+                shift.task = task
+            if employee is not None:
+                shift.employee = employee
+        errors = validate(shifts)
+        if errors:
+            raise ValidationError([
+                f'{shift}: {message}' for shift, message in errors
+            ])
+
+        ids = [shift.pk for shift in shifts]
+        Shift.objects.using(locked.db).filter(pk__in=ids).update(**values)
+        Schedule.objects.using(locked.db).filter(
+            pk__in={shift.schedule_id for shift in shifts}).bump_version()
+        ChangeLog.objects.db_manager(locked.db).record(
+            shifts, ChangeLog.UPDATE)
+        for owner_id in {shift.owner_id for shift in shifts}:
+            dashboard.invalidate(owner_id)
+    return shifts
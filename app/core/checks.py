@@ -0,0 +1,23 @@
+"""
+    System checks of a deployment
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """role versions and dashboard refreshes must reach every process"""
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        'the default cache is not shared between processes',
+        hint='role changes and dashboard refreshes only reach the process '
+             'making them; set CACHE_URL to the Redis server',
+        id='core.W001',
+    )]
@@ -0,0 +1,14 @@
+"""
+    Countries offered to the users
+
+Kept apart from core.models: importing django_countries builds its
+collation tables, so only the pages and migrations showing countries
+import this module.
+"""
+from django_countries import Countries
+
+
+class LimitCountries(Countries):
+    only = [
+        "IT",
+    ]
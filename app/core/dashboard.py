@@ -0,0 +1,120 @@
+"""
+    Owner dashboard aggregates
+
+The figures are computed with four grouped queries and cached per owner
+and day. Model changes do not drop the cached figures: they queue a
+background refresh, so the dashboard is always served from the cache.
+The worker writes the figures the web processes read, which takes the
+shared cache of settings.CACHES.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BigIntegerField, Count, Q, Sum
+from django.db.models.functions import Cast, Extract
+from django.utils import timezone
+
+from core import intervals, sharding
+from core.models import Employee, Schedule, Shift
+
+
+def _epochs(queryset, start, end):
+    return queryset.annotate(
+        start_epoch=Cast(Extract(start, 'epoch'), BigIntegerField()),
+        end_epoch=Cast(Extract(end, 'epoch'), BigIntegerField()),
+    )
+
+
+def compute(owner_id, today=None):
+    today = today or timezone.localdate()
+    monday = today - timedelta(days=today.weekday())
+    sunday = monday + timedelta(days=6)
+
+    staff = Employee.objects.filter(owner_id=owner_id).aggregate(
+        headcount=Count('id'),
+        active=Count('id', filter=Q(active_range__contains=today)),
+        contracted_hours=Sum(
+            'contract__weekHours', filter=Q(active_range__contains=today),
+            default=0
+        ),
+    )
+
+    shifts = np.array(list(_epochs(
+        Shift.objects.for_owner(owner_id, monday, sunday).order_by(),
+        'start_time', 'end_time'
+    ).values_list('schedule_id', 'start_epoch', 'end_epoch')),
+        dtype=np.int64).reshape(-1, 3)
+    schedules = list(_epochs(
+        Schedule.objects.filter(owner_id=owner_id,
+                                date__range=(monday, sunday)),
+        'start', 'end'
+    ).order_by('date').values_list('id', 'date', 'start_epoch', 'end_epoch'))
+
+    gaps = []
+    for schedule_id, day, start, end in schedules:
+        mine = shifts[shifts[:, 0] == schedule_id]
+        covered = intervals.overlap(
+            [start], [end], *intervals.merge(mine[:, 1], mine[:, 2]))[0]
+        uncovered = (end - start - covered) // 60
+        if uncovered:
+            gaps.append({'date': day, 'minutes': int(uncovered)})
+
+    expiring = Employee.objects.filter(
+        owner_id=owner_id,
+        endDate__range=(
+            today,
+            today + timedelta(days=settings.DASHBOARD_EXPIRING_DAYS)
+        )
+    ).with_user().order_by('endDate')
+
+    return {
+        'week_start': monday,
+        'headcount': staff['headcount'],
+        'active': staff['active'],
+        'scheduled_hours': round(
+            int((shifts[:, 2] - shifts[:, 1]).sum()) / 3600, 2),
+        'contracted_hours': staff['contracted_hours'],
+        'coverage_gaps': gaps,
+        'expiring': [
+            {'employee_id': employee.pk, 'name': str(employee),
+             'end': employee.endDate}
+            for employee in expiring
+        ],
+    }
+
+
+def _key(owner_id, today):
+    return f'dashboard:{owner_id}:{today.isoformat()}'
+
+
+def get(owner_id):
+    """cached figures of an owner, computed on the first request only"""
+    today = timezone.localdate()
+    figures = cache.get(_key(owner_id, today))
+    if figures is None:
+        figures = refresh(owner_id, today)
+    return figures
+
+
+def refresh(owner_id, today=None):
+    today = today or timezone.localdate()
+    # a change arriving while computing must queue a new refresh
+    cache.delete(f'{_key(owner_id, today)}:queued')
+    figures = compute(owner_id, today)
+    cache.set(_key(owner_id, today), figures, settings.DASHBOARD_CACHE_TTL)
+    return figures
+
+
+def invalidate(owner_id):
+    """queue one background refresh after the current transaction"""
+    from core.tasks import refresh_dashboard
+
+    if owner_id is None:
+        return
+    queued = f'{_key(owner_id, timezone.localdate())}:queued'
+    if cache.add(queued, True, settings.DASHBOARD_QUEUED_TTL):
+        transaction.on_commit(lambda: refresh_dashboard.delay(owner_id),
+                              using=sharding.db_for(owner_id))
@@ -0,0 +1,164 @@
+"""
+    Staffing demand per task and its gaps against the scheduled shifts
+
+Coverage is counted in local wall-clock buckets of STAFFING_BUCKET_MINUTES:
+a shift covers every bucket it overlaps. The shifts are streamed from one
+query as local epoch seconds and turned into a (task, day, bucket)
+headcount array with a difference array and a cumulative sum, so a year
+of shifts costs one query and a few array operations.
+"""
+from datetime import date, timedelta
+from itertools import chain
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField
+from django.db.models.functions import Cast, Extract
+from django.utils import timezone
+
+from core import replicas, sharding
+from core.models import Shift, StaffingDemand
+
+EPOCH = date(1970, 1, 1)
+DAY = 24 * 3600
+
+
+def _local_epoch(field, zone):
+    return Cast(Extract(field, 'epoch', tzinfo=zone), BigIntegerField())
+
+
+def coverage(owner, start, end):
+    """scheduled headcount of every task per bucket of the days
+
+    Returns (task_ids, counts) with counts shaped (tasks, days, buckets
+    per day); shifts without a task are not counted.
+    """
+    zone = ZoneInfo(settings.STAFFING_TIME_ZONE)
+    # shifts may start the evening before the first day
+    rows = Shift.objects.for_owner(
+        owner, start - timedelta(days=1), end
+    ).filter(task__isnull=False).order_by().values_list(
+        'task_id',
+        _local_epoch('start_time', zone),
+        _local_epoch('end_time', zone)
+    ).iterator(chunk_size=5000)
+    data = np.fromiter(
+        chain.from_iterable(rows), dtype=np.int64).reshape(-1, 3)
+    return bucket_counts(data, start, end)
+
+
+def bucket_counts(data, start, end):
+    """coverage of (task_id, local start, local end) epoch second rows"""
+    size = settings.STAFFING_BUCKET_MINUTES * 60
+    days = (end - start).days + 1
+    slots = DAY // size
+
+    task_ids, task_index = np.unique(data[:, 0], return_inverse=True)
+    origin = (start - EPOCH).days * DAY
+    first = np.clip((data[:, 1] - origin) // size, 0, days * slots)
+    last = np.clip(-((origin - data[:, 2]) // size), 0, days * slots)
+    inside = first < last
+
+    steps = np.zeros((len(task_ids), days * slots + 1), dtype=np.int64)
+    np.add.at(steps, (task_index[inside], first[inside]), 1)
+    np.add.at(steps, (task_index[inside], last[inside]), -1)
+    counts = np.cumsum(steps[:, :-1], axis=1)
+    return task_ids, counts.reshape(len(task_ids), days, slots)
+
+
+def _weekdays(start, days):
+    return (start.weekday() + np.arange(days)) % 7
+
+
+@replicas.reporting()
+def forecast(owner, start, end):
+    """default demand learnt from the shifts between two dates
+
+    The demand of a task in a weekday bucket is the median headcount of
+    that bucket over the same weekdays, rounded up. Returns
+    {(task_id, weekday, minute): headcount} without the empty buckets.
+    """
+    task_ids, counts = coverage(owner, start, end)
+    weekdays = _weekdays(start, counts.shape[1])
+    minutes = settings.STAFFING_BUCKET_MINUTES
+    demand = {}
+    for weekday in range(7):
+        same_day = counts[:, weekdays == weekday, :]
+        if not same_day.shape[1]:
+            continue
+        median = np.ceil(np.median(same_day, axis=1)).astype(np.int64)
+        for task, slot in zip(*np.nonzero(median)):
+            demand[(int(task_ids[task]), weekday, int(slot) * minutes)] = \
+                int(median[task, slot])
+    return demand
+
+
+def apply_forecast(owner, today=None):
+    """replace the forecast demand of an owner from its recent history"""
+    today = today or timezone.localdate()
+    end = today - timedelta(days=1)
+    start = today - timedelta(days=settings.STAFFING_HISTORY_DAYS)
+    rows = [
+        StaffingDemand(
+            owner_id=getattr(owner, 'pk', owner),
+            task_id=task_id,
+            weekday=weekday,
+            minute=minute,
+            headcount=headcount,
+            forecast=True
+        )
+        for (task_id, weekday, minute), headcount
+        in forecast(owner, start, end).items()
+    ]
+    with transaction.atomic(using=sharding.db_for(owner)):
+        StaffingDemand.objects.filter(owner=owner, forecast=True).delete()
+        # buckets entered by hand win over the forecast
+        return StaffingDemand.objects.bulk_create(
+            rows, ignore_conflicts=True)
+
+
+def gaps(owner, start, end):
+    """buckets where fewer people are scheduled than the demand
+
+    Consecutive buckets of a task with the same figures are merged.
+    Returns dicts of task_id, date, start and end minute, required and
+    scheduled headcount, in task and time order.
+    """
+    task_ids, counts = coverage(owner, start, end)
+    days, slots = (end - start).days + 1, counts.shape[2]
+    minutes = settings.STAFFING_BUCKET_MINUTES
+
+    rows = np.array(list(StaffingDemand.objects.filter(
+        owner=owner
+    ).values_list('task_id', 'weekday', 'minute', 'headcount')),
+        dtype=np.int64).reshape(-1, 4)
+    tasks = np.union1d(task_ids, rows[:, 0])
+    weekly = np.zeros((len(tasks), 7, slots), dtype=np.int64)
+    weekly[np.searchsorted(tasks, rows[:, 0]), rows[:, 1],
+           rows[:, 2] // minutes] = rows[:, 3]
+    required = weekly[:, _weekdays(start, days), :]
+    scheduled = np.zeros_like(required)
+    scheduled[np.searchsorted(tasks, task_ids)] = counts
+
+    found = []
+    for task, day, slot in zip(*np.nonzero(scheduled < required)):
+        figures = (int(required[task, day, slot]),
+                   int(scheduled[task, day, slot]))
+        previous = found[-1] if found else None
+        if previous and previous['task_id'] == tasks[task] \
+                and previous['date'] == start + timedelta(days=int(day)) \
+                and previous['end'] == slot * minutes \
+                and (previous['required'], previous['scheduled']) == figures:
+            previous['end'] += minutes
+            continue
+        found.append({
+            'task_id': int(tasks[task]),
+            'date': start + timedelta(days=int(day)),
+            'start': int(slot) * minutes,
+            'end': int(slot + 1) * minutes,
+            'required': figures[0],
+            'scheduled': figures[1],
+        })
+    return found
@@ -0,0 +1,252 @@
+"""
+    Columnar Parquet export of the scheduling data for analytics
+
+Shifts are written under EXPORT_ROOT as hive partitions by owner and
+month, shifts/owner=<id>/month=<yyyy-mm>/data.parquet; employees, tasks
+and contracts, which are small, as one file per owner. Rows are streamed
+from server-side cursors EXPORT_CHUNK_ROWS at a time and written as Arrow
+record batches, so memory stays bounded by one chunk whatever the table
+size. Every shard is read, default through a reporting replica when one
+is healthy.
+
+An incremental export rewrites only the shift months changed since the
+previous one, found in the audit history: a version opened or closed
+after the last export marks the month of its day, so the months a shift
+moved out of or was deleted from are rewritten too. Versions start at
+the timestamp of the transaction writing them, so the export is dated
+from the oldest transaction still open on the shards when it begins:
+changes committed while it runs are exported the next time.
+"""
+import json
+import os
+import shutil
+from datetime import timedelta
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from core import replicas, sharding
+from core.models import AuditVersion, Contract, Employee, Shift, Task
+
+STATE_FILE = '_export_state.json'
+ID = pa.int64()
+TIMESTAMP = pa.timestamp('us', tz='UTC')
+
+# table: (model, [(column, arrow type)]), the owner id second
+TABLES = {
+    'shifts': (Shift, [
+        ('id', ID), ('owner_id', ID), ('schedule_id', ID),
+        ('employee_id', ID), ('task_id', ID), ('template_id', ID),
+        ('shift_date', pa.date32()), ('start_time', TIMESTAMP),
+        ('end_time', TIMESTAMP),
+    ]),
+    'employees': (Employee, [
+        ('id', ID), ('owner_id', ID), ('user_id', ID), ('contract_id', ID),
+        ('startDate', pa.date32()), ('endDate', pa.date32()),
+    ]),
+    'tasks': (Task, [
+        ('id', ID), ('owner_id', ID), ('name', pa.string()),
+    ]),
+    'contracts': (Contract, [
+        ('id', ID), ('owner_id', ID), ('weekHours', pa.int16()),
+    ]),
+}
+
+
+def _schema(table):
+    return pa.schema(TABLES[table][1])
+
+
+def _month(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _partition(root, table, owner_id, month=None):
+    path = Path(root, table, f'owner={owner_id}')
+    if month is not None:
+        path = path / f'month={month:%Y-%m}'
+    return path / 'data.parquet'
+
+
+class _PartitionWriter:
+    """writes record batches, switching file when the partition changes
+
+    Every file is written aside and moved in place when complete, so
+    readers never see a partial partition.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.path = None
+        self.writer = None
+        self.written = set()
+
+    def write(self, path, batch):
+        if path != self.path:
+            self.close()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.path = path
+            self.writer = pq.ParquetWriter(
+                f'{path}.tmp', self.schema, compression='zstd')
+        self.writer.write_batch(batch)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(f'{self.path}.tmp', self.path)
+            self.written.add(self.path)
+        self.path = self.writer = None
+
+
+def _stream(queryset, table, root, by_month):
+    """write the rows of a queryset ordered by partition
+
+    Returns the partition files written.
+    """
+    schema = _schema(table)
+    names = schema.names
+    position = names.index('shift_date') if by_month else None
+    rows = queryset.values_list(*names).iterator(
+        chunk_size=settings.EXPORT_CHUNK_ROWS)
+    writer = _PartitionWriter(schema)
+    chunk, key = [], None
+    try:
+        for row in rows:
+            row_key = (row[1], _month(row[position]) if by_month else None)
+            if chunk and (row_key != key or
+                          len(chunk) >= settings.EXPORT_CHUNK_ROWS):
+                writer.write(_partition(root, table, *key),
+                             _batch(schema, chunk))
+                chunk = []
+            key = row_key
+            chunk.append(row)
+        if chunk:
+            writer.write(_partition(root, table, *key),
+                         _batch(schema, chunk))
+    finally:
+        writer.close()
+    return writer.written
+
+
+def _batch(schema, rows):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type)
+         for column, field in zip(columns, schema)],
+        schema=schema)
+
+
+def _read_state(root):
+    try:
+        with open(Path(root, STATE_FILE)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _write_state(root, state):
+    path = Path(root, STATE_FILE)
+    with open(f'{path}.tmp', 'w') as file:
+        json.dump(state, file)
+    os.replace(f'{path}.tmp', path)
+
+
+def _watermark():
+    """start of the oldest transaction open on any shard, or now"""
+    started = []
+    for alias in [DEFAULT_DB_ALIAS, *sharding.placed()]:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                'SELECT coalesce(min(xact_start), now()) FROM pg_stat_activity'
+                ' WHERE datname = current_database()')
+            started.append(cursor.fetchone()[0])
+    return min(started)
+
+
+def changed_months(since):
+    """{(owner_id, first day of month)} of the shifts changed since"""
+    days = AuditVersion.objects.filter(entity='shift').filter(
+        Q(valid__startswith__gt=since) | Q(valid__endswith__gt=since)
+    ).values_list('owner_id', 'day').distinct()
+    return {
+        (owner_id, _month(day))
+        for queryset in sharding.everywhere(days)
+        for owner_id, day in queryset
+    }
+
+
+def _months_filter(months):
+    condition = Q()
+    for owner_id, month in months:
+        condition |= Q(owner_id=owner_id,
+                       shift_date__gte=month,
+                       shift_date__lt=_next_month(month))
+    return condition
+
+
+def _rewrite(queryset, table, root, by_month):
+    """write a whole table aside, then swap it with the previous one"""
+    staging = Path(root, '.staging')
+    shutil.rmtree(staging / table, ignore_errors=True)
+    written = set()
+    for shard_queryset in sharding.everywhere(queryset):
+        written |= _stream(shard_queryset, table, staging, by_month)
+    shutil.rmtree(Path(root, table), ignore_errors=True)
+    if written:
+        os.replace(staging / table, Path(root, table))
+    return len(written)
+
+
+@replicas.reporting()
+def export(root=None, full=False):
+    """write the Parquet files, returns {table: partitions written}
+
+    Exports everything the first time or when full; afterwards only the
+    shift months changed since the previous export.
+    """
+    root = root or settings.EXPORT_ROOT
+    Path(root).mkdir(parents=True, exist_ok=True)
+    started = _watermark()
+    state = _read_state(root)
+    shifts = Shift.objects.order_by('owner_id', 'shift_date', 'pk')
+    result = {'removed': 0}
+    if full or state is None:
+        result['shifts'] = _rewrite(shifts, 'shifts', root, by_month=True)
+    else:
+        months = changed_months(parse_datetime(state['exported_at']))
+        written = set()
+        if months:
+            for queryset in sharding.everywhere(
+                    shifts.filter(_months_filter(months))):
+                written |= _stream(queryset, 'shifts', root, by_month=True)
+        # months left without shifts
+        for owner_id, month in months:
+            path = _partition(root, 'shifts', owner_id, month)
+            if path not in written and path.exists():
+                path.unlink()
+                result['removed'] += 1
+        result['shifts'] = len(written)
+
+    # employees, tasks and contracts are small and always rewritten
+    for table in ('employees', 'tasks', 'contracts'):
+        result[table] = _rewrite(
+            TABLES[table][0].objects.filter(
+                owner__isnull=False).order_by('owner_id', 'pk'),
+            table, root, by_month=False)
+    _write_state(root, {'exported_at': started.isoformat()})
+    return result
+
+
+def read(root=None, table='shifts'):
+    """an exported table as one Arrow table, for the notebooks"""
+    return pq.read_table(Path(root or settings.EXPORT_ROOT, table),
+                         partitioning='hive')
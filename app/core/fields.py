@@ -0,0 +1,112 @@
+"""
+    Custom model fields
+"""
+from django.conf import settings
+from django.core import checks
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+def _to_python(value, region=None):
+    # phonenumbers and its metadata load on the first number parsed
+    from phonenumber_field.phonenumber import to_python
+    return to_python(value, region=region)
+
+
+def validate_phone_number(value):
+    from phonenumber_field.validators import \
+        validate_international_phonenumber
+    validate_international_phonenumber(value)
+
+
+class LazyPhoneNumberDescriptor:
+    """Keep the raw column value and parse it on first access"""
+
+    def __init__(self, field):
+        self.field = field
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        if self.field.name not in instance.__dict__:
+            instance.refresh_from_db(fields=[self.field.name])
+        value = instance.__dict__[self.field.name]
+        if isinstance(value, str) and value:
+            value = _to_python(value, region=self.field.region)
+            instance.__dict__[self.field.name] = value
+        return value
+
+    def __set__(self, instance, value):
+        if value is not None and not isinstance(value, str):
+            value = _to_python(value, region=self.field.region)
+        instance.__dict__[self.field.name] = value
+
+
+class LazyPhoneNumberField(models.CharField):
+    """Phone number column parsed only when read
+
+    Behaves as phonenumber_field's PhoneNumberField, but neither
+    phonenumbers nor phonenumber_field are imported until a number is
+    parsed, validated or edited in a form.
+    """
+    default_validators = [validate_phone_number]
+    description = _('Phone number')
+
+    def __init__(self, *args, region=None, **kwargs):
+        kwargs.setdefault('max_length', 128)
+        super().__init__(*args, **kwargs)
+        self._region = region
+
+    @property
+    def region(self):
+        return self._region or getattr(
+            settings, 'PHONENUMBER_DEFAULT_REGION', None)
+
+    def check(self, **kwargs):
+        from phonenumber_field.phonenumber import validate_region
+
+        errors = super().check(**kwargs)
+        try:
+            validate_region(self.region)
+        except ValueError as error:
+            errors.append(checks.Error(str(error), obj=self))
+        return errors
+
+    def contribute_to_class(self, cls, name, *args, **kwargs):
+        super().contribute_to_class(cls, name, *args, **kwargs)
+        setattr(cls, self.name, LazyPhoneNumberDescriptor(self))
+
+    def to_python(self, value):
+        return _to_python(value, region=self.region)
+
+    def from_db_value(self, value, expression, connection):
+        return value
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if not value:
+            return value
+        if isinstance(value, str):
+            value = _to_python(value, region=self.region)
+        if not value.is_valid():
+            return value.raw_input
+        from phonenumber_field.phonenumber import PhoneNumber
+        fmt = PhoneNumber.format_map[
+            getattr(settings, 'PHONENUMBER_DB_FORMAT', 'E164')]
+        return value.format_as(fmt)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['region'] = self._region
+        return name, path, args, kwargs
+
+    def formfield(self, **kwargs):
+        from phonenumber_field import formfields
+
+        defaults = {
+            'form_class': formfields.PhoneNumberField,
+            'region': self.region,
+            'error_messages': self.error_messages,
+        }
+        defaults.update(kwargs)
+        return super().formfield(**defaults)
@@ -0,0 +1,47 @@
+"""
+    Vectorized interval arithmetic on epoch seconds
+"""
+import numpy as np
+
+
+def merge(starts, ends):
+    """union of [start, end) intervals as sorted disjoint arrays"""
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if not len(starts):
+        return starts, ends
+    order = np.argsort(starts, kind='stable')
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    # a new block starts where the interval begins after all previous ends
+    new_block = np.empty(len(starts), dtype=bool)
+    new_block[0] = True
+    new_block[1:] = starts[1:] > reach[:-1]
+    first = np.flatnonzero(new_block)
+    last = np.append(first[1:], len(starts)) - 1
+    return starts[first], reach[last]
+
+
+def overlap(starts, ends, win_starts, win_ends):
+    """seconds of every [start, end) interval inside the windows
+
+    The windows must be sorted and disjoint (see merge). Each interval is
+    measured as F(end) - F(start), F being the windows' cumulative length
+    up to an instant, with one binary search per bound.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if not len(win_starts):
+        return np.zeros(len(starts), dtype=np.int64)
+    lengths = win_ends - win_starts
+    cumulative = np.concatenate(([0], np.cumsum(lengths)))
+
+    def covered_until(instants):
+        index = np.searchsorted(win_starts, instants, side='right') - 1
+        inside = np.clip(
+            instants - win_starts[np.maximum(index, 0)],
+            0, lengths[np.maximum(index, 0)]
+        )
+        return np.where(index >= 0, cumulative[index] + inside, 0)
+
+    return covered_until(ends) - covered_until(starts)
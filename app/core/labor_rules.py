@@ -0,0 +1,183 @@
+"""
+    Italian working time rules checked across the shifts of a period
+
+All the shifts needed are loaded with one query and sorted once by
+(employee, start); every rule is then a vectorized pass over the sorted
+arrays, so a month of an owner's shifts is checked in O(n log n).
+
+Rules (D.Lgs. 66/2003):
+    daily_rest      at least 11 consecutive hours off between the shifts
+                    of two different working days
+    weekly_rest     at least 24 consecutive hours off in every week
+    weekly_hours    no more hours in a week than the employee contract,
+                    or LABOR_MAX_WEEKLY_HOURS without a contract
+"""
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.conf import settings
+from django.db.models import BigIntegerField
+from django.db.models.functions import Cast, Extract
+from django.utils.translation import gettext as _
+
+from core.models import Shift
+
+HOUR = 3600
+
+
+class Violation(namedtuple(
+        'Violation', 'rule employee_id shift_ids value limit')):
+    """a broken rule; value and limit are in hours"""
+
+    def __str__(self):
+        messages = {
+            'daily_rest': _('only %(value)sh of rest between working days, '
+                            'at least %(limit)sh required'),
+            'weekly_rest': _('longest weekly rest is %(value)sh, '
+                             'at least %(limit)sh required'),
+            'weekly_hours': _('%(value)sh scheduled in the week, '
+                              'the contract allows %(limit)sh'),
+        }
+        return messages[self.rule] % {
+            'value': round(self.value, 2),
+            'limit': round(self.limit, 2),
+        }
+
+
+def _week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def load(owner, start, end, employees=None):
+    """shifts of the whole weeks around the period, with one query
+
+    One extra day on each side lets the rest between the period and its
+    neighbouring shifts be measured too.
+    """
+    first = _week_start(start) - timedelta(days=1)
+    last = _week_start(end) + timedelta(days=7)
+    shifts = Shift.objects.for_owner(owner, first, last).order_by()
+    if employees is not None:
+        shifts = shifts.filter(employee__in=employees)
+    rows = shifts.annotate(
+        start_epoch=Cast(Extract('start_time', 'epoch'), BigIntegerField()),
+        end_epoch=Cast(Extract('end_time', 'epoch'), BigIntegerField()),
+    ).values_list(
+        'pk', 'employee_id', 'start_epoch', 'end_epoch', 'shift_date',
+        'employee__contract__weekHours'
+    )
+    return list(rows)
+
+
+def validate(owner, start, end, employees=None):
+    """violations of the shifts between start and end, both included"""
+    return check(load(owner, start, end, employees), start, end)
+
+
+def check(rows, start, end):
+    """evaluate every rule on (id, employee, start, end, date, hours) rows"""
+    if not rows:
+        return []
+    ids, employee, begin, finish, days, contract = zip(*rows)
+    ids = np.array(ids, dtype=np.int64)
+    employee = np.array(employee, dtype=np.int64)
+    begin = np.array(begin, dtype=np.int64)
+    finish = np.array(finish, dtype=np.int64)
+    day = np.array([value.toordinal() for value in days], dtype=np.int64)
+    cap = np.array(
+        [settings.LABOR_MAX_WEEKLY_HOURS if hours is None else hours
+         for hours in contract], dtype=np.int64) * HOUR
+    # ordinal 1 is a monday
+    week = (day - 1) // 7
+
+    order = np.lexsort((begin, week, employee))
+    ids, employee, begin, finish, day, week, cap = (
+        ids[order], employee[order], begin[order], finish[order],
+        day[order], week[order], cap[order])
+
+    # running latest end within each employee, offsetting every employee
+    # past the previous one so the accumulation never crosses them
+    group = np.concatenate(([0], np.cumsum(employee[1:] != employee[:-1])))
+    origin = begin.min()
+    span = finish.max() - origin + 1
+    reach = np.maximum.accumulate(finish - origin + group * span) \
+        - group * span + origin
+    same_employee = np.concatenate(([False], group[1:] == group[:-1]))
+    rest = begin - np.concatenate(([0], reach[:-1]))
+
+    reported = (day >= start.toordinal()) & (day <= end.toordinal())
+    sweep = {
+        'ids': ids, 'employee': employee, 'begin': begin, 'finish': finish,
+        'reach': reach, 'day': day, 'week': week, 'cap': cap,
+        'same_employee': same_employee, 'rest': rest, 'reported': reported,
+    }
+    return _daily_rest(**sweep) + _weekly(**sweep)
+
+
+def _week_bounds(weeks):
+    """local epoch start of every week number and of the week after it"""
+    zone = ZoneInfo(settings.PAYROLL_TIME_ZONE)
+    bounds = {}
+    for week in np.unique(weeks):
+        monday = date.fromordinal(int(week) * 7 + 1)
+        bounds[week] = tuple(
+            int(datetime.combine(day, time(), tzinfo=zone).timestamp())
+            for day in (monday, monday + timedelta(days=7))
+        )
+    opens = np.array([bounds[week][0] for week in weeks], dtype=np.int64)
+    closes = np.array([bounds[week][1] for week in weeks], dtype=np.int64)
+    return opens, closes
+
+
+def _daily_rest(ids, employee, day, same_employee, rest, reported,
+                **sweep):
+    limit = settings.LABOR_MIN_DAILY_REST_HOURS * HOUR
+    new_day = np.concatenate(([False], day[1:] != day[:-1]))
+    broken = np.flatnonzero(
+        same_employee & new_day & (rest < limit) & reported)
+    return [
+        Violation('daily_rest', int(employee[i]),
+                  [int(ids[i - 1]), int(ids[i])],
+                  rest[i] / HOUR, limit / HOUR)
+        for i in broken
+    ]
+
+
+def _weekly(ids, employee, begin, finish, reach, week, cap,
+            same_employee, rest, reported, **sweep):
+    """weekly rest and hours, one contiguous bucket per (employee, week)"""
+    starts_bucket = ~same_employee | np.concatenate(
+        ([True], week[1:] != week[:-1]))
+    first = np.flatnonzero(starts_bucket)
+    last = np.append(first[1:], len(ids)) - 1
+    opens, closes = _week_bounds(week)
+
+    # the first shift of a week rests since the week start at most, or
+    # since the employee's previous shift; the last one until the week end
+    since_open = begin - opens
+    rest = np.where(
+        starts_bucket,
+        np.where(same_employee, np.minimum(rest, since_open), since_open),
+        rest)
+    rest[last] = np.maximum(rest[last], closes[last] - reach[last])
+    longest = np.maximum.reduceat(np.maximum(rest, 0), first)
+    worked = np.add.reduceat(finish - begin, first)
+    in_period = np.logical_or.reduceat(reported, first)
+
+    rest_limit = settings.LABOR_MIN_WEEKLY_REST_HOURS * HOUR
+    violations = []
+    for index in np.flatnonzero(in_period):
+        members = ids[first[index]:last[index] + 1].tolist()
+        who = int(employee[first[index]])
+        if longest[index] < rest_limit:
+            violations.append(Violation(
+                'weekly_rest', who, members,
+                longest[index] / HOUR, rest_limit / HOUR))
+        limit = cap[first[index]]
+        if worked[index] > limit:
+            violations.append(Violation(
+                'weekly_hours', who, members,
+                worked[index] / HOUR, limit / HOUR))
+    return violations
@@ -0,0 +1,261 @@
+"""
+    HTTP load test of the admin and schedule pages
+
+seed() writes synthetic owners, staff and shifts; run() drives virtual
+users against a running server with httpx and asyncio. Every virtual
+user signs in to the admin as an owner, then loops over the journeys
+until the time is up. The server must be started with
+QUERY_COUNT_HEADER=1 to report the database queries of each response.
+"""
+import asyncio
+import random
+import time
+from datetime import datetime, time as dtime, timedelta
+
+import httpx
+import numpy as np
+from django.contrib.auth.models import Permission
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Employee, Owner, Schedule, Shift, Task, User
+
+EMAIL_PREFIX = 'loadtest-'
+PASSWORD = 'loadtest-password'
+QUERY_HEADER = 'X-DB-Queries'
+OK, ERROR, REJECTED = range(3)
+OWNER_PERMISSIONS = [
+    'view_shift', 'add_shift', 'view_schedule', 'view_employee',
+    'view_task',
+]
+
+
+def _at(day, hour):
+    return datetime.combine(
+        day, dtime(hour), tzinfo=timezone.get_current_timezone())
+
+
+@transaction.atomic
+def seed(owners, employees, days, today=None):
+    """replace the synthetic data, returns the owner emails"""
+    User.objects.filter(email__startswith=EMAIL_PREFIX).delete()
+    first = (today or timezone.localdate()) - timedelta(days=days // 2)
+    permissions = Permission.objects.filter(codename__in=OWNER_PERMISSIONS)
+    emails = []
+    for number in range(owners):
+        email = f'{EMAIL_PREFIX}owner{number}@example.com'
+        user = User.objects.create_user(
+            email, PASSWORD, is_staff=True, company_name=f'Load {number}')
+        user.user_permissions.set(permissions)
+        owner = Owner.objects.create(user=user)
+        tasks = [
+            Task.objects.create(owner=owner, name=name)
+            for name in ('Bar', 'Kitchen', 'Floor')
+        ]
+        staff = [
+            Employee.objects.create(
+                owner=owner,
+                startDate=first,
+                user=User.objects.create_user(
+                    f'{EMAIL_PREFIX}{number}-{position}@example.com',
+                    first_name=f'Name{position}',
+                    last_name=f'Surname{number}'
+                )
+            )
+            for position in range(employees)
+        ]
+        schedules = Schedule.objects.bulk_create([
+            Schedule(
+                owner=owner,
+                date=first + timedelta(days=offset),
+                start=_at(first + timedelta(days=offset), 6),
+                end=_at(first + timedelta(days=offset), 23)
+            )
+            for offset in range(days)
+        ])
+        Shift.objects.bulk_create([
+            Shift(
+                owner=owner,
+                schedule=schedule,
+                employee=employee,
+                task=tasks[position % len(tasks)],
+                shift_date=schedule.date,
+                start_time=_at(schedule.date, 8 + position % 6),
+                end_time=_at(schedule.date, 14 + position % 6)
+            )
+            for schedule in schedules
+            for position, employee in enumerate(staff)
+        ])
+        emails.append(email)
+    return emails
+
+
+def targets():
+    """what each synthetic owner's journeys work on"""
+    found = []
+    for owner in Owner.objects.filter(
+            user__email__startswith=EMAIL_PREFIX).select_related('user'):
+        found.append({
+            'email': owner.user.email,
+            'employees': list(Employee.objects.filter(
+                owner=owner).values_list('pk', flat=True)),
+            'tasks': list(Task.objects.filter(
+                owner=owner).values_list('pk', flat=True)),
+            'schedules': [
+                (pk, day.isoformat()) for pk, day in Schedule.objects.filter(
+                    owner=owner).values_list('pk', 'date')
+            ],
+        })
+    return found
+
+
+class Rejected(Exception):
+    """a form answered with its errors instead of a redirect"""
+
+
+class VirtualUser:
+    """one signed in client running journeys"""
+
+    def __init__(self, client, target, samples):
+        self.client = client
+        self.target = target
+        self.samples = samples
+
+    async def _request(self, method, url, redirect=False, **kwargs):
+        response = await self.client.request(method, url, **kwargs)
+        if response.is_error:
+            response.raise_for_status()
+        queries = int(response.headers.get(QUERY_HEADER, 0))
+        if redirect and response.status_code != 302:
+            raise Rejected(queries)
+        return queries
+
+    def _csrf(self):
+        return {'csrfmiddlewaretoken': self.client.cookies['csrftoken']}
+
+    async def admin_login(self):
+        url = '/admin/login/'
+        queries = await self._request('GET', url)
+        form = {
+            **self._csrf(),
+            'username': self.target['email'],
+            'password': PASSWORD,
+            'next': '/admin/',
+        }
+        return queries + await self._request(
+            'POST', url, redirect=True, data=form)
+
+    async def shift_changelist(self):
+        return await self._request('GET', '/admin/core/shift/')
+
+    async def add_shift(self):
+        """admin add form, which runs Shift.clean() on submit"""
+        url = '/admin/core/shift/add/'
+        queries = await self._request('GET', url)
+        schedule, day = random.choice(self.target['schedules'])
+        # after the seeded shifts; overlaps are rejected by Shift.clean()
+        start = random.randint(20, 21)
+        form = {
+            **self._csrf(),
+            'schedule': schedule,
+            'employee': random.choice(self.target['employees']),
+            'task': random.choice(self.target['tasks']),
+            'shift_date': day,
+            'start_time_0': day,
+            'start_time_1': f'{start:02d}:00:00',
+            'end_time_0': day,
+            'end_time_1': f'{start + 1:02d}:00:00',
+        }
+        return queries + await self._request(
+            'POST', url, redirect=True, data=form)
+
+    async def week_views(self):
+        _, day = random.choice(self.target['schedules'])
+        year, month, date = day.split('-')
+        queries = await self._request(
+            'GET', f'/calendar/{int(year)}/{int(month)}/')
+        return queries + await self._request(
+            'GET', f'/roster/{int(year)}/{int(month)}/{int(date)}/')
+
+    async def timed(self, name):
+        began = time.perf_counter()
+        try:
+            queries, outcome = await getattr(self, name)(), OK
+        except Rejected as rejected:
+            queries, outcome = rejected.args[0], REJECTED
+        except httpx.HTTPError:
+            queries, outcome = 0, ERROR
+        self.samples[name].append(
+            (time.perf_counter() - began, queries, outcome))
+
+    async def run(self, journeys, deadline):
+        await self.timed('admin_login')
+        while time.monotonic() < deadline:
+            await self.timed(random.choice(journeys))
+
+
+JOURNEYS = ['shift_changelist', 'add_shift', 'week_views']
+
+
+async def _drive(base_url, users, duration, journeys, all_targets):
+    samples = {name: [] for name in ['admin_login'] + journeys}
+    deadline = time.monotonic() + duration
+    clients = [
+        httpx.AsyncClient(base_url=base_url, timeout=30)
+        for _ in range(users)
+    ]
+    try:
+        await asyncio.gather(*[
+            VirtualUser(
+                client, all_targets[number % len(all_targets)], samples
+            ).run(journeys, deadline)
+            for number, client in enumerate(clients)
+        ])
+    finally:
+        for client in clients:
+            await client.aclose()
+    return samples
+
+
+def summary(samples, elapsed):
+    """throughput, latency percentiles and queries of every journey"""
+    report = {}
+    for name, rows in samples.items():
+        if not rows:
+            continue
+        data = np.array(rows, dtype=float)
+        latency = data[:, 0] * 1000
+        report[name] = {
+            'count': len(rows),
+            'errors': int((data[:, 2] == ERROR).sum()),
+            'rejected': int((data[:, 2] == REJECTED).sum()),
+            'throughput': round(len(rows) / elapsed, 2),
+            'latency_ms': {
+                f'p{q}': round(float(np.percentile(latency, q)), 1)
+                for q in (50, 95, 99)
+            },
+            'queries': {
+                'mean': round(float(data[:, 1].mean()), 1),
+                'max': int(data[:, 1].max()),
+            },
+        }
+    return report
+
+
+def run(base_url, users, duration, journeys=None):
+    """drive the server and return the JSON ready results"""
+    all_targets = targets()
+    if not all_targets:
+        raise ValueError('no synthetic owners, run loadtest_seed first')
+    started = timezone.now()
+    began = time.perf_counter()
+    samples = asyncio.run(_drive(
+        base_url, users, duration, journeys or JOURNEYS, all_targets))
+    elapsed = time.perf_counter() - began
+    return {
+        'started': started.isoformat(),
+        'base_url': base_url,
+        'users': users,
+        'duration': round(elapsed, 2),
+        'journeys': summary(samples, elapsed),
+    }
@@ -0,0 +1,115 @@
+"""
+    Django command to measure lean user loading
+
+Creates the users and shifts inside a transaction that is rolled back,
+then loads and renders them with full user rows and with the display
+fields only, reporting time and peak python memory of each profile.
+"""
+import gc
+import time
+import tracemalloc
+from datetime import date, datetime, time as dtime, timedelta, timezone
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Employee, Owner, Schedule, Shift, Task, User
+
+
+class Command(BaseCommand):
+    """Django command to benchmark user loading profiles"""
+    help = 'Compare full and lean loading of users and shift lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--employees', type=int, default=200)
+        parser.add_argument('--days', type=int, default=30)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._populate(**options)
+            self._report('users, phones parsed', lambda: [
+                (str(user), user.mobile_phone, user.phone)
+                for user in User.objects.all()
+            ])
+            self._report('users, phones lazy', lambda: [
+                str(user) for user in User.objects.all()
+            ])
+            self._report('users, display fields', lambda: [
+                str(user) for user in User.objects.display()
+            ])
+            self._report('shifts, full users', lambda: [
+                str(shift) for shift in
+                Shift.objects.select_related('employee__user', 'task')
+            ])
+            self._report('shifts, display fields', lambda: [
+                str(shift) for shift in Shift.objects.with_names()
+            ])
+            transaction.set_rollback(True)
+
+    def _populate(self, users, employees, days, **options):
+        password = make_password('benchmark')
+        User.objects.bulk_create([
+            User(
+                email=f'user{number}@example.com',
+                password=password,
+                first_name=f'First{number}',
+                last_name=f'Last{number}',
+                street_name='Via Roma',
+                city='Milano',
+                mobile_phone=f'+39347{number:07d}',
+                phone=f'+3902{number:08d}'
+            )
+            for number in range(users)
+        ], batch_size=5000)
+        owner = Owner.objects.create(user=User.objects.create_user(
+            email='benchmark-owner@example.com'))
+        task = Task.objects.create(owner=owner, name='Benchmark')
+        staff = Employee.objects.bulk_create([
+            Employee(owner=owner, user=user, startDate=date(2000, 1, 1))
+            for user in User.objects.order_by('pk')[:employees]
+        ])
+        first = date.today()
+        schedules = Schedule.objects.bulk_create([
+            Schedule(
+                owner=owner,
+                date=first + timedelta(days=offset),
+                start=self._at(first + timedelta(days=offset), 6),
+                end=self._at(first + timedelta(days=offset), 23)
+            )
+            for offset in range(days)
+        ])
+        Shift.objects.bulk_create([
+            Shift(
+                owner=owner,
+                schedule=schedule,
+                employee=employee,
+                task=task,
+                shift_date=schedule.date,
+                start_time=self._at(schedule.date, 8),
+                end_time=self._at(schedule.date, 16)
+            )
+            for schedule in schedules
+            for employee in staff
+        ], batch_size=5000)
+
+    @staticmethod
+    def _at(day, hour):
+        return datetime.combine(day, dtime(hour), tzinfo=timezone.utc)
+
+    def _report(self, label, load):
+        gc.collect()
+        began = time.perf_counter()
+        load()
+        elapsed = time.perf_counter() - began
+
+        gc.collect()
+        tracemalloc.start()
+        load()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f'{label:<24} {elapsed:8.3f} s {peak / 2 ** 20:10.1f} MiB'
+        )
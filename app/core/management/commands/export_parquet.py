@@ -0,0 +1,23 @@
+"""
+    Django command to export the scheduling data as Parquet
+"""
+from django.core.management.base import BaseCommand
+
+from core import export
+
+
+class Command(BaseCommand):
+    """Django command to write the partitioned Parquet export"""
+    help = 'Export shifts, employees, tasks and contracts as Parquet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', help='defaults to EXPORT_ROOT')
+        parser.add_argument(
+            '--full', action='store_true',
+            help='rewrite every month instead of the changed ones')
+
+    def handle(self, *args, **options):
+        result = export.export(options['root'], options['full'])
+        for table, count in result.items():
+            self.stdout.write(f'{table:<12} {count:>8}')
+        self.stdout.write(self.style.SUCCESS('export complete'))
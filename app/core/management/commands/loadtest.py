@@ -0,0 +1,48 @@
+"""
+    Django command to load test a running server
+
+Seed the data with loadtest_seed, start the server with
+QUERY_COUNT_HEADER=1 (and CELERY_TASK_ALWAYS_EAGER=1 without a broker),
+then run for example:
+
+    python manage.py loadtest --base-url http://localhost:8000 \\
+        --users 20 --duration 60 --output results.json
+"""
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import loadtest
+
+
+class Command(BaseCommand):
+    """Django command to drive scripted user journeys"""
+    help = 'Load test the admin and schedule pages, results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000')
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument(
+            '--journey', action='append', choices=loadtest.JOURNEYS,
+            dest='journeys', help='repeat to run several, default all')
+        parser.add_argument('--label', default='',
+                            help='release or run name stored with results')
+        parser.add_argument('--output', type=Path)
+
+    def handle(self, *args, **options):
+        try:
+            results = loadtest.run(
+                options['base_url'],
+                options['users'],
+                options['duration'],
+                options['journeys']
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        results['label'] = options['label']
+        text = json.dumps(results, indent=2)
+        if options['output']:
+            options['output'].write_text(text + '\n')
+        self.stdout.write(text)
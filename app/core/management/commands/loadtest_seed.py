@@ -0,0 +1,22 @@
+"""
+    Django command to write the synthetic load test data
+"""
+from django.core.management.base import BaseCommand
+
+from core import loadtest
+
+
+class Command(BaseCommand):
+    """Django command to seed the load test owners, staff and shifts"""
+    help = 'Replace the synthetic load test data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owners', type=int, default=5)
+        parser.add_argument('--employees', type=int, default=20)
+        parser.add_argument('--days', type=int, default=28)
+
+    def handle(self, *args, **options):
+        emails = loadtest.seed(
+            options['owners'], options['employees'], options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(emails)} owners seeded, password {loadtest.PASSWORD}'))
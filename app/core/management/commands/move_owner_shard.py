@@ -0,0 +1,34 @@
+"""
+    Django command to move an owner to another shard
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+
+
+class Command(BaseCommand):
+    """Django command to move an owner's data between shards online"""
+    help = 'Copy an owner to another shard in batches, then switch to it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('owner_id', type=int)
+        parser.add_argument('shard', help='database alias to move to')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        owner_id, target = options['owner_id'], options['shard']
+        if target not in sharding.shards():
+            raise CommandError(
+                f'{target} is not a shard: {", ".join(sharding.shards())}')
+        done = sharding.move(
+            owner_id, target, options['batch_size'], progress=self._progress)
+        if not done:
+            self.stdout.write(f'owner {owner_id} is already on {target}')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'owner {owner_id} moved to {target}, '
+            f'{sum(done.values())} rows copied'))
+
+    def _progress(self, name, count):
+        action = 'deleted' if count < 0 else 'copied'
+        self.stdout.write(f'{name:<24} {abs(count):>10} {action}')
@@ -0,0 +1,32 @@
+"""
+    Django command to purge an owner in batches
+"""
+from django.core.management.base import BaseCommand
+
+from core import purge
+
+
+class Command(BaseCommand):
+    """Django command to delete an owner and everything it owns"""
+    help = 'Delete an owner in short batches; run again to resume'
+
+    def add_arguments(self, parser):
+        parser.add_argument('owner_id', type=int)
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='only count the rows left to purge')
+
+    def handle(self, *args, **options):
+        owner_id = options['owner_id']
+        if options['dry_run']:
+            for name, count in purge.remaining(owner_id).items():
+                self.stdout.write(f'{name:<24} {count:>10}')
+            return
+        done = purge.purge(
+            owner_id, options['batch_size'], progress=self._progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'owner {owner_id} purged, {sum(done.values())} rows'))
+
+    def _progress(self, name, count):
+        self.stdout.write(f'{name:<24} {count:>10}')
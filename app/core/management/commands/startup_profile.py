@@ -0,0 +1,40 @@
+"""
+    Django command to profile the imports of a process start
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import startup
+
+
+class Command(BaseCommand):
+    """Django command to report the import time breakdown of django.setup"""
+    help = 'Report the import time of a fresh django.setup() per package'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, *args, **options):
+        report = startup.profile()
+        limit = options['limit']
+        self.stdout.write(
+            f'django.setup() in {report["seconds"] * 1000:.0f} ms, '
+            f'{len(report["modules"])} modules')
+
+        self.stdout.write('\nslowest packages, self time')
+        for package, own in startup.by_package(report['imports'])[:limit]:
+            self.stdout.write(f'{package:<44} {own / 1000:8.1f} ms')
+
+        self.stdout.write('\nslowest top level imports, cumulative time')
+        top = sorted((row for row in report['imports'] if row[3] == 0),
+                     key=lambda row: -row[2])
+        for name, _own, cumulative, _depth in top[:limit]:
+            self.stdout.write(f'{name:<44} {cumulative / 1000:8.1f} ms')
+
+        if report['heavy']:
+            self.stdout.write(self.style.WARNING(
+                f'\nloaded at startup: {", ".join(report["heavy"])}'))
+        budget = settings.STARTUP_BUDGET_SECONDS
+        if report['seconds'] > budget:
+            self.stdout.write(self.style.WARNING(
+                f'\nover the budget of {budget * 1000:.0f} ms'))
@@ -0,0 +1,110 @@
+"""
+    Middleware of the core app
+"""
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext as _
+
+from core import audit, replicas, roles, sharding
+
+
+class RoleMiddleware:
+    """attach the role of the user as request.role, resolved on first use"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.role = SimpleLazyObject(lambda: roles.for_request(request))
+        return self.get_response(request)
+
+
+class ShardMiddleware:
+    """run the owner scoped queries on the shard of the owner the user
+    works for, answering 503 while that owner is moving"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with sharding.for_owner(lambda: request.role.scope_owner_id):
+            return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, sharding.ShardMoving):
+            return None
+        response = HttpResponse(
+            _('Your data is being moved, try again in a moment.'),
+            status=503)
+        response['Retry-After'] = str(settings.SHARD_DIRECTORY_SECONDS)
+        return response
+
+
+class AuditActorMiddleware:
+    """record the request user as the author of the audited changes"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user_id = request.user.pk if request.user.is_authenticated else None
+        token = audit.actor.set(user_id)
+        try:
+            return self.get_response(request)
+        finally:
+            audit.actor.reset(token)
+
+
+class ReplicaPinMiddleware:
+    """keep a client that wrote on the primary for a while"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = {
+            'pinned': request.method not in ('GET', 'HEAD', 'OPTIONS')
+            or replicas.PIN_COOKIE in request.COOKIES,
+            'wrote': False,
+        }
+        token = replicas.request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.request_state.reset(token)
+        if state['wrote']:
+            response.set_cookie(
+                replicas.PIN_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
+
+
+class QueryCountMiddleware:
+    """report the number of database queries of a response in a header
+
+    Enabled with QUERY_COUNT_HEADER=1 for the load tests.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        count = 0
+
+        def counter(execute, sql, params, many, context):
+            nonlocal count
+            count += 1
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        response['X-DB-Queries'] = str(count)
+        return response
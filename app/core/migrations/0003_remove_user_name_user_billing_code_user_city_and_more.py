@@ -1,6 +1,6 @@
 # Generated by Django 5.2.7 on 2025-10-04 21:39
 
-import core.models
+import core.countries
 import django_countries.fields
 import phonenumber_field.modelfields
 from django.db import migrations, models
@@ -35,7 +35,7 @@ class Migration(migrations.Migration):
         migrations.AddField(
             model_name='user',
             name='country_name',
-            field=django_countries.fields.CountryField(countries=core.models.LimitCountries, default='IT', max_length=2),
+            field=django_countries.fields.CountryField(countries=core.countries.LimitCountries, default='IT', max_length=2),
         ),
         migrations.AddField(
             model_name='user',
@@ -0,0 +1,54 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_shift_core_shift_schedul_89cd37_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shift',
+            name='owner',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='owner_shifts', to='core.owner'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE core_shift
+                SET owner_id = core_schedule.owner_id
+                FROM core_schedule
+                WHERE core_schedule.id = core_shift.schedule_id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='shift',
+            name='owner',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='owner_shifts', to='core.owner'),
+        ),
+        migrations.AddConstraint(
+            model_name='schedule',
+            constraint=models.UniqueConstraint(fields=('id', 'owner'), name='unique_schedule_id_owner'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['owner', 'shift_date', 'start_time'], name='shift_owner_date_start_idx'),
+        ),
+        # a shift must carry the owner of its schedule; changing the
+        # schedule owner cascades to its shifts
+        migrations.RunSQL(
+            sql="""
+                ALTER TABLE core_shift
+                ADD CONSTRAINT shift_schedule_owner_fk
+                FOREIGN KEY (schedule_id, owner_id)
+                REFERENCES core_schedule (id, owner_id)
+                ON UPDATE CASCADE
+            """,
+            reverse_sql="""
+                ALTER TABLE core_shift
+                DROP CONSTRAINT shift_schedule_owner_fk
+            """,
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:21
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_shift_owner'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.AddField(
+            model_name='employee',
+            name='active_range',
+            field=models.GeneratedField(db_persist=True, expression=models.Func('startDate', 'endDate', models.Value('[]'), function='daterange', output_field=django.contrib.postgres.fields.ranges.DateRangeField()), output_field=django.contrib.postgres.fields.ranges.DateRangeField()),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['owner', 'active_range'], name='employee_owner_active_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_employee_active_range'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:25
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_schedule_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(max_length=20, verbose_name='entity')),
+                ('entity_id', models.BigIntegerField(verbose_name='entity id')),
+                ('operation', models.CharField(choices=[('create', 'create'), ('update', 'update'), ('delete', 'delete')], max_length=6, verbose_name='operation')),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='recorded on')),
+                ('owner', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='changes', to='core.owner')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'id'], name='changelog_owner_seq_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftDigestCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_seq', models.BigIntegerField(default=0, verbose_name='last notified change')),
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='digest_cursor', to='core.owner')),
+            ],
+        ),
+    ]
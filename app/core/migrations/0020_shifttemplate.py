@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:32
+
+import django.contrib.postgres.fields
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_shiftdigestcursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', django.contrib.postgres.fields.ArrayField(base_field=models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')]), size=None, verbose_name='weekdays')),
+                ('interval', models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)], verbose_name='every n weeks')),
+                ('start_time', models.TimeField(verbose_name='start time')),
+                ('end_time', models.TimeField(verbose_name='end time')),
+                ('valid_from', models.DateField(verbose_name='valid from')),
+                ('valid_until', models.DateField(blank=True, null=True, verbose_name='valid until')),
+                ('excluded_dates', django.contrib.postgres.fields.ArrayField(base_field=models.DateField(), blank=True, default=list, size=None, verbose_name='cancelled occurrences')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_templates', to='core.employee')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_templates', to='core.owner')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shift_templates', to='core.task')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='shift',
+            name='template',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='core.shifttemplate'),
+        ),
+        migrations.AddConstraint(
+            model_name='shift',
+            constraint=models.UniqueConstraint(fields=('template', 'shift_date'), name='unique_template_occurrence'),
+        ),
+        migrations.AddIndex(
+            model_name='shifttemplate',
+            index=models.Index(fields=['owner', 'valid_from'], name='shifttemplate_owner_from_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:43
+
+import core.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_trigram_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='mobile_phone',
+            field=core.fields.LazyPhoneNumberField(blank=True, max_length=128, region='IT', verbose_name='mobile'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='phone',
+            field=core.fields.LazyPhoneNumberField(blank=True, max_length=128, region='IT', verbose_name=' phone'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:52
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_lazy_phone_numbers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(max_length=20, verbose_name='entity')),
+                ('entity_id', models.BigIntegerField(verbose_name='entity id')),
+                ('day', models.DateField(verbose_name='day')),
+                ('valid', django.contrib.postgres.fields.ranges.DateTimeRangeField(verbose_name='valid')),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('changed_by', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('owner', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.owner')),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GistIndex(fields=['owner', 'day', 'valid'], name='audit_owner_day_valid_idx'), models.Index(fields=['entity', 'entity_id'], name='audit_entity_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:55
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_auditversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaffingDemand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')], verbose_name='weekday')),
+                ('minute', models.PositiveSmallIntegerField(validators=[django.core.validators.MaxValueValidator(1439)], verbose_name='bucket start, minutes after midnight')),
+                ('headcount', models.PositiveSmallIntegerField(verbose_name='headcount')),
+                ('forecast', models.BooleanField(default=False, verbose_name='forecast')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='staffing_demand', to='core.owner')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand', to='core.task')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('task', 'weekday', 'minute'), name='unique_demand_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_staffingdemand'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShiftRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('cover', 'cover'), ('swap', 'swap')], max_length=5, verbose_name='kind')),
+                ('status', models.CharField(choices=[('open', 'open'), ('accepted', 'accepted'), ('cancelled', 'cancelled')], default='open', max_length=9, verbose_name='status')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='requested on')),
+                ('decided', models.DateTimeField(blank=True, null=True, verbose_name='decided on')),
+                ('accepted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='accepted_shift_requests', to='core.employee')),
+                ('owner', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='shift_requests', to='core.owner')),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_requests', to='core.employee')),
+                ('shift', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='requests', to='core.shift')),
+                ('swapped_shift', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.shift')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'status'], name='shift_request_owner_status_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'open')), fields=('shift',), name='unique_open_request_per_shift')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:31
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_shiftrequest'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='country_name',
+            field=models.CharField(choices=core.models.country_choices, default='IT', max_length=2),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='province_name',
+            field=models.CharField(blank=True, choices=core.models.province_choices, max_length=250, verbose_name='province name'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='region_name',
+            field=models.CharField(blank=True, choices=core.models.region_choices, max_length=250, verbose_name='region name'),
+        ),
+    ]
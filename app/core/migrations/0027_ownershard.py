@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_lazy_choice_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OwnerShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=30, verbose_name='database alias')),
+                ('frozen', models.BooleanField(default=False, verbose_name='writes paused')),
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='shard', to='core.owner')),
+            ],
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_ownershard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event', models.BigIntegerField(default=0, verbose_name='last reconciled event')),
+                ('checked_until', models.DateTimeField(null=True, verbose_name='absences checked until')),
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_cursor', to='core.owner')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AttendanceEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('in', 'clock-in'), ('out', 'clock-out')], max_length=3, verbose_name='kind')),
+                ('occurred', models.DateTimeField(verbose_name='occurred')),
+                ('source', models.CharField(choices=[('badge', 'badge'), ('mobile', 'mobile')], default='badge', max_length=6, verbose_name='source')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_events', to='core.employee')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.owner')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('employee', 'occurred', 'kind'), name='unique_attendance_event')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AttendanceRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shift_date', models.DateField(verbose_name='shift date')),
+                ('clock_in', models.DateTimeField(blank=True, null=True, verbose_name='clock-in')),
+                ('clock_out', models.DateTimeField(blank=True, null=True, verbose_name='clock-out')),
+                ('late_minutes', models.PositiveIntegerField(default=0, verbose_name='minutes late')),
+                ('overtime_minutes', models.PositiveIntegerField(default=0, verbose_name='minutes of overtime')),
+                ('absent', models.BooleanField(default=False, verbose_name='absent')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='updated on')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_records', to='core.employee')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.owner')),
+                ('shift', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='attendance', to='core.shift')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'shift_date'], name='attendance_owner_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_attendance'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='employee',
+            constraint=models.CheckConstraint(condition=models.Q(('endDate__isnull', True), ('endDate__gte', models.F('startDate')), _connector='OR'), name='employee_end_after_start'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_employee_end_after_start'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['owner', 'entity', 'entity_id', '-id'], name='changelog_entity_idx'),
+        ),
+    ]
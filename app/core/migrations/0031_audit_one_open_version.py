@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_changelog_entity_idx'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='auditversion',
+            constraint=models.UniqueConstraint(condition=models.Q(('valid__upper_inf', True)), fields=('entity', 'entity_id'), name='audit_one_open_version'),
+        ),
+    ]
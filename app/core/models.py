@@ -3,26 +3,59 @@ from django.contrib.auth.models import (
     BaseUserManager,
     PermissionsMixin
 )
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth import get_user_model
-from django_countries.fields import CountryField
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils.translation import gettext_lazy as _
-from django_countries import Countries
-from localflavor.it import it_region, it_province
-from phonenumber_field.modelfields import PhoneNumberField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.core.exceptions import ValidationError
 from django .db.models import Q
+from django.contrib.postgres.fields import (
+    ArrayField,
+    DateRangeField,
+    DateTimeRangeField
+)
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
+from django.db.models.functions import Upper
+from django.db.backends.postgresql.psycopg_any import DateRange
 
+from core.fields import LazyPhoneNumberField
 
-class LimitCountries(Countries):
 
-    only = [
-        "IT",
-    ]
+# the choice tables are imported on first use: django_countries builds its
+# collation tables on import, which alone made up most of the startup time
+
+
+def country_choices():
+    from core.countries import LimitCountries
+    return [(country.code, country.name) for country in LimitCountries()]
+
+
+def province_choices():
+    from localflavor.it.it_province import PROVINCE_CHOICES
+    return PROVINCE_CHOICES
+
+
+def region_choices():
+    from localflavor.it.it_region import REGION_CHOICES
+    return REGION_CHOICES
+
+
+# what __str__, get_full_name and the e-mails need; everything else of a
+# user, phone numbers included, is only read on the user's own pages
+USER_DISPLAY_FIELDS = [
+    'id', 'email', 'first_name', 'last_name', 'company_name'
+]
 
 
-class UserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+
+    def display(self):
+        """only the columns needed to show users by name or email"""
+        return self.only(*USER_DISPLAY_FIELDS)
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     """Manager for users"""
 
     def create_user(self, email, password=None, **extra_fields):
@@ -44,6 +77,9 @@ class UserManager(BaseUserManager):
         return user
 
 
+USER_SEARCH_FIELDS = ['email', 'first_name', 'last_name', 'company_name']
+
+
 class User(AbstractBaseUser, PermissionsMixin):
     """User in the System"""
     email = models.EmailField(max_length=255, unique=True)
@@ -81,14 +117,18 @@ class User(AbstractBaseUser, PermissionsMixin):
         verbose_name=_("province name"),
         max_length=250,
         blank=True,
-        choices=it_province.PROVINCE_CHOICES)
+        choices=province_choices)
     region_name = models.CharField(
         verbose_name=_("region name"),
         max_length=250,
         blank=True,
-        choices=it_region.REGION_CHOICES
+        choices=region_choices
+    )
+    country_name = models.CharField(
+        max_length=2,
+        choices=country_choices,
+        default='IT'
     )
-    country_name = CountryField(countries=LimitCountries, default='IT')
     social_security_number = models.CharField(
         verbose_name=_("social security number"),
         max_length=20,
@@ -105,12 +145,12 @@ class User(AbstractBaseUser, PermissionsMixin):
         max_length=10,
         blank=True
     )
-    mobile_phone = PhoneNumberField(
+    mobile_phone = LazyPhoneNumberField(
         verbose_name=_('mobile'),
         region='IT',
         blank=True
     )
-    phone = PhoneNumberField(
+    phone = LazyPhoneNumberField(
         verbose_name=_(' phone'),
         region='IT',
         blank=True
@@ -125,6 +165,16 @@ class User(AbstractBaseUser, PermissionsMixin):
     objects = UserManager()
     USERNAME_FIELD = 'email'
 
+    class Meta:
+        # trigram indexes on UPPER(field) serve the icontains lookups
+        indexes = [
+            GinIndex(
+                OpClass(Upper(field), name='gin_trgm_ops'),
+                name=f'user_{field}_trgm_idx'
+            )
+            for field in USER_SEARCH_FIELDS
+        ]
+
     def completion_percentage(self):
 
         single_fields = [
@@ -167,6 +217,14 @@ class User(AbstractBaseUser, PermissionsMixin):
             if self.company_name else self.get_full_name()
 
 
+def user_detail_fields(prefix=''):
+    """user columns not needed for display, to defer() through relations"""
+    return [
+        prefix + field.name for field in User._meta.concrete_fields
+        if field.name not in USER_DISPLAY_FIELDS
+    ]
+
+
 class Owner(models.Model):
     """class for owner model"""
     user = models.OneToOneField(get_user_model(), on_delete=models.CASCADE)
@@ -209,6 +267,30 @@ class Contract(models.Model):
         return f'{self.owner}-{self.weekHours}-{_("week hours contract")}'
 
 
+class EmployeeQuerySet(models.QuerySet):
+    """queryset for employees"""
+
+    def with_user(self):
+        """employees with the display fields of their user"""
+        return self.select_related('user').defer(
+            *user_detail_fields('user__'))
+
+    def active_on(self, owner, date_or_range):
+        """employees of owner active on a date or during a date range
+
+        date_or_range is a date, a (start, end) pair or a DateRange; for
+        ranges an employee counts as active when the activity period
+        overlaps it. owner=None searches every owner. Served by the
+        (owner, active_range) GiST index.
+        """
+        qs = self if owner is None else self.filter(owner=owner)
+        if isinstance(date_or_range, (tuple, list)):
+            date_or_range = DateRange(*date_or_range, bounds='[]')
+        if isinstance(date_or_range, DateRange):
+            return qs.filter(active_range__overlap=date_or_range)
+        return qs.filter(active_range__contains=date_or_range)
+
+
 class Employee(models.Model):
     """class for employee mode"""
     owner = models.ForeignKey(
@@ -229,6 +311,44 @@ class Employee(models.Model):
 
     startDate = models.DateField(_('activity start date'))
     endDate = models.DateField(_('activity end date'), null=True, blank=True)
+    active_range = models.GeneratedField(
+        expression=models.Func(
+            'startDate', 'endDate', models.Value('[]'),
+            function='daterange',
+            output_field=DateRangeField()
+        ),
+        output_field=DateRangeField(),
+        db_persist=True
+    )
+
+    objects = EmployeeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GistIndex(
+                fields=['owner', 'active_range'],
+                name='employee_owner_active_idx'
+            )
+        ]
+        constraints = [
+            # daterange() of active_range refuses a reversed period
+            models.CheckConstraint(
+                condition=models.Q(endDate__isnull=True) |
+                models.Q(endDate__gte=models.F('startDate')),
+                name='employee_end_after_start'
+            )
+        ]
+
+    def clean(self):
+        if self.endDate is not None and self.startDate is not None and \
+                self.endDate < self.startDate:
+            raise ValidationError({'endDate': _(
+                'activity end date must not be before the start date')})
+
+    def is_active_on(self, day):
+        """same rule as EmployeeQuerySet.active_on for a loaded employee"""
+        return self.startDate <= day and \
+            (self.endDate is None or day <= self.endDate)
 
     def short(self):
         return self.user.get_short_name()
@@ -237,7 +357,33 @@ class Employee(models.Model):
         return self.user.__str__()
 
 
-class Task(models.Model):
+class ChangeLogMixin:
+    """records every create and update of the model in the change log
+
+    Deletes, cascades included, are recorded by the post_delete receiver
+    in core.signals.
+    """
+
+    def save(self, *args, **kwargs):
+        operation = ChangeLog.CREATE if self._state.adding \
+            else ChangeLog.UPDATE
+        # the entry goes in the same database, the owner's shard
+        using = kwargs['using'] = kwargs.get('using') or \
+            router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            ChangeLog.objects.db_manager(using).record([self], operation)
+
+    def change_data(self):
+        """compact row snapshot sent to the sync clients"""
+        return {
+            field.attname: field.value_from_object(self)
+            for field in self._meta.concrete_fields
+            if not field.primary_key and not field.generated
+        }
+
+
+class Task(ChangeLogMixin, models.Model):
     """class for shift  task"""
     owner = models.ForeignKey(
         Owner,
@@ -248,6 +394,12 @@ class Task(models.Model):
     name = models.CharField(_('task name'), max_length=250, blank=False)
 
     class Meta:
+        indexes = [
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='task_name_trgm_idx'
+            )
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['owner', 'name'],
@@ -260,7 +412,19 @@ class Task(models.Model):
         return self.name
 
 
-class Schedule(models.Model):
+class ScheduleQuerySet(models.QuerySet):
+    """queryset for schedules"""
+
+    def bump_version(self):
+        """mark the selected schedules as changed
+
+        Cached renderings of a schedule day are keyed on its version, so
+        every write touching a schedule's shifts must bump it.
+        """
+        return self.update(version=models.F('version') + 1)
+
+
+class Schedule(ChangeLogMixin, models.Model):
     owner = models.ForeignKey(
         Owner, related_name='daly_schedule',
         on_delete=models.CASCADE
@@ -268,12 +432,19 @@ class Schedule(models.Model):
     date = models.DateField(_('schedule date'))
     start = models.DateTimeField(_('activity datetime start'))
     end = models.DateTimeField(_('activity datetime end'))
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = ScheduleQuerySet.as_manager()
 
     class Meta:
         constraints = [
             models.UniqueConstraint(
                 fields=['owner', 'date'],
                 name='unique_schedule_by_owner'
+            ),
+            models.UniqueConstraint(
+                fields=['id', 'owner'],
+                name='unique_schedule_id_owner'
             )
         ]
 
@@ -289,8 +460,164 @@ class Schedule(models.Model):
             )
 
 
-class Shift(models.Model):
+class ShiftTemplate(models.Model):
+    """weekly recurring shift, expanded on demand by core.recurrence"""
+    WEEKDAY_CHOICES = [
+        (0, _('Monday')),
+        (1, _('Tuesday')),
+        (2, _('Wednesday')),
+        (3, _('Thursday')),
+        (4, _('Friday')),
+        (5, _('Saturday')),
+        (6, _('Sunday')),
+    ]
+
+    owner = models.ForeignKey(
+        Owner,
+        related_name='shift_templates',
+        on_delete=models.CASCADE
+    )
+    employee = models.ForeignKey(
+        Employee,
+        related_name='shift_templates',
+        on_delete=models.CASCADE
+    )
+    task = models.ForeignKey(
+        Task,
+        related_name='shift_templates',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    weekdays = ArrayField(
+        models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES),
+        verbose_name=_('weekdays')
+    )
+    interval = models.PositiveSmallIntegerField(
+        _('every n weeks'),
+        default=1,
+        validators=[MinValueValidator(1)]
+    )
+    start_time = models.TimeField(_('start time'))
+    end_time = models.TimeField(_('end time'))
+    valid_from = models.DateField(_('valid from'))
+    valid_until = models.DateField(_('valid until'), null=True, blank=True)
+    excluded_dates = ArrayField(
+        models.DateField(),
+        verbose_name=_('cancelled occurrences'),
+        default=list,
+        blank=True
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['owner', 'valid_from'],
+                name='shifttemplate_owner_from_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.employee} ' \
+               f'[{self.start_time:%H:%M}-{self.end_time:%H:%M}]'
+
+    def clean(self):
+        if self.employee.owner_id != self.owner_id:
+            raise ValidationError(
+                _('Template and Employee must have the same owner')
+            )
+        if self.valid_until and self.valid_until < self.valid_from:
+            raise ValidationError(
+                _('valid until must be after valid from')
+            )
+        if self.start_time == self.end_time:
+            raise ValidationError(
+                _('the shift must end after the start time')
+            )
+
+
+class StaffingDemand(models.Model):
+    """people needed on a task in a time bucket of a weekday
+
+    Forecast rows are derived by core.demand from the past shifts and
+    replaced by the next forecast; rows entered by hand are kept.
+    """
+    owner = models.ForeignKey(
+        Owner,
+        related_name='staffing_demand',
+        on_delete=models.CASCADE
+    )
+    task = models.ForeignKey(
+        Task,
+        related_name='demand',
+        on_delete=models.CASCADE
+    )
+    weekday = models.PositiveSmallIntegerField(
+        _('weekday'),
+        choices=ShiftTemplate.WEEKDAY_CHOICES
+    )
+    minute = models.PositiveSmallIntegerField(
+        _('bucket start, minutes after midnight'),
+        validators=[MaxValueValidator(24 * 60 - 1)]
+    )
+    headcount = models.PositiveSmallIntegerField(_('headcount'))
+    forecast = models.BooleanField(_('forecast'), default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['task', 'weekday', 'minute'],
+                name='unique_demand_bucket'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.task} {self.get_weekday_display()} ' \
+               f'{self.minute // 60:02d}:{self.minute % 60:02d} ' \
+               f'x{self.headcount}'
+
+    def clean(self):
+        if self.task.owner_id != self.owner_id:
+            raise ValidationError(
+                _('Demand and Task must have the same owner')
+            )
+
+
+class ShiftQuerySet(models.QuerySet):
+    """queryset for shifts"""
+
+    def for_owner(self, owner, start=None, end=None):
+        """shifts of an owner, optionally limited to a date range
+
+        Filters on the denormalized owner column so the
+        (owner, shift_date, start_time) index serves the whole query
+        without joining through schedule.
+        """
+        qs = self.filter(owner=owner)
+        if start is not None:
+            qs = qs.filter(shift_date__gte=start)
+        if end is not None:
+            qs = qs.filter(shift_date__lte=end)
+        return qs.order_by('shift_date', 'start_time')
+
+    def owner_mismatch(self):
+        """shifts whose owner differs from the owner of their schedule"""
+        return self.exclude(owner=models.F('schedule__owner'))
+
+    def with_names(self):
+        """shifts with what __str__ and the shift lists show"""
+        return self.select_related('employee__user', 'task').defer(
+            *user_detail_fields('employee__user__'))
+
+
+class Shift(ChangeLogMixin, models.Model):
     """models for shift """
+    owner = models.ForeignKey(
+        Owner,
+        related_name='owner_shifts',
+        on_delete=models.CASCADE,
+        editable=False
+    )
     schedule = models.ForeignKey(
         Schedule,
         related_name='daily_shift',
@@ -317,11 +644,31 @@ class Shift(models.Model):
         null=True,
         blank=True
     )
+    template = models.ForeignKey(
+        ShiftTemplate,
+        related_name='occurrences',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False
+    )
+
+    objects = ShiftQuerySet.as_manager()
 
     class Meta:
         indexes = [
             models.Index(fields=['employee', 'shift_date']),
-            models.Index(fields=['schedule', 'start_time'])
+            models.Index(fields=['schedule', 'start_time']),
+            models.Index(
+                fields=['owner', 'shift_date', 'start_time'],
+                name='shift_owner_date_start_idx'
+            )
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['template', 'shift_date'],
+                name='unique_template_occurrence'
+            )
         ]
 
     def __str__(self):
@@ -332,9 +679,14 @@ class Shift(models.Model):
                f'-[{self.task}]'
 
     def clean(self):
-        if self.employee.endDate and \
-                self.schedule.date > self.employee.endDate:
-            raise ValidationError(_('employee’s contract has ended '))
+        if None in (self.schedule_id, self.employee_id, self.start_time,
+                    self.end_time):
+            # the missing or refused fields are reported on their own
+            return
+        if not self.employee.is_active_on(self.schedule.date):
+            raise ValidationError(
+                _('employee’s contract is not active on this date')
+            )
         if self.shift_date != self.schedule.date:
             raise ValidationError(_('Shift date must match schedule date'))
         if self.start_time >= self.end_time:
@@ -371,4 +723,400 @@ class Shift(models.Model):
 
     def save(self, *args, **kwargs):
         # self.full_clean()
+        # owner is denormalized from the schedule, the database keeps
+        # them consistent through the (schedule, owner) foreign key
+        self.owner_id = self.schedule.owner_id
+        # bumps the new schedule and, when moving, the previous one
+        changed = Q(pk=self.schedule_id)
+        if self.pk:
+            changed |= Q(daily_shift=self.pk)
+        using = kwargs.get('using') or \
+            router.db_for_write(Shift, instance=self)
+        Schedule.objects.using(using).filter(changed).bump_version()
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or \
+            router.db_for_write(Shift, instance=self)
+        Schedule.objects.using(using).filter(
+            pk=self.schedule_id).bump_version()
+        return super().delete(*args, **kwargs)
+
+
+class ShiftRequest(models.Model):
+    """an employee asking a colleague to cover or swap a shift
+
+    A cover hands the shift over; a swap trades it for a shift of the
+    colleague in the same week. Eligible colleagues are found by
+    core.swaps.
+    """
+    COVER = 'cover'
+    SWAP = 'swap'
+    KIND_CHOICES = [
+        (COVER, _('cover')),
+        (SWAP, _('swap')),
+    ]
+    OPEN = 'open'
+    ACCEPTED = 'accepted'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (OPEN, _('open')),
+        (ACCEPTED, _('accepted')),
+        (CANCELLED, _('cancelled')),
+    ]
+
+    owner = models.ForeignKey(
+        Owner,
+        related_name='shift_requests',
+        on_delete=models.CASCADE,
+        editable=False
+    )
+    shift = models.ForeignKey(
+        Shift,
+        related_name='requests',
+        on_delete=models.CASCADE
+    )
+    requested_by = models.ForeignKey(
+        Employee,
+        related_name='shift_requests',
+        on_delete=models.CASCADE
+    )
+    kind = models.CharField(_('kind'), max_length=5, choices=KIND_CHOICES)
+    status = models.CharField(
+        _('status'),
+        max_length=9,
+        choices=STATUS_CHOICES,
+        default=OPEN
+    )
+    accepted_by = models.ForeignKey(
+        Employee,
+        related_name='accepted_shift_requests',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    # the colleague's shift given in exchange, for swaps
+    swapped_shift = models.ForeignKey(
+        Shift,
+        related_name='+',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    created = models.DateTimeField(_('requested on'), auto_now_add=True)
+    decided = models.DateTimeField(_('decided on'), null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['owner', 'status'],
+                name='shift_request_owner_status_idx'
+            )
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['shift'],
+                condition=models.Q(status='open'),
+                name='unique_open_request_per_shift'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.shift}'
+
+    def clean(self):
+        if self.shift.employee_id != self.requested_by_id:
+            raise ValidationError(
+                _('only the employee of the shift can request a change')
+            )
+
+    def save(self, *args, **kwargs):
+        self.owner_id = self.shift.owner_id
         super().save(*args, **kwargs)
+
+
+class ChangeLogQuerySet(models.QuerySet):
+    """queryset for the change log"""
+
+    # advisory lock namespace serializing the change log writers of an owner
+    LOCK_NAMESPACE = 29
+
+    def record(self, instances, operation):
+        """append one entry per instance in the current transaction
+
+        Writers of the same owner are serialized until commit, so entries
+        of an owner become visible in sequence order and a client reading
+        since its last sequence never skips an entry.
+        """
+        entries = [
+            self.model(
+                owner_id=instance.owner_id,
+                entity=instance._meta.model_name,
+                entity_id=instance.pk,
+                operation=operation,
+                data=instance.change_data()
+            )
+            for instance in instances
+        ]
+        if not entries:
+            return []
+        with transaction.atomic(using=self.db), \
+                transaction.get_connection(self.db).cursor() as cursor:
+            for owner_id in sorted({entry.owner_id for entry in entries}):
+                cursor.execute(
+                    'SELECT pg_advisory_xact_lock(%s, %s)',
+                    [self.LOCK_NAMESPACE, owner_id]
+                )
+            created = self.bulk_create(entries)
+            # imported here: core.audit imports the models
+            from core import audit
+            audit.touch(self.db, [
+                (entry.entity, entry.entity_id) for entry in entries
+            ])
+        return created
+
+    def since(self, owner, seq):
+        """entries of owner after seq, in sequence order"""
+        return self.filter(owner=owner, id__gt=seq).order_by('id')
+
+
+class ChangeLog(models.Model):
+    """append-only log of schedule, shift and task changes"""
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    OPERATION_CHOICES = [
+        (CREATE, _('create')),
+        (UPDATE, _('update')),
+        (DELETE, _('delete')),
+    ]
+
+    # no database constraint: the entries outlive a deleted owner so the
+    # cascaded deletes can still be recorded
+    owner = models.ForeignKey(
+        Owner,
+        related_name='changes',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False
+    )
+    entity = models.CharField(_('entity'), max_length=20)
+    entity_id = models.BigIntegerField(_('entity id'))
+    operation = models.CharField(
+        _('operation'),
+        max_length=6,
+        choices=OPERATION_CHOICES
+    )
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    created = models.DateTimeField(_('recorded on'), auto_now_add=True)
+
+    objects = ChangeLogQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['owner', 'id'],
+                name='changelog_owner_seq_idx'
+            ),
+            # the last entries of some shifts, for the digests
+            models.Index(
+                fields=['owner', 'entity', 'entity_id', '-id'],
+                name='changelog_entity_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'#{self.pk} {self.operation} {self.entity} {self.entity_id}'
+
+    def as_delta(self):
+        return {
+            'seq': self.pk,
+            'entity': self.entity,
+            'op': self.operation,
+            'id': self.entity_id,
+            'data': self.data,
+        }
+
+
+class AuditVersion(models.Model):
+    """one version of a shift or schedule over the time it was current
+
+    data holds only the fields changed from the previous version; the
+    first version holds them all. A delete closes the last version.
+    Written by core.audit in the transaction of the change, at most one
+    per transaction.
+    """
+    owner = models.ForeignKey(
+        Owner,
+        related_name='+',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False
+    )
+    entity = models.CharField(_('entity'), max_length=20)
+    entity_id = models.BigIntegerField(_('entity id'))
+    day = models.DateField(_('day'))
+    valid = DateTimeRangeField(_('valid'))
+    changed_by = models.ForeignKey(
+        get_user_model(),
+        related_name='+',
+        null=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False
+    )
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        indexes = [
+            # serves the "as of" lookups of an owner's days
+            GistIndex(
+                fields=['owner', 'day', 'valid'],
+                name='audit_owner_day_valid_idx'
+            ),
+            models.Index(
+                fields=['entity', 'entity_id'],
+                name='audit_entity_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['entity', 'entity_id'],
+                condition=models.Q(valid__upper_inf=True),
+                name='audit_one_open_version'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.entity} {self.entity_id} {self.valid}'
+
+
+class ShiftDigestCursor(models.Model):
+    """last change log entry already notified to an owner's employees"""
+    owner = models.OneToOneField(
+        Owner,
+        related_name='digest_cursor',
+        on_delete=models.CASCADE
+    )
+    last_seq = models.BigIntegerField(_('last notified change'), default=0)
+
+    def __str__(self):
+        return f'{self.owner} notified up to #{self.last_seq}'
+
+
+class AttendanceEvent(models.Model):
+    """a badge or mobile clock-in or clock-out of an employee
+
+    Written in batches by core.attendance; a device sending an event
+    again is ignored by the unique constraint.
+    """
+    IN = 'in'
+    OUT = 'out'
+    KIND_CHOICES = [
+        (IN, _('clock-in')),
+        (OUT, _('clock-out')),
+    ]
+    BADGE = 'badge'
+    MOBILE = 'mobile'
+    SOURCE_CHOICES = [
+        (BADGE, _('badge')),
+        (MOBILE, _('mobile')),
+    ]
+
+    owner = models.ForeignKey(
+        Owner,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    employee = models.ForeignKey(
+        Employee,
+        related_name='attendance_events',
+        on_delete=models.CASCADE
+    )
+    kind = models.CharField(_('kind'), max_length=3, choices=KIND_CHOICES)
+    occurred = models.DateTimeField(_('occurred'))
+    source = models.CharField(
+        _('source'),
+        max_length=6,
+        choices=SOURCE_CHOICES,
+        default=BADGE
+    )
+
+    class Meta:
+        constraints = [
+            # also serves the events of an employee over a time range
+            models.UniqueConstraint(
+                fields=['employee', 'occurred', 'kind'],
+                name='unique_attendance_event'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.employee_id} {self.kind} {self.occurred}'
+
+
+class AttendanceRecord(models.Model):
+    """how a planned shift was actually worked, by core.attendance"""
+    owner = models.ForeignKey(
+        Owner,
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    shift = models.OneToOneField(
+        Shift,
+        related_name='attendance',
+        on_delete=models.CASCADE
+    )
+    employee = models.ForeignKey(
+        Employee,
+        related_name='attendance_records',
+        on_delete=models.CASCADE
+    )
+    shift_date = models.DateField(_('shift date'))
+    clock_in = models.DateTimeField(_('clock-in'), null=True, blank=True)
+    clock_out = models.DateTimeField(_('clock-out'), null=True, blank=True)
+    late_minutes = models.PositiveIntegerField(_('minutes late'), default=0)
+    overtime_minutes = models.PositiveIntegerField(
+        _('minutes of overtime'), default=0)
+    absent = models.BooleanField(_('absent'), default=False)
+    updated = models.DateTimeField(_('updated on'), auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['owner', 'shift_date'],
+                name='attendance_owner_date_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.shift_id} attendance'
+
+
+class AttendanceCursor(models.Model):
+    """how far the attendance of an owner is reconciled"""
+    owner = models.OneToOneField(
+        Owner,
+        related_name='attendance_cursor',
+        on_delete=models.CASCADE
+    )
+    last_event = models.BigIntegerField(_('last reconciled event'), default=0)
+    checked_until = models.DateTimeField(
+        _('absences checked until'), null=True)
+
+    def __str__(self):
+        return f'{self.owner} reconciled up to #{self.last_event}'
+
+
+class OwnerShard(models.Model):
+    """database alias holding the scheduling data of an owner
+
+    Owners without a row stay on the default database; see core.sharding.
+    """
+    owner = models.OneToOneField(
+        Owner,
+        related_name='shard',
+        on_delete=models.CASCADE
+    )
+    alias = models.CharField(_('database alias'), max_length=30)
+    frozen = models.BooleanField(_('writes paused'), default=False)
+
+    def __str__(self):
+        return f'{self.owner} on {self.alias}'
@@ -0,0 +1,169 @@
+"""
+    Shift change digests for employees
+
+The change log already records every shift write, so publishing a
+schedule costs nothing extra here: a periodic task picks up the owners
+whose changes have settled and sends each affected employee one email
+summarising all of them.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Max, Min, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext as _, gettext_lazy
+
+from core import sharding
+from core.models import ChangeLog, Employee, ShiftDigestCursor
+
+LABELS = {
+    ChangeLog.CREATE: gettext_lazy('new'),
+    ChangeLog.UPDATE: gettext_lazy('changed'),
+    ChangeLog.DELETE: gettext_lazy('removed'),
+}
+
+
+def ready_owners(now=None):
+    """(owner id, last change) of owners whose changes can be notified
+
+    An owner is ready once no shift changed during the debounce window,
+    or when the oldest pending change waited longer than max wait.
+    """
+    now = now or timezone.now()
+    cursor = ShiftDigestCursor.objects.filter(
+        owner=OuterRef('owner')).values('last_seq')
+    pending = ChangeLog.objects.filter(
+        entity='shift',
+        id__gt=Coalesce(Subquery(cursor), 0)
+    ).values('owner').annotate(
+        upto=Max('id'),
+        first=Min('created'),
+        last=Max('created')
+    ).filter(
+        Q(last__lte=now - timedelta(seconds=settings.SHIFT_DIGEST_DEBOUNCE))
+        | Q(first__lte=now - timedelta(seconds=settings.SHIFT_DIGEST_MAX_WAIT))
+    ).order_by('owner')
+    return sorted(
+        (row['owner'], row['upto'])
+        for queryset in sharding.everywhere(pending) for row in queryset
+    )
+
+
+def _apply(shifts, shift_id, operation, data):
+    previous = shifts.get(shift_id)
+    if previous and previous[0] == ChangeLog.CREATE:
+        if operation == ChangeLog.DELETE:
+            del shifts[shift_id]
+            return
+        operation = ChangeLog.CREATE
+    elif previous and previous[0] == ChangeLog.DELETE and \
+            operation == ChangeLog.CREATE:
+        # taken away, then given back
+        operation = ChangeLog.UPDATE
+    shifts[shift_id] = (operation, data)
+
+
+def collapse(entries, previous=None):
+    """net change of every shift per employee
+
+    A shift created then edited is still new, and a shift created then
+    removed within the same digest is not worth mentioning. A shift given
+    to another employee is removed for the one it was taken from, known
+    from its previous entry, and new for the one it was given to.
+    previous holds {shift id: data} of the entries before the digest.
+    """
+    changes = defaultdict(dict)
+    known = dict(previous or {})
+    for entry in entries:
+        operation = entry.operation
+        employee = entry.data['employee_id']
+        before = known.get(entry.entity_id)
+        known[entry.entity_id] = entry.data
+        if before is not None and before['employee_id'] != employee:
+            _apply(changes[before['employee_id']], entry.entity_id,
+                   ChangeLog.DELETE, before)
+            if operation == ChangeLog.UPDATE:
+                operation = ChangeLog.CREATE
+        _apply(changes[employee], entry.entity_id, operation, entry.data)
+    return {employee: shifts for employee, shifts in changes.items()
+            if shifts}
+
+
+def snapshots(owner_id, entries, seq):
+    """{shift id: data} of the last entries up to seq of the shifts
+    changed, not created, first in entries"""
+    first = {}
+    for entry in entries:
+        first.setdefault(entry.entity_id, entry.operation)
+    ids = [pk for pk, operation in first.items()
+           if operation != ChangeLog.CREATE]
+    if not ids:
+        return {}
+    return dict(ChangeLog.objects.filter(
+        owner_id=owner_id,
+        entity='shift',
+        entity_id__in=ids,
+        id__lte=seq
+    ).order_by('entity_id', '-id').distinct('entity_id').values_list(
+        'entity_id', 'data'))
+
+
+def digest_body(shifts):
+    lines = []
+    for operation, data in sorted(
+            shifts.values(), key=lambda change: change[1]['start_time']):
+        start = timezone.localtime(parse_datetime(data['start_time']))
+        end = timezone.localtime(parse_datetime(data['end_time']))
+        lines.append(
+            f'- {data["shift_date"]} {start:%H:%M}-{end:%H:%M}: '
+            f'{LABELS[operation]}'
+        )
+    return '\n'.join([_('Your shifts have been updated:'), ''] + lines)
+
+
+def build_digests(changes):
+    employees = Employee.objects.filter(
+        pk__in=changes.keys()).with_user()
+    return [
+        EmailMessage(
+            subject=_('Your shifts have changed'),
+            body=digest_body(changes[employee.pk]),
+            to=[employee.user.email]
+        )
+        for employee in employees
+    ]
+
+
+def deliver(owner_id, upto):
+    """send the digests of an owner's changes up to a sequence
+
+    The cursor only moves once every batch is handed to the mail server,
+    so a failed delivery is retried as a whole by the next run.
+    """
+    with transaction.atomic(using=sharding.db_for(owner_id)):
+        cursor, _created = ShiftDigestCursor.objects.select_for_update(
+        ).get_or_create(owner_id=owner_id)
+        if cursor.last_seq >= upto:
+            return 0
+        entries = list(ChangeLog.objects.filter(
+            owner_id=owner_id,
+            entity='shift',
+            id__gt=cursor.last_seq,
+            id__lte=upto
+        ).order_by('id'))
+        messages = build_digests(collapse(
+            entries, snapshots(owner_id, entries, cursor.last_seq)))
+
+        connection = get_connection()
+        size = settings.SHIFT_DIGEST_BATCH_SIZE
+        for start in range(0, len(messages), size):
+            connection.send_messages(messages[start:start + size])
+
+        cursor.last_seq = upto
+        cursor.save(update_fields=['last_seq'])
+    return len(messages)
@@ -0,0 +1,162 @@
+"""
+    Payable hours of the shifts, split by Italian premium category
+
+Every shift is measured against three sets of time windows built once for
+the requested period: nights, Sundays and Italian public holidays. The
+windows are expressed in UTC epoch seconds from local wall-clock bounds, so
+daylight saving changes are accounted for exactly. Premium categories may
+overlap (a Sunday night counts as both), regular time is whatever falls
+in none of them.
+"""
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.conf import settings
+from django.db.models import BigIntegerField, Value
+from django.db.models.functions import Cast, Coalesce, Extract
+
+from core import intervals, replicas
+from core.models import Shift
+
+CATEGORIES = ('regular', 'night', 'sunday', 'holiday')
+TOTALS = CATEGORIES + ('total',)
+
+# fixed date national holidays, (month, day)
+FIXED_HOLIDAYS = (
+    (1, 1),    # Capodanno
+    (1, 6),    # Epifania
+    (4, 25),   # Festa della Liberazione
+    (5, 1),    # Festa del Lavoro
+    (6, 2),    # Festa della Repubblica
+    (8, 15),   # Ferragosto
+    (11, 1),   # Ognissanti
+    (12, 8),   # Immacolata Concezione
+    (12, 25),  # Natale
+    (12, 26),  # Santo Stefano
+)
+
+
+def easter(year):
+    """Easter Sunday, anonymous Gregorian algorithm"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    m = (32 + 2 * e + 2 * i - h - k) % 7
+    n = (a + 11 * h + 22 * m) // 451
+    month, day = divmod(h + m - 7 * n + 114, 31)
+    return date(year, month, day + 1)
+
+
+@lru_cache(maxsize=None)
+def holidays(year):
+    """Italian national public holidays of a year"""
+    days = {date(year, month, day) for month, day in FIXED_HOLIDAYS}
+    days.add(easter(year))
+    days.add(easter(year) + timedelta(days=1))  # Lunedì dell'Angelo
+    return frozenset(days)
+
+
+def _epoch(day, hour, zone):
+    return int(datetime.combine(day, time(hour), tzinfo=zone).timestamp())
+
+
+def windows(start, end):
+    """night, sunday and holiday windows covering the local days
+
+    Returned as {category: (starts, ends)} of sorted disjoint epoch second
+    intervals. Nights run from PAYROLL_NIGHT_START of a day to
+    PAYROLL_NIGHT_END of the next one.
+    """
+    zone = ZoneInfo(settings.PAYROLL_TIME_ZONE)
+    night_start = settings.PAYROLL_NIGHT_START
+    night_end = settings.PAYROLL_NIGHT_END
+    found = {category: ([], []) for category in CATEGORIES[1:]}
+
+    # shifts may start the evening before and end the morning after
+    day = start - timedelta(days=1)
+    while day <= end + timedelta(days=1):
+        following = day + timedelta(days=1)
+        found['night'][0].append(_epoch(day, night_start, zone))
+        found['night'][1].append(_epoch(following, night_end, zone))
+        whole_day = (_epoch(day, 0, zone), _epoch(following, 0, zone))
+        if day.weekday() == 6:
+            found['sunday'][0].append(whole_day[0])
+            found['sunday'][1].append(whole_day[1])
+        if day in holidays(day.year):
+            found['holiday'][0].append(whole_day[0])
+            found['holiday'][1].append(whole_day[1])
+        day = following
+
+    return {
+        category: intervals.merge(starts, ends)
+        for category, (starts, ends) in found.items()
+    }
+
+
+def split_minutes(starts, ends, period_start, period_end):
+    """minutes of every shift per category, as {category: array}"""
+    found = windows(period_start, period_end)
+    split = {
+        category: intervals.overlap(starts, ends, *found[category])
+        for category in CATEGORIES[1:]
+    }
+    premium = intervals.merge(
+        np.concatenate([found[category][0] for category in found]),
+        np.concatenate([found[category][1] for category in found]),
+    )
+    split['regular'] = (ends - starts) - intervals.overlap(
+        starts, ends, *premium)
+    return {category: seconds // 60 for category, seconds in split.items()}
+
+
+def _totals(keys, split):
+    """sum the per shift minutes grouped by keys"""
+    unique, index = np.unique(keys, return_inverse=True)
+    sums = {
+        name: np.bincount(index, weights=split[name], minlength=len(unique))
+        for name in TOTALS
+    }
+    return {
+        int(key): {name: int(sums[name][position]) for name in TOTALS}
+        for position, key in enumerate(unique)
+    }
+
+
+def minutes_by(keys, starts, ends, period_start, period_end):
+    """payable minutes of epoch second shifts summed per key"""
+    split = split_minutes(starts, ends, period_start, period_end)
+    split['total'] = (ends - starts) // 60
+    return _totals(keys, split)
+
+
+@replicas.reporting()
+def owner_hours(owner, start, end):
+    """payable minutes of an owner's shifts between two dates
+
+    Returns {'employees': {employee_id: minutes}, 'tasks': {task_id:
+    minutes}} where minutes maps every category and 'total' to an int;
+    shifts without a task are reported under task id None.
+    """
+    rows = Shift.objects.for_owner(owner, start, end).order_by().annotate(
+        start_epoch=Cast(Extract('start_time', 'epoch'), BigIntegerField()),
+        end_epoch=Cast(Extract('end_time', 'epoch'), BigIntegerField()),
+        task_key=Coalesce('task_id', Value(0)),
+    ).values_list('employee_id', 'task_key', 'start_epoch', 'end_epoch')
+    data = np.array(list(rows), dtype=np.int64).reshape(-1, 4)
+
+    split = split_minutes(data[:, 2], data[:, 3], start, end)
+    split['total'] = (data[:, 3] - data[:, 2]) // 60
+
+    tasks = _totals(data[:, 1], split)
+    if 0 in tasks:
+        tasks[None] = tasks.pop(0)
+    return {
+        'employees': _totals(data[:, 0], split),
+        'tasks': tasks,
+    }
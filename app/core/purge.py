@@ -0,0 +1,154 @@
+"""
+    Batched deletion of an owner and everything it owns
+
+Deleting an Owner through the ORM collects every related row in memory
+and deletes model by model in one long transaction. purge() walks the
+same relations in dependency order instead, one short transaction per
+batch of PURGE_BATCH_SIZE ids: the ids are selected by primary key and
+removed with a raw DELETE (or UPDATE for the SET_NULL relations), under a
+lock_timeout so a batch waits for a busy row no longer than
+PURGE_LOCK_TIMEOUT_MS. Memory stays bounded by one batch of ids.
+
+Every batch commits on its own, so an interrupted purge is resumed by
+running it again: each step starts from the rows still left. The owner
+row goes last, which keeps the owner listed until the purge completes.
+The change log and audit history of the owner are purged too; the rows
+are not recorded one by one. Each step runs on the database holding its
+rows, the owner's shard for the scheduling data (core.sharding).
+"""
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, \
+    transaction
+from django.db.models import Q
+
+from core import roles, sharding
+from core.models import (
+    AttendanceCursor,
+    AttendanceEvent,
+    AttendanceRecord,
+    AuditVersion,
+    ChangeLog,
+    Contract,
+    Employee,
+    Owner,
+    OwnerShard,
+    Schedule,
+    Shift,
+    ShiftDigestCursor,
+    ShiftRequest,
+    ShiftTemplate,
+    StaffingDemand,
+    Task
+)
+
+# cleared: columns set to NULL, None to delete the rows
+Step = namedtuple('Step', 'name model lookup cleared')
+
+STEPS = [
+    Step('attendance records', AttendanceRecord, 'owner', None),
+    Step('attendance events', AttendanceEvent, 'owner', None),
+    Step('attendance cursor', AttendanceCursor, 'owner', None),
+    Step('shift requests', ShiftRequest, 'owner', None),
+    Step('shifts', Shift, 'owner', None),
+    Step('foreign shift templates', Shift, 'template__owner',
+         ['template_id']),
+    Step('foreign shift tasks', Shift, 'task__owner', ['task_id']),
+    Step('shift templates', ShiftTemplate, 'owner', None),
+    Step('foreign template tasks', ShiftTemplate, 'task__owner',
+         ['task_id']),
+    Step('staffing demand', StaffingDemand, 'owner', None),
+    Step('schedules', Schedule, 'owner', None),
+    Step('employee contracts', Employee, 'contract__owner', ['contract_id']),
+    Step('employees', Employee, 'owner', ['owner_id']),
+    Step('contracts', Contract, 'owner', None),
+    Step('tasks', Task, 'owner', None),
+    Step('digest cursor', ShiftDigestCursor, 'owner', None),
+    Step('change log', ChangeLog, 'owner', None),
+    Step('audit history', AuditVersion, 'owner', None),
+    Step('shard placement', OwnerShard, 'owner', None),
+    Step('owner', Owner, 'pk', None),
+]
+
+
+def _alias(step, owner_id):
+    if issubclass(step.model, sharding.SHARDED):
+        return sharding.db_for(owner_id)
+    return DEFAULT_DB_ALIAS
+
+
+def remaining(owner_id):
+    """{step name: rows left to purge}"""
+    return {
+        step.name: step.model.objects.using(_alias(step, owner_id)).filter(
+            Q((step.lookup, owner_id))).count()
+        for step in STEPS
+    }
+
+
+def _statement(step, connection):
+    table = connection.ops.quote_name(step.model._meta.db_table)
+    if step.cleared is None:
+        return f'DELETE FROM {table} WHERE id = ANY(%s)'
+    columns = ', '.join(
+        f'{connection.ops.quote_name(column)} = NULL'
+        for column in step.cleared)
+    return f'UPDATE {table} SET {columns} WHERE id = ANY(%s)'
+
+
+def _batch(step, owner_id, size):
+    """purge one batch of a step, returns the number of rows"""
+    alias = _alias(step, owner_id)
+    connection = connections[alias]
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('lock_timeout', %s, true)",
+            [f'{settings.PURGE_LOCK_TIMEOUT_MS}ms']
+        )
+        ids = list(step.model.objects.using(alias).filter(
+            Q((step.lookup, owner_id))
+        ).order_by('pk').values_list('pk', flat=True)[:size])
+        if ids:
+            cursor.execute(_statement(step, connection), [ids])
+        return len(ids)
+
+
+def _retrying(step, owner_id, size):
+    """a batch, tried again after a lock timeout"""
+    for attempt in range(settings.PURGE_RETRIES):
+        try:
+            return _batch(step, owner_id, size)
+        except OperationalError:
+            if attempt + 1 == settings.PURGE_RETRIES:
+                raise
+            time.sleep(2 ** attempt)
+
+
+def purge(owner_id, batch_size=None, progress=None):
+    """delete an owner and its rows, returns {step name: rows}
+
+    progress, when given, is called with (step name, rows so far) after
+    every batch.
+    """
+    size = batch_size or settings.PURGE_BATCH_SIZE
+    user_id = Owner.objects.filter(pk=owner_id).values_list(
+        'user_id', flat=True).first()
+    # left out of the shards holding owners once its placement is purged
+    alias = sharding.db_for(owner_id)
+    done = {}
+    for step in STEPS:
+        done[step.name] = 0
+        while True:
+            count = _retrying(step, owner_id, size)
+            if not count:
+                break
+            done[step.name] += count
+            if progress:
+                progress(step.name, done[step.name])
+    # the copies of the owner row on the other shards
+    sharding.drop_global(Owner, owner_id, [alias])
+    if user_id is not None:
+        roles.invalidate(user_id)
+    return done
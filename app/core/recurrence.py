@@ -0,0 +1,212 @@
+"""
+    Lazy expansion of the recurring shift templates
+
+Templates are expanded in memory whenever a date range is queried, by
+the calendars through expand(); only the occurrences inside the rolling
+planning window, or the ones edited one by one, are written as real Shift
+rows, with one bulk insert. Template times are wall clock times of
+SHIFT_TEMPLATE_TIME_ZONE, so an occurrence keeps its local hours across
+daylight saving changes.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core import dashboard, sharding
+from core.models import (
+    ChangeLog,
+    Schedule,
+    Shift,
+    ShiftTemplate,
+    user_detail_fields
+)
+
+
+def occurrence_dates(template, start, end):
+    """dates between start and end, both included, the template occurs on"""
+    first = max(start, template.valid_from)
+    last = min(end, template.valid_until) if template.valid_until else end
+    # weeks are counted from the monday of the first valid week
+    anchor = template.valid_from - timedelta(
+        days=template.valid_from.weekday())
+    weekdays = set(template.weekdays)
+    excluded = set(template.excluded_dates)
+    day = first
+    while day <= last:
+        weeks = (day - anchor).days // 7
+        if day.weekday() in weekdays and \
+                weeks % template.interval == 0 and day not in excluded:
+            yield day
+        day += timedelta(days=1)
+
+
+def occurrence(template, day):
+    """unsaved shift of a template on a day, ending next day if overnight"""
+    zone = ZoneInfo(settings.SHIFT_TEMPLATE_TIME_ZONE)
+    start = datetime.combine(day, template.start_time, tzinfo=zone)
+    end_day = day if template.end_time > template.start_time \
+        else day + timedelta(days=1)
+    end = datetime.combine(end_day, template.end_time, tzinfo=zone)
+    return Shift(
+        owner_id=template.owner_id,
+        employee=template.employee,
+        task=template.task,
+        template=template,
+        shift_date=day,
+        start_time=start,
+        end_time=end
+    )
+
+
+def templates_for(owner, start, end):
+    return ShiftTemplate.objects.filter(
+        owner=owner,
+        valid_from__lte=end
+    ).filter(
+        Q(valid_until__isnull=True) | Q(valid_until__gte=start)
+    ).select_related('employee__user', 'task').defer(
+        *user_detail_fields('employee__user__'))
+
+
+def pending_occurrences(templates, start, end):
+    """occurrences of the templates not written as shifts yet"""
+    if not templates:
+        return []
+    materialized = set(Shift.objects.filter(
+        template__in=templates,
+        shift_date__range=(start, end)
+    ).values_list('template_id', 'shift_date'))
+    return [
+        occurrence(template, day)
+        for template in templates
+        for day in occurrence_dates(template, start, end)
+        if (template.pk, day) not in materialized
+        and template.employee.is_active_on(day)
+    ]
+
+
+def expand(owner, start, end, shifts=None, employee=None):
+    """real shifts and template occurrences of an owner, in time order
+
+    shifts, the real shifts of the range, default to all the owner's;
+    employee limits the templates expanded to the ones of an employee.
+    """
+    if shifts is None:
+        shifts = Shift.objects.for_owner(owner, start, end).with_names()
+    templates = templates_for(owner, start, end)
+    if employee is not None:
+        templates = templates.filter(employee=employee)
+    return sorted(
+        list(shifts) + pending_occurrences(list(templates), start, end),
+        key=lambda shift: shift.start_time)
+
+
+def _overlaps(busy, shift):
+    return any(start < shift.end_time and shift.start_time < end
+               for start, end in busy)
+
+
+def materialize(owner, start, end, templates=None):
+    """write the pending occurrences between two dates as shifts
+
+    Missing schedules are created around their day's occurrences.
+    Occurrences falling outside an existing schedule or overlapping
+    another shift of the employee are left out and returned as conflicts.
+    Returns (created shifts, conflicting occurrences).
+    """
+    with transaction.atomic(using=sharding.db_for(owner)):
+        queryset = templates if templates is not None \
+            else templates_for(owner, start, end)
+        # locking the templates serializes concurrent materializations
+        templates = list(queryset.select_for_update(of=('self',)))
+        pending = pending_occurrences(templates, start, end)
+        if not pending:
+            return [], []
+
+        days = {shift.shift_date for shift in pending}
+        schedules = {
+            schedule.date: schedule
+            for schedule in Schedule.objects.filter(owner=owner,
+                                                    date__in=days)
+        }
+        new_schedules = _create_schedules(
+            owner, [shift for shift in pending
+                    if shift.shift_date not in schedules])
+        schedules.update((schedule.date, schedule)
+                         for schedule in new_schedules)
+
+        busy = defaultdict(list)
+        for employee_id, day, shift_start, shift_end in Shift.objects.filter(
+                employee__in={shift.employee_id for shift in pending},
+                shift_date__in=days
+        ).values_list('employee_id', 'shift_date', 'start_time', 'end_time'):
+            busy[employee_id, day].append((shift_start, shift_end))
+
+        accepted, conflicts = [], []
+        for shift in pending:
+            schedule = schedules[shift.shift_date]
+            key = (shift.employee_id, shift.shift_date)
+            if not (schedule.start <= shift.start_time <
+                    shift.end_time <= schedule.end) or \
+                    _overlaps(busy[key], shift):
+                conflicts.append(shift)
+                continue
+            shift.schedule = schedule
+            busy[key].append((shift.start_time, shift.end_time))
+            accepted.append(shift)
+
+        created = Shift.objects.bulk_create(accepted)
+        ChangeLog.objects.record(new_schedules + created, ChangeLog.CREATE)
+        Schedule.objects.filter(
+            pk__in={shift.schedule_id for shift in created}
+        ).bump_version()
+        dashboard.invalidate(owner.pk)
+    return created, conflicts
+
+
+def _create_schedules(owner, shifts):
+    bounds = {}
+    for shift in shifts:
+        low, high = bounds.get(shift.shift_date,
+                               (shift.start_time, shift.end_time))
+        bounds[shift.shift_date] = (min(low, shift.start_time),
+                                    max(high, shift.end_time))
+    return Schedule.objects.bulk_create([
+        Schedule(owner=owner, date=day, start=low, end=high)
+        for day, (low, high) in bounds.items()
+    ])
+
+
+def materialize_window(owner):
+    """materialize the rolling planning window from today"""
+    today = timezone.localdate(
+        timezone=ZoneInfo(settings.SHIFT_TEMPLATE_TIME_ZONE))
+    end = today + timedelta(days=settings.SHIFT_TEMPLATE_WINDOW_DAYS)
+    return materialize(owner, today, end)
+
+
+def materialize_occurrence(template, day):
+    """write a single occurrence as a shift so it can be edited"""
+    created, _conflicts = materialize(
+        template.owner, day, day,
+        templates=ShiftTemplate.objects.filter(pk=template.pk)
+    )
+    return created[0] if created else template.occurrences.filter(
+        shift_date=day).first()
+
+
+def cancel_occurrence(template, day):
+    """skip one occurrence, removing its shift if already written"""
+    with transaction.atomic(using=sharding.db_for(template.owner_id)):
+        template = ShiftTemplate.objects.select_for_update().get(
+            pk=template.pk)
+        if day not in template.excluded_dates:
+            template.excluded_dates.append(day)
+            template.save(update_fields=['excluded_dates'])
+        for shift in template.occurrences.filter(shift_date=day):
+            shift.delete()
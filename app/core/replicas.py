@@ -0,0 +1,102 @@
+"""
+    Read replica routing for reporting workloads
+
+Reads run on a replica only inside reporting(), so every other query
+keeps reading its own writes on the primary. A client that wrote to
+the tables of the REPLICA_PIN_APPS is pinned to the primary for
+REPLICA_STICKY_SECONDS by a cookie set in ReplicaPinMiddleware; a
+session saved on every request does not pin it. A replica lagging more
+than REPLICA_MAX_LAG_SECONDS is skipped until it catches up.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+PIN_COOKIE = 'replica_pin'
+
+_reporting = ContextVar('replica_reporting', default=False)
+# {'pinned': bool, 'wrote': bool} of the current request
+request_state = ContextVar('replica_request_state', default=None)
+# alias: (checked at, healthy), per process
+_health = {}
+
+LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+@contextmanager
+def reporting():
+    """run the reads of the block on a replica when one is usable"""
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+def aliases():
+    return [alias for alias in settings.DATABASES
+            if alias.startswith('replica')]
+
+
+def lag(alias):
+    """seconds the replica is behind the primary, 0 when caught up"""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        seconds = cursor.fetchone()[0]
+    # NULL on a server that is not replaying, i.e. not a replica
+    return float(seconds or 0)
+
+
+def healthy(alias):
+    """replica reachable and within the lag threshold, checked at most
+    every REPLICA_LAG_CHECK_SECONDS"""
+    now = time.monotonic()
+    checked, result = _health.get(alias, (None, False))
+    if checked is None or now - checked > settings.REPLICA_LAG_CHECK_SECONDS:
+        try:
+            result = lag(alias) <= settings.REPLICA_MAX_LAG_SECONDS
+        except DatabaseError:
+            result = False
+        _health[alias] = (now, result)
+    return result
+
+
+class ReplicaRouter:
+    """send reporting reads to a healthy replica, everything else to the
+    primary"""
+
+    def db_for_read(self, model, **hints):
+        if not _reporting.get():
+            return None
+        state = request_state.get()
+        if state is not None and (state['pinned'] or state['wrote']):
+            return None
+        usable = [alias for alias in aliases() if healthy(alias)]
+        return random.choice(usable) if usable else None
+
+    def db_for_write(self, model, **hints):
+        state = request_state.get()
+        if state is not None and \
+                model._meta.app_label in settings.REPLICA_PIN_APPS:
+            state['wrote'] = True
+        # never follow an instance read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
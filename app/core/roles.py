@@ -0,0 +1,87 @@
+"""
+    Role of the signed in user
+
+A user is the owner of a business, an employee of one, or neither. The
+role is resolved once per session: the session keeps it with the user's
+role version, a token in the cache that the Owner and Employee signals
+drop, so the first request after a change resolves it again. The token
+lives in the cache shared by every process (settings.CACHES, checked by
+core.checks), so a change made anywhere reaches every session.
+"""
+from collections import namedtuple
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from core import sharding
+from core.models import Employee, Owner
+
+SESSION_KEY = '_role'
+
+
+class Role(namedtuple('Role', ['owner_id', 'employee_id', 'employer_id'])):
+    """the owner a user is, and the employee a user is with its employer"""
+    __slots__ = ()
+
+    @property
+    def is_owner(self):
+        return self.owner_id is not None
+
+    @property
+    def is_employee(self):
+        return self.employee_id is not None
+
+    @property
+    def scope_owner_id(self):
+        """the owner whose data the user works with"""
+        return self.owner_id if self.is_owner else self.employer_id
+
+
+NO_ROLE = Role(None, None, None)
+
+
+def resolve(user):
+    """query the role of a user"""
+    if not user.is_authenticated:
+        return NO_ROLE
+    owner_id = Owner.objects.filter(user=user).values_list(
+        'pk', flat=True).first()
+    # the employee row is on the shard of its owner, still unknown
+    for alias in [DEFAULT_DB_ALIAS, *sharding.placed()]:
+        employee = Employee.objects.using(alias).filter(
+            user=user).values_list('pk', 'owner_id').first()
+        if employee:
+            return Role(owner_id, *employee)
+    return Role(owner_id, None, None)
+
+
+def _version_key(user_id):
+    return f'role-version:{user_id}'
+
+
+def version(user_id):
+    key = _version_key(user_id)
+    current = cache.get(key)
+    if current is None:
+        cache.add(key, uuid4().hex, None)
+        current = cache.get(key)
+    return current
+
+
+def invalidate(user_id):
+    """make the sessions of a user resolve its role again"""
+    cache.delete(_version_key(user_id))
+
+
+def for_request(request):
+    """role of the request user, from the session while it is current"""
+    if not request.user.is_authenticated:
+        return NO_ROLE
+    current = version(request.user.pk)
+    stored = request.session.get(SESSION_KEY)
+    if stored and stored[0] == current:
+        return Role(*stored[1])
+    role = resolve(request.user)
+    request.session[SESSION_KEY] = [current, list(role)]
+    return role
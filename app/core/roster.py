@@ -0,0 +1,104 @@
+"""
+    Printable weekly rosters, stored under the hash of their content
+
+The week is first reduced to the plain data the roster shows. Its hash,
+together with ROSTER_FORMAT, names the stored file: an unchanged week
+finds its file and is never rendered again, a changed one gets a new
+file. Files are never rewritten, so they can be served with the hash as
+ETag and shared by identical weeks.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from core import sharding
+from core.models import Owner, Schedule, Shift
+
+# bump when the template changes to render every week again
+ROSTER_FORMAT = 1
+
+
+def monday_of(day):
+    return day - timedelta(days=day.weekday())
+
+
+def week_data(owner_id, monday):
+    """what the roster of a week shows, as plain sorted data"""
+    sunday = monday + timedelta(days=6)
+    days = [monday + timedelta(days=offset) for offset in range(7)]
+    opening = {
+        schedule.date: (schedule.start, schedule.end)
+        for schedule in Schedule.objects.filter(
+            owner_id=owner_id, date__range=(monday, sunday))
+    }
+    rows = {}
+    for shift in Shift.objects.for_owner(owner_id, monday, sunday) \
+            .with_names():
+        row = rows.setdefault(shift.employee_id, {
+            'name': str(shift.employee),
+            'days': [[] for _ in days],
+        })
+        start = timezone.localtime(shift.start_time)
+        end = timezone.localtime(shift.end_time)
+        row['days'][(shift.shift_date - monday).days].append(
+            f'{start:%H:%M}-{end:%H:%M}'
+            + (f' {shift.task.name}' if shift.task else '')
+        )
+    return {
+        'owner': str(Owner.objects.select_related('user').get(
+            pk=owner_id)),
+        'days': [
+            {
+                'date': day.isoformat(),
+                'open': [
+                    f'{timezone.localtime(bound):%H:%M}'
+                    for bound in opening[day]
+                ] if day in opening else None,
+            }
+            for day in days
+        ],
+        'employees': sorted(
+            rows.values(), key=lambda row: (row['name'], row['days'])),
+    }
+
+
+def content_key(data):
+    payload = json.dumps([ROSTER_FORMAT, data], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _name(key):
+    return f'{key[:2]}/{key}.html'
+
+
+def render(owner_id, day):
+    """key of the roster of a day's week, rendered if not stored yet"""
+    data = week_data(owner_id, monday_of(day))
+    key = content_key(data)
+    storage = storages['rosters']
+    name = _name(key)
+    if not storage.exists(name):
+        html = render_to_string('home/roster.html', data)
+        saved = storage.save(name, ContentFile(html.encode()))
+        if saved != name:
+            # another worker stored the same roster meanwhile
+            storage.delete(saved)
+    return key
+
+
+def open_roster(key):
+    return storages['rosters'].open(_name(key))
+
+
+def render_owners(owner_ids, mondays):
+    """render the rosters of many owners, returns the stored keys"""
+    keys = []
+    for owner_id in owner_ids:
+        with sharding.for_owner(owner_id):
+            keys.extend(render(owner_id, monday) for monday in mondays)
+    return keys
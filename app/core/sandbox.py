@@ -0,0 +1,345 @@
+"""
+    What-if planning of an owner's week without touching the live shifts
+
+A Sandbox loads the week's shifts, schedules and employees once. Edits
+go to an in-memory overlay keyed like the live shifts: a copy of the
+edited shift, None for a removed one, or a new unsaved shift; the live
+rows are shared, never copied. Every edit is journaled so the overlay
+can be rolled back to any checkpoint. Validation, hours and coverage
+deltas are computed from memory, so planning costs no query at all;
+commit() applies the overlay as one bulk diff in a single transaction.
+"""
+import copy
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+from itertools import count
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.translation import gettext as _
+
+from core import dashboard, demand, labor_rules, payroll, sharding
+from core.models import ChangeLog, Employee, Schedule, Shift
+from core.roster import monday_of
+
+# fields an overlay edit may change
+EDITABLE = ('employee_id', 'task_id', 'shift_date', 'start_time', 'end_time')
+MISSING = object()
+
+
+class Conflict(Exception):
+    """the week's schedules changed since the sandbox was loaded"""
+
+
+def _copy(shift):
+    """shallow copy with its own state, so edits leave the live one as is"""
+    clone = copy.copy(shift)
+    clone._state = copy.copy(shift._state)
+    clone._state.fields_cache = dict(shift._state.fields_cache)
+    return clone
+
+
+def _epoch(moment):
+    return int(moment.timestamp())
+
+
+def _local_epoch(moment, zone):
+    wall = moment.astimezone(zone).replace(tzinfo=dt_timezone.utc)
+    return int(wall.timestamp())
+
+
+class Sandbox:
+    """an owner's week with an overlay of uncommitted edits"""
+
+    def __init__(self, owner, day):
+        self.owner = owner
+        self.monday = monday_of(day)
+        self.sunday = self.monday + timedelta(days=6)
+        self._load()
+
+    def _load(self):
+        # one day around the week for the rest between neighbouring shifts
+        first = self.monday - timedelta(days=1)
+        last = self.sunday + timedelta(days=1)
+        self.base = {
+            shift.pk: shift for shift in
+            Shift.objects.for_owner(self.owner, first, last).with_names()
+        }
+        self.schedules = {
+            schedule.date: schedule for schedule in
+            Schedule.objects.filter(owner=self.owner,
+                                    date__range=(first, last))
+        }
+        self.versions = {
+            schedule.pk: schedule.version
+            for schedule in self.schedules.values()
+        }
+        self.employees = {
+            employee.pk: employee for employee in
+            Employee.objects.filter(owner=self.owner).with_user()
+            .select_related('contract')
+        }
+        self.overlay = {}
+        self._journal = []
+        self._new_keys = count(1)
+
+    # overlay
+
+    def _set(self, key, shift):
+        self._journal.append((key, self.overlay.get(key, MISSING)))
+        self.overlay[key] = shift
+
+    def get(self, key):
+        """the shift under a key as planned, None when removed"""
+        if key in self.overlay:
+            return self.overlay[key]
+        return self.base[key]
+
+    def add(self, employee_id, day, start_time, end_time, task_id=None):
+        """plan a new shift, returns its key"""
+        key = f'new-{next(self._new_keys)}'
+        shift = Shift(
+            owner_id=self.owner.pk,
+            employee_id=employee_id,
+            task_id=task_id,
+            shift_date=day,
+            start_time=start_time,
+            end_time=end_time
+        )
+        self._set(key, shift)
+        return key
+
+    def change(self, key, **fields):
+        """plan new values of a shift's EDITABLE fields"""
+        unknown = set(fields) - set(EDITABLE)
+        if unknown:
+            raise ValueError(f'not editable: {", ".join(sorted(unknown))}')
+        current = self.get(key)
+        if current is None:
+            raise KeyError(key)
+        shift = _copy(current)
+        for name, value in fields.items():
+            setattr(shift, name, value)
+        self._set(key, shift)
+        return key
+
+    def remove(self, key):
+        """plan the removal of a shift"""
+        if self.get(key) is None:
+            raise KeyError(key)
+        self._set(key, None)
+
+    def checkpoint(self):
+        """token for rollback() to return to the current plan"""
+        return len(self._journal)
+
+    def rollback(self, checkpoint=0):
+        """undo the edits made since the checkpoint, all by default"""
+        while len(self._journal) > checkpoint:
+            key, previous = self._journal.pop()
+            if previous is MISSING:
+                del self.overlay[key]
+            else:
+                self.overlay[key] = previous
+
+    def shifts(self, planned=True):
+        """{key: shift} of the planned version, or of the live one"""
+        found = dict(self.base)
+        if planned:
+            found.update(self.overlay)
+        return {key: shift for key, shift in found.items()
+                if shift is not None}
+
+    def _in_week(self, shift):
+        return self.monday <= shift.shift_date <= self.sunday
+
+    # checks
+
+    def validate(self):
+        """(errors, violations) of the plan
+
+        errors are (key, message) of the edited shifts breaking a rule of
+        Shift.clean(); violations are the labor_rules of the week.
+        """
+        shifts = self.shifts()
+        by_day = defaultdict(list)
+        for key, shift in shifts.items():
+            by_day[shift.employee_id, shift.shift_date].append((key, shift))
+
+        errors = []
+        for key, shift in self.overlay.items():
+            if shift is None:
+                continue
+            message = self._error(key, shift, by_day)
+            if message:
+                errors.append((key, message))
+
+        keys = list(shifts)
+        rows = [
+            (index, shift.employee_id, _epoch(shift.start_time),
+             _epoch(shift.end_time), shift.shift_date,
+             self._contract_hours(shift.employee_id))
+            for index, shift in enumerate(shifts.values())
+        ]
+        violations = [
+            violation._replace(shift_ids=[
+                keys[index] for index in violation.shift_ids])
+            for violation in labor_rules.check(rows, self.monday, self.sunday)
+        ]
+        return errors, violations
+
+    def _contract_hours(self, employee_id):
+        employee = self.employees.get(employee_id)
+        if employee is None or employee.contract is None:
+            return None
+        return employee.contract.weekHours
+
+    def _error(self, key, shift, by_day):
+        """the first Shift.clean() rule a planned shift breaks"""
+        schedule = self.schedules.get(shift.shift_date)
+        employee = self.employees.get(shift.employee_id)
+        if not self._in_week(shift):
+            return _('the shift must stay inside the planned week')
+        if schedule is None:
+            return _('there is no schedule on this date')
+        if employee is None:
+            return _('Schedule and Employee mut have the same owner')
+        if not employee.is_active_on(shift.shift_date):
+            return _('employee’s contract is not active on this date')
+        if shift.start_time >= shift.end_time:
+            return _('the shift must end after the start time')
+        if any(other_key != key
+               and other.start_time < shift.end_time
+               and shift.start_time < other.end_time
+               for other_key, other
+               in by_day[shift.employee_id, shift.shift_date]):
+            return _('already has a shift that overlaps with this period.')
+        if not (schedule.start <= shift.start_time <
+                shift.end_time <= schedule.end):
+            return _('Shift times must fall within the schedule boundaries')
+        return None
+
+    # deltas
+
+    def _week_shifts(self, planned):
+        return [shift for shift in self.shifts(planned).values()
+                if self._in_week(shift)]
+
+    def _hours(self, shifts):
+        data = np.array([
+            (shift.employee_id, _epoch(shift.start_time),
+             _epoch(shift.end_time))
+            for shift in shifts
+        ], dtype=np.int64).reshape(-1, 3)
+        return payroll.minutes_by(data[:, 0], data[:, 1], data[:, 2],
+                                  self.monday, self.sunday)
+
+    def _coverage(self, shifts):
+        zone = ZoneInfo(settings.STAFFING_TIME_ZONE)
+        data = np.array([
+            (shift.task_id, _local_epoch(shift.start_time, zone),
+             _local_epoch(shift.end_time, zone))
+            for shift in shifts if shift.task_id is not None
+        ], dtype=np.int64).reshape(-1, 3)
+        return demand.bucket_counts(data, self.monday, self.sunday)
+
+    def deltas(self):
+        """payable minutes and coverage of the plan minus the live week
+
+        Returns {'hours': {employee_id: {category: minutes}}, 'coverage':
+        [{'task_id', 'date', 'start', 'end', 'delta'}]}; only the
+        employees and buckets that change are listed.
+        """
+        live = self._hours(self._week_shifts(False))
+        planned = self._hours(self._week_shifts(True))
+        hours = {}
+        for employee_id in live.keys() | planned.keys():
+            before = live.get(employee_id, {})
+            after = planned.get(employee_id, {})
+            changed = {
+                name: after.get(name, 0) - before.get(name, 0)
+                for name in payroll.TOTALS
+            }
+            if any(changed.values()):
+                hours[employee_id] = changed
+
+        live_tasks, live_counts = self._coverage(self._week_shifts(False))
+        tasks, counts = self._coverage(self._week_shifts(True))
+        all_tasks = np.union1d(live_tasks, tasks)
+        difference = np.zeros((len(all_tasks), 7, counts.shape[2]),
+                              dtype=np.int64)
+        difference[np.searchsorted(all_tasks, tasks)] += counts
+        difference[np.searchsorted(all_tasks, live_tasks)] -= live_counts
+        minutes = settings.STAFFING_BUCKET_MINUTES
+        coverage = [
+            {
+                'task_id': int(all_tasks[task]),
+                'date': self.monday + timedelta(days=int(day)),
+                'start': int(slot) * minutes,
+                'end': int(slot + 1) * minutes,
+                'delta': int(difference[task, day, slot]),
+            }
+            for task, day, slot in zip(*np.nonzero(difference))
+        ]
+        return {'hours': hours, 'coverage': coverage}
+
+    # commit
+
+    def diff(self):
+        """(created, updated, deleted) shifts of the overlay"""
+        created, updated, deleted = [], [], []
+        for key, shift in self.overlay.items():
+            if key not in self.base:
+                if shift is not None:
+                    created.append(shift)
+            elif shift is None:
+                deleted.append(self.base[key])
+            elif any(getattr(shift, name) != getattr(self.base[key], name)
+                     for name in EDITABLE):
+                updated.append(shift)
+        return created, updated, deleted
+
+    def commit(self):
+        """apply the plan with one bulk create, update and delete
+
+        Raises ValidationError when an edited shift breaks a rule and
+        Conflict when the week's schedules changed since loading; the
+        labor rule violations are warnings and do not stop the commit.
+        The sandbox is reloaded from the committed week afterwards.
+        """
+        errors, _violations = self.validate()
+        if errors:
+            raise ValidationError([message for _key, message in errors])
+        created, updated, deleted = self.diff()
+        if not (created or updated or deleted):
+            return created, updated, deleted
+
+        with transaction.atomic(using=sharding.db_for(self.owner)):
+            current = dict(Schedule.objects.select_for_update().filter(
+                pk__in=self.versions).values_list('pk', 'version'))
+            if current != self.versions:
+                raise Conflict(self.monday)
+
+            # a shift belongs to the schedule of its date
+            for shift in created + updated:
+                shift.schedule = self.schedules[shift.shift_date]
+            Shift.objects.bulk_create(created)
+            Shift.objects.bulk_update(updated, [
+                'schedule', 'employee', 'task', 'shift_date',
+                'start_time', 'end_time'])
+            # deletes are recorded in the change log by core.signals
+            Shift.objects.filter(pk__in=[
+                shift.pk for shift in deleted]).delete()
+            ChangeLog.objects.record(created, ChangeLog.CREATE)
+            ChangeLog.objects.record(updated, ChangeLog.UPDATE)
+
+            touched = {shift.schedule_id for shift in created + updated}
+            touched |= {self.base[shift.pk].schedule_id
+                        for shift in updated + deleted}
+            Schedule.objects.filter(pk__in=touched).bump_version()
+            dashboard.invalidate(self.owner.pk)
+        self._load()
+        return created, updated, deleted
@@ -0,0 +1,43 @@
+"""
+    Ranked search of users, employees and tasks
+
+Matching uses icontains, served by the trigram GIN indexes on the upper
+cased fields; the matches are ranked by trigram word similarity.
+"""
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+from core.models import USER_SEARCH_FIELDS, Employee, Task, User
+
+MIN_TERM_LENGTH = 3
+
+
+def _ranked(queryset, term, fields, limit):
+    if len(term) < MIN_TERM_LENGTH:
+        return queryset.none()
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__icontains': term})
+    similarities = [TrigramWordSimilarity(term, field) for field in fields]
+    rank = Greatest(*similarities) if len(similarities) > 1 \
+        else similarities[0]
+    return queryset.filter(condition).annotate(rank=rank).order_by(
+        '-rank', 'pk')[:limit]
+
+
+def users(term, limit=10):
+    return _ranked(User.objects.all(), term, USER_SEARCH_FIELDS, limit)
+
+
+def employees(owner, term, limit=10):
+    return _ranked(
+        Employee.objects.filter(owner=owner).with_user(),
+        term,
+        [f'user__{field}' for field in USER_SEARCH_FIELDS],
+        limit
+    )
+
+
+def tasks(owner, term, limit=10):
+    return _ranked(Task.objects.filter(owner=owner), term, ['name'], limit)
@@ -0,0 +1,422 @@
+"""
+    Owner-keyed sharding of the scheduling data
+
+The rows of the models in SHARDED live, per owner, on one database alias:
+default or one of the shard<n> aliases built from DB_SHARDS. The
+directory, OwnerShard on default, lists the owners placed elsewhere than
+default; every process keeps a copy for SHARD_DIRECTORY_SECONDS.
+ShardRouter sends a query to the shard of the owner of its hint instance
+or, without one, of the owner the code runs for: the owner the request
+user works for (ShardMiddleware) or the one given to for_owner().
+Transactions over an owner's rows are opened on db_for(owner).
+
+Users and owners are global: written on default and copied, so the
+joins of the sharded rows keep working, on the shards holding owners
+when saved and on the shard an owner moves to before its rows, which
+also brings the rows written without signals, by bulk_create or
+update(), to it. Shard n hands out ids from n * SHARD_ID_SPAN, so rows
+keep their ids when moved.
+
+move() takes an owner to another shard while it keeps working: the rows
+are copied in batches from a snapshot, then the owner's writes are paused
+(ShardMoving, answered with a 503) while the rows changed meanwhile are
+copied again, and the directory switches to the new shard before the old
+rows are deleted in batches. Reads are never interrupted.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, \
+    transaction
+from django.db.models import Max
+
+from core.models import (
+    AttendanceCursor,
+    AttendanceEvent,
+    AttendanceRecord,
+    AuditVersion,
+    ChangeLog,
+    Contract,
+    Employee,
+    Owner,
+    OwnerShard,
+    Schedule,
+    Shift,
+    ShiftDigestCursor,
+    ShiftRequest,
+    ShiftTemplate,
+    StaffingDemand,
+    Task,
+    User
+)
+
+# owner scoped models, in dependency order
+SHARDED = (
+    Contract, Task, Schedule, Employee, ShiftTemplate, StaffingDemand,
+    Shift, ShiftRequest, ShiftDigestCursor, AttendanceEvent,
+    AttendanceRecord, AttendanceCursor, ChangeLog, AuditVersion,
+)
+# global models copied on the shards holding owners
+GLOBAL = (User, Owner)
+
+# an owner id, or a callable returning it, the queries run for
+_owner = ContextVar('shard_owner', default=None)
+# (loaded at, {owner_id: (alias, frozen)}), per process
+_directory = (None, {})
+
+
+class ShardMoving(DatabaseError):
+    """the owner's writes are paused while it moves to another shard"""
+
+
+def shards():
+    """default and the shard<n> aliases, in order"""
+    numbered = sorted(
+        (int(alias[5:]), alias) for alias in settings.DATABASES
+        if alias.startswith('shard') and alias[5:].isdigit())
+    return [DEFAULT_DB_ALIAS] + [alias for _number, alias in numbered]
+
+
+def forget():
+    """drop the directory copy of this process"""
+    global _directory
+    _directory = (None, {})
+
+
+def _entries():
+    global _directory
+    loaded, entries = _directory
+    now = time.monotonic()
+    if loaded is None or now - loaded > settings.SHARD_DIRECTORY_SECONDS:
+        entries = {
+            owner_id: (alias, frozen)
+            for owner_id, alias, frozen in OwnerShard.objects.using(
+                DEFAULT_DB_ALIAS).values_list('owner_id', 'alias', 'frozen')
+        }
+        _directory = (now, entries)
+    return entries
+
+
+def locate(owner_id):
+    """(alias, frozen) of an owner
+
+    Without shards configured everything is on default and the directory
+    is never read.
+    """
+    if owner_id is None or len(shards()) == 1:
+        return DEFAULT_DB_ALIAS, False
+    return _entries().get(owner_id, (DEFAULT_DB_ALIAS, False))
+
+
+def placed():
+    """the shards other than default holding owners"""
+    if len(shards()) == 1:
+        return []
+    return sorted({alias for alias, _frozen in _entries().values()}
+                  - {DEFAULT_DB_ALIAS})
+
+
+def current_owner():
+    value = _owner.get()
+    return value() if callable(value) else value
+
+
+def db_for(owner=None):
+    """alias of an owner or owner id, by default of the owner the code
+    runs for"""
+    owner_id = current_owner() if owner is None else getattr(
+        owner, 'pk', owner)
+    return locate(owner_id)[0]
+
+
+@contextmanager
+def for_owner(owner_id):
+    """run the owner scoped queries of the block on an owner's shard
+
+    owner_id can be a callable, evaluated by the first routed query.
+    """
+    token = _owner.set(owner_id)
+    try:
+        yield
+    finally:
+        _owner.reset(token)
+
+
+def everywhere(queryset):
+    """the queryset on default, left to the other routers, and on every
+    shard holding owners"""
+    return [queryset] + [queryset.using(alias) for alias in placed()]
+
+
+def _owner_of(model, hints):
+    if not issubclass(model, SHARDED):
+        return None
+    instance = hints.get('instance')
+    if isinstance(instance, Owner):
+        return instance.pk
+    owner_id = getattr(instance, 'owner_id', None)
+    return current_owner() if owner_id is None else owner_id
+
+
+class ShardRouter:
+    """send the owner scoped queries to the owner's shard
+
+    Queries on default return None so the replica router still decides
+    where they run.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias, _frozen = locate(_owner_of(model, hints))
+        return None if alias == DEFAULT_DB_ALIAS else alias
+
+    def db_for_write(self, model, **hints):
+        owner_id = _owner_of(model, hints)
+        alias, frozen = locate(owner_id)
+        if frozen:
+            raise ShardMoving(f'owner {owner_id} is moving between shards')
+        return None if alias == DEFAULT_DB_ALIAS else alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if isinstance(obj1, SHARDED) and isinstance(obj2, SHARDED):
+            return obj1._state.db == obj2._state.db
+        # the global rows are on every shard holding owners
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # every shard has the whole schema
+        return True if db in shards()[1:] else None
+
+
+def _columns(model):
+    pk = model._meta.pk.attname
+    return [pk] + [
+        field.attname for field in model._meta.concrete_fields
+        if field.attname != pk and not field.generated
+    ]
+
+
+def copy_global(instance):
+    """write a global row on the shards holding owners as it is on
+    default"""
+    model = type(instance)
+    names = _columns(model)
+    aliases = placed()
+    row = model._base_manager.using(DEFAULT_DB_ALIAS).filter(
+        pk=instance.pk).values(*names).first() if aliases else None
+    if row is None:
+        return
+    for alias in aliases:
+        model._base_manager.using(alias).bulk_create(
+            [model(**row)], update_conflicts=True,
+            unique_fields=[model._meta.pk.name], update_fields=names[1:])
+
+
+def copy_globals(alias, batch_size=None):
+    """write every global row on a shard as it is on default, returns the
+    number of rows written"""
+    size = batch_size or settings.SHARD_BATCH_SIZE
+    written = 0
+    for model in GLOBAL:
+        names = _columns(model)
+        rows_of = model._base_manager.order_by('pk')
+        after = 0
+        while True:
+            rows = list(rows_of.using(DEFAULT_DB_ALIAS).filter(
+                pk__gt=after).values_list(*names)[:size])
+            if not rows:
+                break
+            current = {
+                row[0]: row for row in rows_of.using(alias).filter(
+                    pk__in=[row[0] for row in rows]).values_list(*names)
+            }
+            changed = [row for row in rows if current.get(row[0]) != row]
+            if changed:
+                model._base_manager.using(alias).bulk_create(
+                    [model(**dict(zip(names, row))) for row in changed],
+                    update_conflicts=True,
+                    unique_fields=[model._meta.pk.name],
+                    update_fields=names[1:])
+                written += len(changed)
+            after = rows[-1][0]
+    return written
+
+
+def drop_global(model, pk, aliases=()):
+    """delete a global row, and what cascades from it, on the shards
+    holding owners and the other aliases given"""
+    for alias in sorted(set(placed()).union(aliases) - {DEFAULT_DB_ALIAS}):
+        model._base_manager.using(alias).filter(pk=pk).delete()
+
+
+def _reserve(alias, model, floor):
+    """move the id sequence of a model on a shard up to floor"""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [
+            model._meta.db_table, model._meta.pk.column])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(f'SELECT last_value FROM {sequence}')
+        if cursor.fetchone()[0] < floor:
+            cursor.execute('SELECT setval(%s, %s, false)', [sequence, floor])
+
+
+def reserve_ids(alias):
+    """start the ids of the sharded models at the range of a shard"""
+    floor = shards().index(alias) * settings.SHARD_ID_SPAN
+    if floor and connections[alias].vendor == 'postgresql':
+        for model in SHARDED:
+            _reserve(alias, model, floor)
+
+
+@contextmanager
+def _snapshot(alias):
+    """read a consistent state of a shard through the block"""
+    connection = connections[alias]
+    outermost = not connection.in_atomic_block
+    with transaction.atomic(using=alias):
+        if outermost:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL '
+                               'REPEATABLE READ READ ONLY')
+        yield
+
+
+def _delete(alias, model, ids):
+    connection = connections[alias]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE id = ANY(%s)', [ids])
+
+
+def _name(model):
+    return str(model._meta.verbose_name_plural)
+
+
+def _sync(model, owner_id, source, target, size, progress=None):
+    """make the owner's rows of a model on target equal to the source's
+
+    Returns the number of rows deleted or written on target.
+    """
+    names = _columns(model)
+    rows_of = model._base_manager.filter(owner_id=owner_id).order_by('pk')
+    written = 0
+
+    # rows gone from the source first, so no row copied clashes with them
+    after = 0
+    while True:
+        ids = list(rows_of.using(target).filter(pk__gt=after).values_list(
+            'pk', flat=True)[:size])
+        if not ids:
+            break
+        kept = set(rows_of.using(source).filter(pk__in=ids).values_list(
+            'pk', flat=True))
+        stale = [pk for pk in ids if pk not in kept]
+        if stale:
+            _delete(target, model, stale)
+            written += len(stale)
+        after = ids[-1]
+
+    after = 0
+    while True:
+        rows = list(rows_of.using(source).filter(pk__gt=after).values_list(
+            *names)[:size])
+        if not rows:
+            break
+        current = {
+            row[0]: row for row in rows_of.using(target).filter(
+                pk__in=[row[0] for row in rows]).values_list(*names)
+        }
+        changed = [row for row in rows if current.get(row[0]) != row]
+        if changed:
+            model._base_manager.using(target).bulk_create(
+                [model(**dict(zip(names, row))) for row in changed],
+                update_conflicts=True,
+                unique_fields=[model._meta.pk.name],
+                update_fields=names[1:])
+            written += len(changed)
+            if progress:
+                progress(_name(model), written)
+        after = rows[-1][0]
+    return written
+
+
+def _clear(owner_id, alias, size, progress=None):
+    """delete the owner's sharded rows of a database in batches"""
+    for model in reversed(SHARDED):
+        rows_of = model._base_manager.using(alias).filter(
+            owner_id=owner_id).order_by('pk')
+        deleted = 0
+        while True:
+            with transaction.atomic(using=alias):
+                ids = list(rows_of.values_list('pk', flat=True)[:size])
+                if ids:
+                    _delete(alias, model, ids)
+            if not ids:
+                break
+            deleted += len(ids)
+            if progress:
+                progress(_name(model), -deleted)
+
+
+def _place(owner_id, alias, frozen, settle=True):
+    """update the directory, then wait for every process to see it"""
+    OwnerShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        owner_id=owner_id, defaults={'alias': alias, 'frozen': frozen})
+    forget()
+    if settle:
+        time.sleep(settings.SHARD_DIRECTORY_SECONDS)
+
+
+def move(owner_id, target, batch_size=None, progress=None):
+    """move an owner's rows to another shard, returns {model: rows}
+
+    progress, when given, is called with (model, rows so far) after every
+    batch, negative for the rows deleted from a shard. A move interrupted
+    before the switch leaves the owner on its shard and is simply run
+    again.
+    """
+    if target not in shards():
+        raise ValueError(f'{target} is not a shard')
+    forget()
+    source, _frozen = locate(owner_id)
+    if source == target:
+        return {}
+    size = batch_size or settings.SHARD_BATCH_SIZE
+
+    # leftovers of an interrupted move
+    _clear(owner_id, target, size)
+    if target != DEFAULT_DB_ALIAS:
+        copy_globals(target, size)
+    with _snapshot(source):
+        done = {
+            _name(model): _sync(model, owner_id, source, target, size,
+                                progress)
+            for model in SHARDED
+        }
+
+    _place(owner_id, source, frozen=True)
+    try:
+        with _snapshot(source), transaction.atomic(using=target):
+            if target != DEFAULT_DB_ALIAS:
+                # the users added since, the owner's rows may use them
+                copy_globals(target, size)
+            for model in SHARDED:
+                done[_name(model)] += _sync(
+                    model, owner_id, source, target, size, progress)
+            # the owner's change sequence keeps growing on the new shard
+            top = ChangeLog.objects.using(target).filter(
+                owner_id=owner_id).aggregate(top=Max('pk'))['top']
+            if top is not None:
+                _reserve(target, ChangeLog, top + 1)
+    except BaseException:
+        _place(owner_id, source, frozen=False, settle=False)
+        raise
+    _place(owner_id, target, frozen=False)
+    if target != DEFAULT_DB_ALIAS:
+        # saved by the processes that did not know the target held owners
+        copy_globals(target, size)
+
+    _clear(owner_id, source, size, progress)
+    return done
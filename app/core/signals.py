@@ -0,0 +1,67 @@
+"""
+    Signal receivers for the core models
+"""
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from core import roles, sharding
+from core.models import ChangeLog, Contract, Employee, Owner, Schedule, \
+    Shift, Task
+
+
+def record_delete(sender, instance, using, **kwargs):
+    """record deletes of change logged models, cascades included"""
+    ChangeLog.objects.db_manager(using).record([instance], ChangeLog.DELETE)
+
+
+# connected to the models it handles only: a receiver of every model
+# would keep the deletes of all the others off the fast path
+for model in (Task, Schedule, Shift):
+    post_delete.connect(record_delete, sender=model)
+
+
+def refresh_dashboard(sender, instance, **kwargs):
+    """queue a refresh of the dashboard the instance is counted in"""
+    # imported here: core.dashboard pulls in numpy, which processes
+    # should not load at startup
+    from core import dashboard
+    dashboard.invalidate(instance.owner_id)
+
+
+for model in (Contract, Employee, Schedule, Shift):
+    post_save.connect(refresh_dashboard, sender=model)
+    post_delete.connect(refresh_dashboard, sender=model)
+
+
+def invalidate_role(sender, instance, **kwargs):
+    """resolve again the role of a user who became or left a role"""
+    roles.invalidate(instance.user_id)
+
+
+for model in (Owner, Employee):
+    post_save.connect(invalidate_role, sender=model)
+    post_delete.connect(invalidate_role, sender=model)
+
+
+def copy_global_row(sender, instance, raw, using, **kwargs):
+    """keep the users and owners of the shards holding owners as on default"""
+    if not raw and using == DEFAULT_DB_ALIAS:
+        sharding.copy_global(instance)
+
+
+def drop_global_row(sender, instance, using, **kwargs):
+    if using == DEFAULT_DB_ALIAS:
+        sharding.drop_global(sender, instance.pk)
+
+
+for model in sharding.GLOBAL:
+    post_save.connect(copy_global_row, sender=model)
+    post_delete.connect(drop_global_row, sender=model)
+
+
+@receiver(post_migrate)
+def reserve_shard_ids(sender, using, **kwargs):
+    """hand out the ids of a migrated shard from its own range"""
+    if sender.name == 'core' and using in sharding.shards():
+        sharding.reserve_ids(using)
@@ -0,0 +1,76 @@
+"""
+    Import time profile of a process start
+
+profile() starts a fresh interpreter with python -X importtime, sets
+Django up the way manage.py, the web server and the Celery workers do
+and reports the wall time with the import time of every module. Modules
+in HEAVY_MODULES are expected to load on first use only.
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+
+HEAVY_MODULES = (
+    'django_countries',
+    'pyuca',
+    'phonenumbers',
+    'phonenumber_field',
+    'localflavor',
+    'numpy',
+    'pyarrow',
+    'httpx',
+)
+
+SCRIPT = '''
+import json, sys, time
+began = time.perf_counter()
+import django
+django.setup()
+print(json.dumps({
+    'seconds': time.perf_counter() - began,
+    'modules': sorted(sys.modules),
+}))
+'''
+
+
+def import_times(lines):
+    """(module, self us, cumulative us, depth) of -X importtime lines"""
+    found = []
+    for line in lines:
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        # one space after the bar, then two per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        found.append((name.strip(), int(own), int(cumulative), depth))
+    return found
+
+
+def by_package(times):
+    """self import time summed per top level package, slowest first"""
+    totals = defaultdict(int)
+    for name, own, _cumulative, _depth in times:
+        totals[name.split('.')[0]] += own
+    return sorted(totals.items(), key=lambda item: -item[1])
+
+
+def profile():
+    """{'seconds', 'modules', 'imports', 'heavy'} of a fresh start"""
+    environment = dict(os.environ)
+    environment.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT],
+        capture_output=True, text=True, check=True,
+        cwd=settings.BASE_DIR, env=environment
+    )
+    report = json.loads(result.stdout.splitlines()[-1])
+    report['imports'] = import_times(result.stderr.splitlines())
+    report['heavy'] = sorted({
+        module.split('.')[0] for module in report['modules']
+        if module.split('.')[0] in HEAVY_MODULES
+    })
+    return report
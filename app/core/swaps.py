@@ -0,0 +1,211 @@
+"""
+    Matching of the cover and swap requests with eligible colleagues
+
+All the requests are matched in one pass: the employees and the shifts of
+the weeks involved are loaded with one query each and kept per employee
+as sorted epoch intervals, so every candidate is checked with a binary
+search and a weekly total instead of queries. A colleague is eligible
+for a shift when of the same owner, active on its date, free for its
+whole time and still within the contract week hours (or
+LABOR_MAX_WEEKLY_HOURS without a contract) once the shift is taken.
+
+A swap also needs the requester to be eligible for the shift given back,
+which must fall in the same week.
+"""
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import BigIntegerField
+from django.db.models.functions import Cast, Extract
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from core import sharding
+from core.models import Employee, Shift, ShiftRequest
+
+HOUR = 3600
+
+# shift_id is the colleague's shift given back in a swap, None for a cover
+Match = namedtuple('Match', 'employee_id shift_id')
+_Shift = namedtuple('_Shift', 'pk employee_id day week start end')
+
+
+def _week(day):
+    # ordinal 1 is a monday
+    return (day.toordinal() - 1) // 7
+
+
+def _epoch(field):
+    return Cast(Extract(field, 'epoch'), BigIntegerField())
+
+
+class _Staff:
+    """employees of the owners and their shifts, loaded in bulk"""
+
+    def __init__(self, owner_ids, first, last):
+        self.employees = {}
+        self.by_owner = defaultdict(list)
+        for pk, owner_id, start, end, hours in Employee.objects.active_on(
+                None, (first, last)).filter(owner__in=owner_ids).values_list(
+                'pk', 'owner_id', 'startDate', 'endDate',
+                'contract__weekHours'):
+            limit = settings.LABOR_MAX_WEEKLY_HOURS if hours is None \
+                else hours
+            self.employees[pk] = (owner_id, start, end, limit * HOUR)
+            self.by_owner[owner_id].append(pk)
+
+        # a day around the weeks for the shifts running over midnight
+        self.shifts = {}
+        self.worked = defaultdict(int)
+        self.week_shifts = defaultdict(list)
+        per_employee = defaultdict(list)
+        for row in Shift.objects.filter(
+                owner__in=owner_ids,
+                shift_date__range=(first - timedelta(days=1),
+                                   last + timedelta(days=1))
+        ).order_by('employee_id', 'start_time').values_list(
+                'pk', 'employee_id', 'shift_date',
+                _epoch('start_time'), _epoch('end_time')):
+            shift = _Shift(row[0], row[1], row[2], _week(row[2]), *row[3:])
+            self.shifts[shift.pk] = shift
+            self.worked[shift.employee_id, shift.week] += \
+                shift.end - shift.start
+            self.week_shifts[shift.employee_id, shift.week].append(shift)
+            per_employee[shift.employee_id].append(
+                (shift.pk, shift.start, shift.end))
+
+        # sorted by start; the running latest end stays sorted even when
+        # shifts overlap, so it can be searched
+        self.intervals = {}
+        for employee_id, rows in per_employee.items():
+            ids, starts, ends = (np.array(column, dtype=np.int64)
+                                 for column in zip(*rows))
+            self.intervals[employee_id] = (
+                ids, starts, ends, np.maximum.accumulate(ends))
+
+    def free(self, employee_id, start, end, ignored):
+        """no shift of the employee overlaps, apart from the ignored"""
+        if employee_id not in self.intervals:
+            return True
+        ids, starts, ends, reach = self.intervals[employee_id]
+        index = int(np.searchsorted(reach, start, side='right'))
+        while index < len(ids) and starts[index] < end:
+            if ends[index] > start and ids[index] not in ignored:
+                return False
+            index += 1
+        return True
+
+    def eligible(self, employee_id, shift, given=None):
+        """whether the employee can take the shift, giving one away"""
+        owner_id, start_date, end_date, limit = self.employees.get(
+            employee_id, (None, None, None, 0))
+        if owner_id is None or \
+                owner_id != self.employees[shift.employee_id][0]:
+            return False
+        if start_date > shift.day or (end_date and end_date < shift.day):
+            return False
+        ignored = {shift.pk}
+        if given is not None:
+            ignored.add(given.pk)
+        if not self.free(employee_id, shift.start, shift.end, ignored):
+            return False
+        worked = self.worked[employee_id, shift.week] + shift.end \
+            - shift.start
+        if given is not None and given.week == shift.week:
+            worked -= given.end - given.start
+        return worked <= limit
+
+
+def match(requests):
+    """{request pk: [Match]} of the eligible colleagues of the requests
+
+    The requests need their shift; employees and shifts of every owner
+    and week involved are read with two queries whatever their number.
+    """
+    requests = list(requests)
+    if not requests:
+        return {}
+    days = [request.shift.shift_date for request in requests]
+    first = min(days) - timedelta(days=min(days).weekday())
+    last = max(days) + timedelta(days=6 - max(days).weekday())
+    staff = _Staff({request.owner_id for request in requests}, first, last)
+
+    found = {}
+    for request in requests:
+        shift = staff.shifts.get(request.shift_id)
+        matches = found[request.pk] = []
+        if shift is None or shift.employee_id not in staff.employees:
+            continue
+        owner_id = staff.employees[shift.employee_id][0]
+        for candidate in staff.by_owner[owner_id]:
+            if candidate == shift.employee_id:
+                continue
+            if request.kind == ShiftRequest.COVER:
+                if staff.eligible(candidate, shift):
+                    matches.append(Match(candidate, None))
+                continue
+            for given in staff.week_shifts[candidate, shift.week]:
+                if staff.eligible(candidate, shift, given) and \
+                        staff.eligible(shift.employee_id, given, shift):
+                    matches.append(Match(candidate, given.pk))
+    return found
+
+
+def open_requests(owner):
+    """open requests of an owner with their shift, oldest first"""
+    return ShiftRequest.objects.filter(
+        owner=owner, status=ShiftRequest.OPEN
+    ).select_related('shift').order_by('created')
+
+
+def request_change(shift, kind):
+    """open a cover or swap request for a shift by its employee"""
+    if ShiftRequest.objects.filter(
+            shift=shift, status=ShiftRequest.OPEN).exists():
+        raise ValidationError(_('the shift already has an open request'))
+    return ShiftRequest.objects.create(
+        shift=shift, requested_by_id=shift.employee_id, kind=kind)
+
+
+def accept(request_id, employee_id, shift_id=None):
+    """hand over, or trade, the shift of an open request atomically
+
+    The request and both employees are locked and the match is checked
+    again on fresh data before the shifts change hands; the other open
+    requests on the shifts traded are cancelled.
+    """
+    with transaction.atomic(using=sharding.db_for()):
+        request = ShiftRequest.objects.select_for_update(
+            of=('self',)).select_related('shift').get(pk=request_id)
+        if request.status != ShiftRequest.OPEN:
+            raise ValidationError(_('the request is no longer open'))
+        list(Employee.objects.select_for_update().filter(
+            pk__in=[request.requested_by_id, employee_id]).order_by('pk'))
+        if Match(employee_id, shift_id) not in match([request])[request.pk]:
+            raise ValidationError(
+                _('the colleague is not eligible for this shift'))
+
+        shift = request.shift
+        shift.employee_id = employee_id
+        shift.save()
+        if shift_id is not None:
+            given = Shift.objects.get(pk=shift_id)
+            given.employee_id = request.requested_by_id
+            given.save()
+
+        now = timezone.now()
+        request.status = ShiftRequest.ACCEPTED
+        request.accepted_by_id = employee_id
+        request.swapped_shift_id = shift_id
+        request.decided = now
+        request.save()
+        ShiftRequest.objects.filter(
+            status=ShiftRequest.OPEN,
+            shift__in=[pk for pk in (shift.pk, shift_id) if pk]
+        ).exclude(pk=request.pk).update(
+            status=ShiftRequest.CANCELLED, decided=now)
+    return request
@@ -0,0 +1,104 @@
+"""
+    Background tasks for the core app
+"""
+from datetime import date, timedelta
+from itertools import chain
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from core import attendance, dashboard, demand, notifications, recurrence, \
+    roster, sharding
+from core.models import Owner, Schedule, ShiftTemplate, Task
+
+ROSTER_BATCH_SIZE = 50
+
+
+@shared_task
+def send_shift_digests():
+    """fan out the digests of every owner whose changes have settled"""
+    for owner_id, upto in notifications.ready_owners():
+        deliver_shift_digests.delay(owner_id, upto)
+
+
+@shared_task
+def deliver_shift_digests(owner_id, upto):
+    with sharding.for_owner(owner_id):
+        return notifications.deliver(owner_id, upto)
+
+
+@shared_task
+def materialize_shift_templates():
+    """extend every owner's rolling window of template shifts"""
+    owner_ids = ShiftTemplate.objects.values_list(
+        'owner_id', flat=True).distinct()
+    for owner_id in chain.from_iterable(sharding.everywhere(owner_ids)):
+        materialize_owner_templates.delay(owner_id)
+
+
+@shared_task
+def materialize_owner_templates(owner_id):
+    with sharding.for_owner(owner_id):
+        created, conflicts = recurrence.materialize_window(
+            Owner.objects.get(pk=owner_id))
+    return len(created), len(conflicts)
+
+
+@shared_task
+def refresh_dashboard(owner_id):
+    with sharding.for_owner(owner_id):
+        dashboard.refresh(owner_id)
+
+
+@shared_task
+def forecast_staffing_demand():
+    """derive again the default demand of every owner with tasks"""
+    owner_ids = Task.objects.values_list('owner_id', flat=True).distinct()
+    for owner_id in chain.from_iterable(sharding.everywhere(owner_ids)):
+        forecast_owner_demand.delay(owner_id)
+
+
+@shared_task
+def forecast_owner_demand(owner_id):
+    with sharding.for_owner(owner_id):
+        return len(demand.apply_forecast(owner_id))
+
+
+@shared_task
+def render_rosters():
+    """render the coming weeks' rosters of every owner, in batches"""
+    first = roster.monday_of(timezone.localdate())
+    mondays = [
+        first + timedelta(weeks=week)
+        for week in range(settings.ROSTER_WEEKS_AHEAD)
+    ]
+    owner_ids = sorted(chain.from_iterable(sharding.everywhere(
+        Schedule.objects.filter(
+            date__range=(mondays[0], mondays[-1] + timedelta(days=6))
+        ).order_by('owner_id').values_list(
+            'owner_id', flat=True).distinct())))
+    for position in range(0, len(owner_ids), ROSTER_BATCH_SIZE):
+        render_owner_rosters.delay(
+            owner_ids[position:position + ROSTER_BATCH_SIZE],
+            [monday.isoformat() for monday in mondays]
+        )
+
+
+@shared_task
+def render_owner_rosters(owner_ids, mondays):
+    return roster.render_owners(
+        owner_ids, [date.fromisoformat(monday) for monday in mondays])
+
+
+@shared_task
+def reconcile_attendance():
+    """fan out the reconciliation of every owner clocking in"""
+    for owner_id in attendance.pending_owners():
+        reconcile_owner_attendance.delay(owner_id)
+
+
+@shared_task
+def reconcile_owner_attendance(owner_id):
+    with sharding.for_owner(owner_id):
+        return attendance.reconcile(owner_id)
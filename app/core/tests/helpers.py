@@ -0,0 +1,58 @@
+"""
+    Helpers to build scheduling data in tests
+"""
+from datetime import date, datetime, time, timezone
+
+from django.contrib.auth import get_user_model
+
+from core import models
+
+
+def create_owner(email='owner@example.com', **extra):
+    user = get_user_model().objects.create_user(
+        email=email,
+        password='testpass123',
+        **extra
+    )
+    return models.Owner.objects.create(user=user)
+
+
+def create_employee(owner, email='employee@example.com',
+                    start=date(2024, 1, 1), end=None, contract=None,
+                    **extra):
+    user = get_user_model().objects.create_user(
+        email=email,
+        password='testpass123',
+        **extra
+    )
+    return models.Employee.objects.create(
+        owner=owner,
+        user=user,
+        contract=contract,
+        startDate=start,
+        endDate=end
+    )
+
+
+def aware(day, hour, minute=0):
+    return datetime.combine(day, time(hour, minute), tzinfo=timezone.utc)
+
+
+def create_schedule(owner, day, start_hour=6, end_hour=23):
+    return models.Schedule.objects.create(
+        owner=owner,
+        date=day,
+        start=aware(day, start_hour),
+        end=aware(day, end_hour)
+    )
+
+
+def create_shift(schedule, employee, start_hour, end_hour, task=None):
+    return models.Shift.objects.create(
+        schedule=schedule,
+        employee=employee,
+        shift_date=schedule.date,
+        start_time=aware(schedule.date, start_hour),
+        end_time=aware(schedule.date, end_hour),
+        task=task
+    )
@@ -1,11 +1,18 @@
 """
     Test for the django amdmin modifications
 """
+import warnings
+from datetime import date
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client
 
+from core import models
+from core.tests.helpers import aware, create_owner, create_employee, \
+    create_schedule, create_shift
+
 
 class AdminSiteTests(TestCase):
     """Tests for django admin"""
@@ -42,3 +49,87 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_employee_active_today_filter(self):
+        """Test the employee list filters on the activity period"""
+        owner = create_owner()
+        active = create_employee(owner, email='active@example.com')
+        create_employee(
+            owner, email='gone@example.com', end=date(2024, 1, 31)
+        )
+        url = reverse('admin:core_employee_changelist')
+
+        res = self.client.get(url, {'active_today': 'yes'})
+
+        self.assertEqual(list(res.context['cl'].result_list), [active])
+
+    def test_employee_autocomplete_ordered_by_name(self):
+        """Test the shift employee autocomplete lists employees by name"""
+        owner = create_owner()
+        rossi = create_employee(
+            owner, email='rossi@example.com', last_name='Rossi')
+        bianchi = create_employee(
+            owner, email='bianchi@example.com', last_name='Bianchi')
+        url = reverse('admin:autocomplete')
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            res = self.client.get(url, {
+                'app_label': 'core', 'model_name': 'shift',
+                'field_name': 'employee', 'term': ''})
+
+        self.assertEqual(
+            [result['id'] for result in res.json()['results']],
+            [str(bianchi.pk), str(rossi.pk)])
+
+    def test_shift_save_warns_about_labor_rules(self):
+        """Test saving a shift reports broken working time rules"""
+        owner = create_owner()
+        employee = create_employee(owner)
+        monday = create_schedule(owner, date(2025, 3, 3), end_hour=23)
+        create_shift(monday, employee, 15, 23)
+        tuesday = create_schedule(owner, date(2025, 3, 4))
+        url = reverse('admin:core_shift_add')
+
+        res = self.client.post(url, {
+            'schedule': tuesday.pk,
+            'employee': employee.pk,
+            'shift_date': '2025-03-04',
+            'start_time_0': '2025-03-04',
+            'start_time_1': '06:00:00',
+            'end_time_0': '2025-03-04',
+            'end_time_1': '10:00:00',
+        }, follow=True)
+
+        self.assertContains(res, 'between working days')
+
+    def test_shift_bulk_edit_actions(self):
+        """Test the bulk actions edit every selected shift or none"""
+        owner = create_owner()
+        employee = create_employee(owner)
+        other = create_employee(owner, email='other@example.com')
+        schedule = create_schedule(owner, date(2025, 3, 3))
+        shifts = [create_shift(schedule, employee, hour, hour + 2)
+                  for hour in (8, 11)]
+        selected = [shift.pk for shift in shifts]
+        url = reverse('admin:core_shift_changelist')
+
+        res = self.client.post(url, {
+            'action': 'move_later', '_selected_action': selected,
+        }, follow=True)
+        self.assertContains(res, '2 shifts edited')
+        form = self.client.post(url, {
+            'action': 'edit_selected', '_selected_action': selected,
+        })
+        self.assertContains(form, 'name="apply"')
+        res = self.client.post(url, {
+            'action': 'edit_selected', '_selected_action': selected,
+            'apply': '1', 'minutes': '0', 'employee': other.pk,
+        }, follow=True)
+
+        self.assertContains(res, '2 shifts edited')
+        self.assertEqual(
+            list(models.Shift.objects.order_by('start_time').values_list(
+                'employee', 'start_time')),
+            [(other.pk, aware(schedule.date, 8, 30)),
+             (other.pk, aware(schedule.date, 11, 30))])
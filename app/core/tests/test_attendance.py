@@ -0,0 +1,203 @@
+"""
+    Tests for the clock-in ingestion and reconciliation
+"""
+import threading
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.db import OperationalError, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core import attendance
+from core.models import AttendanceCursor, AttendanceEvent, AttendanceRecord
+from core.tests.helpers import aware, create_owner, create_employee, \
+    create_schedule, create_shift
+
+DAY = date(2024, 3, 4)
+
+
+class AttendanceTests(TestCase):
+    """Test the buffered writes and the matching of events to shifts"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.employee = create_employee(self.owner)
+        self.schedule = create_schedule(self.owner, DAY)
+        self.morning = create_shift(self.schedule, self.employee, 8, 12)
+
+    def event(self, kind, hour, minute=0):
+        return AttendanceEvent(owner=self.owner, employee=self.employee,
+                               kind=kind, occurred=aware(DAY, hour, minute))
+
+    def clock(self, *events):
+        attendance.accept([self.event(*event) for event in events])
+        attendance.flush()
+
+    def record(self, shift):
+        return AttendanceRecord.objects.get(shift=shift)
+
+    @override_settings(ATTENDANCE_BATCH_SIZE=3)
+    def test_events_written_once_the_batch_is_full(self):
+        attendance.accept([self.event('in', 8), self.event('out', 12)])
+        self.assertFalse(AttendanceEvent.objects.exists())
+
+        # the owner's lock and one insert, in a savepoint
+        with self.assertNumQueries(4):
+            attendance.accept([self.event('in', 8)])
+
+        # the same event sent twice is written once
+        self.assertEqual(AttendanceEvent.objects.count(), 2)
+        self.assertEqual(attendance.flush(), 0)
+
+    def test_unwritten_batch_kept_for_the_next_flush(self):
+        attendance.accept([self.event('in', 8)])
+
+        with patch('core.attendance._write', side_effect=OperationalError), \
+                self.assertLogs('core.attendance', 'ERROR'):
+            self.assertEqual(attendance.flush(), 0)
+
+        self.assertEqual(attendance.flush(), 1)
+        self.assertEqual(AttendanceEvent.objects.count(), 1)
+
+    @override_settings(ATTENDANCE_MAX_BUFFERED=2)
+    def test_full_buffer_refuses_events(self):
+        attendance.accept([self.event('in', 8)])
+
+        with self.assertRaises(attendance.BufferFull):
+            attendance.accept([self.event('in', 9), self.event('out', 12)])
+        self.assertEqual(attendance.flush(), 1)
+
+    def test_lateness_and_overtime(self):
+        self.clock(('in', 8, 10), ('out', 12, 30))
+
+        self.assertEqual(attendance.reconcile(self.owner.pk,
+                                              now=aware(DAY, 12, 40)), 1)
+
+        record = self.record(self.morning)
+        self.assertEqual(record.clock_in, aware(DAY, 8, 10))
+        self.assertEqual(record.clock_out, aware(DAY, 12, 30))
+        self.assertEqual(record.late_minutes, 10)
+        self.assertEqual(record.overtime_minutes, 30)
+        self.assertFalse(record.absent)
+
+    def test_events_go_to_the_nearest_shift(self):
+        afternoon = create_shift(self.schedule, self.employee, 13, 17)
+        self.clock(('in', 7, 55), ('out', 12, 5), ('in', 12, 55))
+
+        attendance.reconcile(self.owner.pk, now=aware(DAY, 13))
+
+        self.assertEqual(self.record(self.morning).clock_out,
+                         aware(DAY, 12, 5))
+        self.assertEqual(self.record(afternoon).clock_in, aware(DAY, 12, 55))
+        self.assertEqual(self.record(afternoon).late_minutes, 0)
+
+    def test_later_events_update_the_record(self):
+        self.clock(('in', 8))
+        attendance.reconcile(self.owner.pk, now=aware(DAY, 9))
+        self.clock(('out', 12, 15))
+
+        attendance.reconcile(self.owner.pk, now=aware(DAY, 12, 20))
+
+        record = self.record(self.morning)
+        self.assertEqual((record.clock_in, record.overtime_minutes),
+                         (aware(DAY, 8), 15))
+        self.assertEqual(AttendanceCursor.objects.get().last_event,
+                         AttendanceEvent.objects.latest('pk').pk)
+
+    def test_shift_without_events_is_absent(self):
+        later = create_shift(self.schedule, self.employee, 14, 16)
+
+        attendance.reconcile(self.owner.pk, now=aware(DAY, 13))
+
+        self.assertTrue(self.record(self.morning).absent)
+        self.assertFalse(AttendanceRecord.objects.filter(
+            shift=later).exists())
+
+        # a clock-in sent late overrides the absence
+        self.clock(('in', 8, 20))
+        attendance.reconcile(self.owner.pk, now=aware(DAY, 13, 5))
+        self.assertFalse(self.record(self.morning).absent)
+        self.assertEqual(self.record(self.morning).late_minutes, 20)
+
+    def test_pending_owners(self):
+        other = create_owner(email='other@example.com')
+        self.assertEqual(attendance.pending_owners(), set())
+
+        self.clock(('in', 8))
+
+        self.assertEqual(attendance.pending_owners(), {self.owner.pk})
+        attendance.reconcile(self.owner.pk,
+                             now=aware(DAY, 9) + timedelta(days=1))
+        # reconciled owners stay tracked for their absences
+        self.assertEqual(attendance.pending_owners(), {self.owner.pk})
+        self.assertNotIn(other.pk, attendance.pending_owners())
+
+
+class EventCommitTests(TransactionTestCase):
+    """Test the event writes as they commit: the foreign keys are checked
+    and the cursor never passes an event still uncommitted"""
+
+    def setUp(self):
+        # the shift writes queue dashboard refreshes on commit
+        self.addCleanup(patch.stopall)
+        patch('core.tasks.refresh_dashboard.delay').start()
+        self.owner = create_owner()
+        self.employee = create_employee(self.owner)
+        self.morning = create_shift(
+            create_schedule(self.owner, DAY), self.employee, 8, 12)
+
+    def event(self, kind, hour):
+        return AttendanceEvent(owner=self.owner, employee=self.employee,
+                               kind=kind, occurred=aware(DAY, hour))
+
+    def start(self, target):
+        def run():
+            try:
+                target()
+            finally:
+                connections.close_all()
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_lower_id_committed_after_a_higher_one(self):
+        inserted, release = threading.Event(), threading.Event()
+
+        def clock_in():
+            with transaction.atomic():
+                attendance._write('default', [self.event('in', 8)])
+                inserted.set()
+                release.wait(5)
+
+        first = self.start(clock_in)
+        inserted.wait(5)
+        # written and reconciled while the lower id is not committed
+        later = [
+            self.start(lambda: attendance._write(
+                'default', [self.event('out', 12)])),
+            self.start(lambda: attendance.reconcile(
+                self.owner.pk, now=aware(DAY, 13))),
+        ]
+        for thread in later:
+            thread.join(0.5)
+        release.set()
+        for thread in [first, *later]:
+            thread.join()
+        attendance.reconcile(self.owner.pk, now=aware(DAY, 13))
+
+        record = AttendanceRecord.objects.get(shift=self.morning)
+        self.assertEqual(record.clock_in, aware(DAY, 8))
+        self.assertEqual(record.clock_out, aware(DAY, 12))
+
+    def test_refused_event_dropped_from_its_batch(self):
+        # the employee was deleted before the flush
+        bad = self.event('in', 9)
+        bad.employee_id = 0
+
+        attendance.accept([self.event('in', 8), bad, self.event('out', 12)])
+        with self.assertLogs('core.attendance', 'ERROR') as logs:
+            self.assertEqual(attendance.flush(), 2)
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(AttendanceEvent.objects.count(), 2)
+        self.assertEqual(attendance.flush(), 0)
@@ -0,0 +1,126 @@
+"""
+    Tests for the shift and schedule audit history
+"""
+from datetime import date
+from unittest.mock import patch
+
+from django.db import DatabaseError, IntegrityError, connection, \
+    transaction
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import audit, models
+from core.tests.helpers import create_owner, create_employee, \
+    create_schedule, create_shift
+
+
+class AuditTests(TransactionTestCase):
+    """Test audit versions and the as of reconstruction
+
+    Versions are per transaction: every test commits its own.
+    """
+
+    def setUp(self):
+        # the shift writes queue dashboard refreshes on commit
+        self.addCleanup(patch.stopall)
+        patch('core.tasks.refresh_dashboard.delay').start()
+        self.owner = create_owner()
+        self.employee = create_employee(self.owner)
+        self.day = date(2024, 3, 4)
+
+    def test_one_version_per_transaction(self):
+        with transaction.atomic():
+            schedule = create_schedule(self.owner, self.day)
+            shift = create_shift(schedule, self.employee, 8, 12)
+            shift.end_time = shift.end_time.replace(hour=13)
+            shift.save()
+
+        versions = list(audit.history('shift', shift.pk))
+        self.assertEqual(len(versions), 1)
+        self.assertEqual(versions[0].data['end_time'][11:16], '13:00')
+        self.assertIsNone(versions[0].valid.upper)
+
+    def test_update_stores_changed_fields(self):
+        schedule = create_schedule(self.owner, self.day)
+        shift = create_shift(schedule, self.employee, 8, 12)
+        audit.actor.set(self.owner.user_id)
+        shift.end_time = shift.end_time.replace(hour=14)
+        shift.save()
+        audit.actor.set(None)
+
+        first, second = audit.history('shift', shift.pk)
+        self.assertEqual(list(second.data), ['end_time'])
+        self.assertEqual(second.changed_by_id, self.owner.user_id)
+        self.assertEqual(first.valid.upper, second.valid.lower)
+
+    def test_as_of_rebuilds_past_week(self):
+        schedule = create_schedule(self.owner, self.day)
+        shift = create_shift(schedule, self.employee, 8, 12)
+        before = timezone.now()
+        shift.end_time = shift.end_time.replace(hour=16)
+        shift.save()
+        create_shift(schedule, self.employee, 18, 20)
+        shift_id = shift.pk
+        shift.delete()
+
+        with self.assertNumQueries(1):
+            past = audit.as_of(self.owner, self.day, self.day, before)
+        now = audit.as_of(self.owner, self.day, self.day, timezone.now())
+
+        self.assertEqual(len(past['schedule']), 1)
+        [old] = past['shift']
+        self.assertEqual(old['id'], shift_id)
+        self.assertEqual(old['end_time'][11:16], '12:00')
+        self.assertEqual(
+            [s['start_time'][11:16] for s in now['shift']], ['18:00'])
+
+    def test_rolled_back_changes_not_audited(self):
+        schedule = create_schedule(self.owner, self.day)
+        try:
+            with transaction.atomic():
+                create_shift(schedule, self.employee, 8, 12)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        create_shift(schedule, self.employee, 14, 16)
+
+        self.assertEqual(
+            models.AuditVersion.objects.filter(entity='shift').count(), 1)
+
+    def test_versions_written_once_as_the_transaction_commits(self):
+        schedule = create_schedule(self.owner, self.day)
+
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                shift = create_shift(schedule, self.employee, 8, 12)
+                for hour in (13, 14):
+                    shift.end_time = shift.end_time.replace(hour=hour)
+                    shift.save()
+                self.assertFalse(audit.history('shift', shift.pk).exists())
+
+        audited = [query for query in queries.captured_queries
+                   if 'core_auditversion' in query['sql']]
+        # the read above, the versions read and the versions written
+        self.assertEqual(len(audited), 3)
+        self.assertEqual(len(audit.history('shift', shift.pk)), 1)
+
+    def test_change_rolled_back_with_its_versions(self):
+        schedule = create_schedule(self.owner, self.day)
+
+        with patch('core.audit.flush', side_effect=DatabaseError), \
+                self.assertRaises(DatabaseError):
+            create_shift(schedule, self.employee, 8, 12)
+
+        self.assertFalse(models.Shift.objects.exists())
+
+    def test_one_open_version_per_entity(self):
+        schedule = create_schedule(self.owner, self.day)
+        shift = create_shift(schedule, self.employee, 8, 12)
+
+        with self.assertRaises(IntegrityError):
+            models.AuditVersion.objects.create(
+                owner=self.owner, entity='shift', entity_id=shift.pk,
+                day=self.day, data={},
+                valid=DateTimeTZRange(timezone.now(), None, '[)'))
@@ -0,0 +1,89 @@
+"""
+    Tests for the set-based shift edits
+"""
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from core import bulk_edit, models
+from core.tests.helpers import aware, create_owner, create_employee, \
+    create_schedule, create_shift
+
+DAY = date(2024, 3, 4)
+
+
+class BulkEditTests(TestCase):
+    """Test the change sets are validated together and written at once"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.employee = create_employee(self.owner, email='a@example.com')
+        self.other = create_employee(self.owner, email='b@example.com')
+        self.schedule = create_schedule(self.owner, DAY, 6, 23)
+        self.task = models.Task.objects.create(owner=self.owner, name='Bar')
+        self.shifts = [
+            create_shift(self.schedule, self.employee, hour, hour + 2)
+            for hour in (8, 11, 14)
+        ]
+
+    def selection(self):
+        return models.Shift.objects.filter(employee=self.employee)
+
+    def test_move_by_minutes_in_a_handful_of_queries(self):
+        for hour in range(17, 21):
+            create_shift(self.schedule, self.employee, hour, hour + 1)
+        self.schedule.refresh_from_db()
+        version = self.schedule.version
+
+        with self.assertNumQueries(10):
+            edited = bulk_edit.edit(self.selection(), minutes=30)
+
+        self.assertEqual(len(edited), 7)
+        self.shifts[0].refresh_from_db()
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.shifts[0].start_time, aware(DAY, 8, 30))
+        self.assertEqual(self.shifts[0].end_time, aware(DAY, 10, 30))
+        self.assertEqual(self.schedule.version, version + 1)
+        self.assertEqual(models.ChangeLog.objects.filter(
+            operation=models.ChangeLog.UPDATE).count(), 7)
+
+    def test_retask_and_reassign(self):
+        bulk_edit.edit(self.selection(), task=self.task, employee=self.other)
+
+        self.assertEqual(
+            set(models.Shift.objects.values_list('employee', 'task')),
+            {(self.other.pk, self.task.pk)})
+
+    def test_whole_set_refused_when_one_shift_breaks_a_rule(self):
+        create_shift(self.schedule, self.other, 12, 13)
+
+        with self.assertRaises(ValidationError) as raised:
+            bulk_edit.edit(self.selection(), employee=self.other)
+
+        self.assertEqual(len(raised.exception.messages), 1)
+        self.assertIn('overlaps', raised.exception.messages[0])
+        self.assertFalse(models.Shift.objects.filter(
+            employee=self.other, start_time=aware(DAY, 11)).exists())
+
+    def test_schedule_bounds_and_foreign_rows_checked(self):
+        stranger = create_owner(email='other@example.com')
+        task = models.Task.objects.create(owner=stranger, name='Bar')
+        gone = create_employee(stranger, email='c@example.com',
+                               end=date(2024, 1, 31))
+
+        for changes, message in (
+                ({'minutes': -150}, 'schedule boundaries'),
+                ({'task': task}, 'same owner'),
+                ({'employee': gone}, 'not active')):
+            with self.subTest(message=message), \
+                    self.assertRaisesMessage(ValidationError, message):
+                bulk_edit.edit(self.selection(), **changes)
+
+    def test_shifts_moved_within_the_selection_do_not_clash(self):
+        # each shift moves into the time the next one leaves
+        bulk_edit.edit(self.selection(), minutes=180)
+
+        self.assertEqual(
+            sorted(self.selection().values_list('start_time', flat=True)),
+            [aware(DAY, 11), aware(DAY, 14), aware(DAY, 17)])
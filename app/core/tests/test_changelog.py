@@ -0,0 +1,65 @@
+"""
+    Tests for the schedule change log
+"""
+from datetime import date
+
+from django.test import TestCase
+
+from core import models
+from core.tests.helpers import create_owner, create_employee, \
+    create_schedule, create_shift
+
+
+class ChangeLogTests(TestCase):
+    """Test the change log entries"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.employee = create_employee(self.owner)
+        self.schedule = create_schedule(self.owner, date(2025, 3, 3))
+
+    def operations(self):
+        return list(
+            models.ChangeLog.objects.since(self.owner, 0).values_list(
+                'entity', 'operation'
+            )
+        )
+
+    def test_create_update_delete_recorded_in_order(self):
+        shift = create_shift(self.schedule, self.employee, 8, 12)
+        shift.end_time = shift.end_time.replace(hour=13)
+        shift.save()
+        shift.delete()
+
+        self.assertEqual(self.operations(), [
+            ('schedule', 'create'),
+            ('shift', 'create'),
+            ('shift', 'update'),
+            ('shift', 'delete'),
+        ])
+
+    def test_cascaded_deletes_recorded(self):
+        create_shift(self.schedule, self.employee, 8, 12)
+
+        self.schedule.delete()
+
+        self.assertEqual(self.operations()[-2:], [
+            ('shift', 'delete'),
+            ('schedule', 'delete'),
+        ])
+
+    def test_entry_carries_row_snapshot(self):
+        task = models.Task.objects.create(owner=self.owner, name='Bar')
+
+        entry = models.ChangeLog.objects.get(entity='task')
+
+        self.assertEqual(entry.entity_id, task.pk)
+        self.assertEqual(entry.data, {'owner_id': self.owner.pk,
+                                      'name': 'Bar'})
+
+    def test_since_excludes_other_owners(self):
+        other = create_owner(email='other@example.com')
+        create_schedule(other, date(2025, 3, 3))
+        seq = models.ChangeLog.objects.since(self.owner, 0).last().pk
+
+        self.assertFalse(models.ChangeLog.objects.since(self.owner, seq))
@@ -1,10 +1,13 @@
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
 from django.core.management import call_command
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+
+from core.models import User
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -28,3 +31,16 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class BenchmarkUsersTests(TestCase):
+    """Test the user loading benchmark"""
+
+    def test_reports_each_profile_and_rolls_back(self):
+        out = StringIO()
+
+        call_command('benchmark_users', users=20, employees=5, days=2,
+                     stdout=out)
+
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
+        self.assertFalse(User.objects.exists())
@@ -0,0 +1,90 @@
+"""
+    Tests for the owner dashboard aggregates
+"""
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from core import dashboard, models, tasks
+from core.tests.helpers import create_owner, create_employee, \
+    create_schedule, create_shift
+
+TODAY = date(2025, 3, 5)
+
+
+class DashboardTests(TestCase):
+    """Test computing and caching the dashboard"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = create_owner()
+        contract = models.Contract.objects.create(
+            owner=self.owner, weekHours=20
+        )
+        self.employee = create_employee(self.owner, contract=contract)
+        create_employee(
+            self.owner, email='leaving@example.com', contract=contract,
+            end=TODAY + timedelta(days=10)
+        )
+        create_employee(
+            self.owner, email='gone@example.com', end=date(2025, 1, 31)
+        )
+        schedule = create_schedule(self.owner, TODAY, 8, 18)
+        create_shift(schedule, self.employee, 8, 12)
+        create_shift(schedule, self.employee, 13, 16)
+
+    def test_compute(self):
+        figures = dashboard.compute(self.owner.pk, TODAY)
+
+        self.assertEqual(figures['headcount'], 3)
+        self.assertEqual(figures['active'], 2)
+        self.assertEqual(figures['contracted_hours'], 40)
+        self.assertEqual(figures['scheduled_hours'], 7)
+        self.assertEqual(figures['coverage_gaps'],
+                         [{'date': TODAY, 'minutes': 180}])
+        self.assertEqual(
+            [employee['end'] for employee in figures['expiring']],
+            [TODAY + timedelta(days=10)]
+        )
+
+    def test_compute_query_count(self):
+        with self.assertNumQueries(4):
+            dashboard.compute(self.owner.pk, TODAY)
+
+    def test_get_served_from_cache(self):
+        dashboard.get(self.owner.pk)
+
+        with self.assertNumQueries(0):
+            dashboard.get(self.owner.pk)
+
+    @patch('core.tasks.refresh_dashboard.delay')
+    def test_change_queues_one_refresh(self, patched_delay):
+        cache.clear()
+        schedule = models.Schedule.objects.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_shift(schedule, self.employee, 16, 18)
+            create_shift(schedule, self.employee, 12, 13)
+
+        patched_delay.assert_called_once_with(self.owner.pk)
+
+    @patch('core.tasks.refresh_dashboard.delay')
+    def test_refresh_serves_and_requeues(self, patched_delay):
+        # get() serves the figures of the current day
+        schedule = create_schedule(self.owner, timezone.localdate(), 8, 18)
+        self.assertEqual(dashboard.get(self.owner.pk)['scheduled_hours'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_shift(schedule, self.employee, 16, 18)
+        self.assertEqual(dashboard.get(self.owner.pk)['scheduled_hours'], 0)
+
+        # the worker's refresh reaches the figures served and lets the
+        # next change queue another one
+        tasks.refresh_dashboard(self.owner.pk)
+        self.assertEqual(dashboard.get(self.owner.pk)['scheduled_hours'], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_shift(schedule, self.employee, 12, 13)
+
+        self.assertEqual(patched_delay.call_count, 2)
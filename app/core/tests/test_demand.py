@@ -0,0 +1,98 @@
+"""
+    Tests for the staffing demand forecast and gap analysis
+"""
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.test import TestCase, override_settings
+
+from core import demand, models
+from core.tests.helpers import create_owner, create_employee, \
+    create_schedule
+
+ROME = ZoneInfo('Europe/Rome')
+MONDAY = date(2024, 3, 4)
+
+
+@override_settings(STAFFING_TIME_ZONE='Europe/Rome',
+                   STAFFING_BUCKET_MINUTES=60)
+class DemandTests(TestCase):
+    """Test coverage buckets, forecast and gaps"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.bar = models.Task.objects.create(owner=self.owner, name='Bar')
+        self.first = create_employee(self.owner, email='a@example.com')
+        self.second = create_employee(self.owner, email='b@example.com')
+
+    def add_shift(self, employee, day, start_hour, end_hour, task=None):
+        schedule = models.Schedule.objects.filter(
+            owner=self.owner, date=day).first() \
+            or create_schedule(self.owner, day, 0, 23)
+        return models.Shift.objects.create(
+            schedule=schedule,
+            employee=employee,
+            shift_date=day,
+            start_time=datetime.combine(day, time(start_hour), ROME),
+            end_time=datetime.combine(day, time(end_hour), ROME),
+            task=task or self.bar
+        )
+
+    def test_coverage_counts_local_buckets(self):
+        self.add_shift(self.first, MONDAY, 8, 12)
+        self.add_shift(self.second, MONDAY, 10, 14)
+
+        with self.assertNumQueries(1):
+            task_ids, counts = demand.coverage(self.owner, MONDAY, MONDAY)
+
+        self.assertEqual(list(task_ids), [self.bar.pk])
+        self.assertEqual(list(counts[0, 0, 7:15]), [0, 1, 1, 2, 2, 1, 1, 0])
+
+    def test_forecast_takes_weekday_median(self):
+        for week in range(3):
+            monday = MONDAY + timedelta(weeks=week)
+            self.add_shift(self.first, monday, 8, 10)
+            if week:
+                self.add_shift(self.second, monday, 8, 9)
+
+        found = demand.forecast(
+            self.owner, MONDAY, MONDAY + timedelta(days=20))
+
+        self.assertEqual(found, {
+            (self.bar.pk, 0, 8 * 60): 2,
+            (self.bar.pk, 0, 9 * 60): 1,
+        })
+
+    @override_settings(STAFFING_HISTORY_DAYS=7)
+    def test_apply_forecast_keeps_manual_demand(self):
+        models.StaffingDemand.objects.create(
+            owner=self.owner, task=self.bar, weekday=0, minute=8 * 60,
+            headcount=3
+        )
+        self.add_shift(self.first, MONDAY, 8, 10)
+
+        demand.apply_forecast(self.owner, today=MONDAY + timedelta(days=1))
+
+        self.assertEqual(
+            list(models.StaffingDemand.objects.order_by('minute').values_list(
+                'minute', 'headcount', 'forecast')),
+            [(8 * 60, 3, False), (9 * 60, 1, True)]
+        )
+
+    def test_gaps_merge_understaffed_buckets(self):
+        for hour in (8, 9, 10):
+            models.StaffingDemand.objects.create(
+                owner=self.owner, task=self.bar, weekday=0,
+                minute=hour * 60, headcount=2
+            )
+        self.add_shift(self.first, MONDAY, 8, 10)
+        self.add_shift(self.second, MONDAY, 8, 9)
+
+        found = demand.gaps(self.owner, MONDAY, MONDAY + timedelta(days=6))
+
+        self.assertEqual(found, [
+            {'task_id': self.bar.pk, 'date': MONDAY, 'start': 9 * 60,
+             'end': 10 * 60, 'required': 2, 'scheduled': 1},
+            {'task_id': self.bar.pk, 'date': MONDAY, 'start': 10 * 60,
+             'end': 11 * 60, 'required': 2, 'scheduled': 0},
+        ])
@@ -0,0 +1,107 @@
+"""
+    Tests for the Parquet export
+"""
+import shutil
+import tempfile
+from datetime import date
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+import pyarrow.parquet as pq
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+
+from core import export, models
+from core.tests.helpers import aware, create_owner, create_employee, \
+    create_schedule, create_shift
+
+MARCH = date(2024, 3, 4)
+APRIL = date(2024, 4, 2)
+
+
+class ExportTests(TransactionTestCase):
+    """Test partitions, record batches and incremental exports
+
+    Incremental exports follow the audit versions of committed
+    transactions, so the tests commit theirs.
+    """
+
+    def setUp(self):
+        # the shift writes queue dashboard refreshes on commit
+        self.addCleanup(patch.stopall)
+        patch('core.tasks.refresh_dashboard.delay').start()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.owner = create_owner()
+        self.employee = create_employee(self.owner)
+        models.Task.objects.create(owner=self.owner, name='Bar')
+        self.march = create_schedule(self.owner, MARCH)
+        self.april = create_schedule(self.owner, APRIL)
+        self.shift = create_shift(self.march, self.employee, 8, 12)
+        create_shift(self.march, self.employee, 13, 15)
+
+        self.other = create_owner(email='other@example.com')
+        create_shift(create_schedule(self.other, MARCH),
+                     create_employee(self.other, email='b@example.com'),
+                     8, 9)
+
+    def partition(self, owner, month):
+        return Path(self.root, 'shifts', f'owner={owner.pk}',
+                    f'month={month}', 'data.parquet')
+
+    def test_full_export_partitions_by_owner_and_month(self):
+        result = export.export(self.root)
+
+        self.assertEqual(result['shifts'], 2)
+        self.assertEqual(result['tasks'], 1)
+        table = pq.read_table(self.partition(self.owner, '2024-03'))
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(table.column('start_time')[0].as_py(),
+                         aware(MARCH, 8))
+        self.assertEqual(export.read(self.root).num_rows, 3)
+
+    @override_settings(EXPORT_CHUNK_ROWS=1)
+    def test_chunks_become_record_batches(self):
+        export.export(self.root)
+
+        parquet = pq.ParquetFile(self.partition(self.owner, '2024-03'))
+        self.assertEqual(parquet.metadata.num_rows, 2)
+        self.assertEqual(parquet.metadata.num_row_groups, 2)
+
+    def test_incremental_export_rewrites_changed_months(self):
+        export.export(self.root)
+        untouched = self.partition(self.other, '2024-03').stat().st_mtime_ns
+
+        self.shift.schedule = self.april
+        self.shift.shift_date = APRIL
+        self.shift.start_time = aware(APRIL, 8)
+        self.shift.end_time = aware(APRIL, 12)
+        self.shift.save()
+        result = export.export(self.root)
+
+        self.assertEqual(result['shifts'], 2)
+        self.assertEqual(
+            pq.read_table(self.partition(self.owner, '2024-03')).num_rows, 1)
+        self.assertEqual(
+            pq.read_table(self.partition(self.owner, '2024-04')).num_rows, 1)
+        self.assertEqual(
+            self.partition(self.other, '2024-03').stat().st_mtime_ns,
+            untouched)
+
+    def test_incremental_export_removes_emptied_months(self):
+        export.export(self.root)
+
+        models.Shift.objects.filter(owner=self.owner).delete()
+        result = export.export(self.root)
+
+        self.assertEqual(result['removed'], 1)
+        self.assertFalse(self.partition(self.owner, '2024-03').exists())
+
+    def test_command(self):
+        out = StringIO()
+
+        call_command('export_parquet', '--root', self.root, stdout=out)
+
+        self.assertIn('export complete', out.getvalue())
+        self.assertTrue(Path(self.root, export.STATE_FILE).exists())
@@ -0,0 +1,116 @@
+"""
+    Tests for the working time rules validator
+"""
+from datetime import date, timedelta
+
+from django.test import TestCase
+
+from core import labor_rules, models
+from core.tests.helpers import create_owner, create_employee, \
+    create_schedule, create_shift
+
+MONDAY = date(2025, 3, 3)
+
+
+class LaborRulesTests(TestCase):
+    """Test the cross shift rules"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        contract = models.Contract.objects.create(
+            owner=self.owner, weekHours=20
+        )
+        self.employee = create_employee(self.owner, contract=contract)
+        self.schedules = {}
+
+    def shift(self, day, start_hour, end_hour, employee=None):
+        if day not in self.schedules:
+            self.schedules[day] = create_schedule(
+                self.owner, day, start_hour=0, end_hour=23
+            )
+        return create_shift(self.schedules[day], employee or self.employee,
+                            start_hour, end_hour)
+
+    def rules(self, start=MONDAY, end=MONDAY + timedelta(days=6)):
+        return [violation.rule for violation in
+                labor_rules.validate(self.owner, start, end)]
+
+    def test_regular_week_is_valid(self):
+        for offset in range(5):
+            self.shift(MONDAY + timedelta(days=offset), 9, 13)
+
+        self.assertEqual(self.rules(), [])
+
+    def test_short_rest_between_days(self):
+        late = self.shift(MONDAY, 15, 23)
+        early = self.shift(MONDAY + timedelta(days=1), 6, 10)
+
+        violations = labor_rules.validate(
+            self.owner, MONDAY, MONDAY + timedelta(days=6)
+        )
+
+        self.assertEqual(len(violations), 1)
+        self.assertEqual(violations[0].rule, 'daily_rest')
+        self.assertEqual(violations[0].shift_ids, [late.pk, early.pk])
+        self.assertEqual(violations[0].value, 7)
+
+    def test_split_shift_same_day_allowed(self):
+        self.shift(MONDAY, 8, 12)
+        self.shift(MONDAY, 14, 18)
+
+        self.assertEqual(self.rules(), [])
+
+    def test_no_weekly_rest(self):
+        # a shift every day leaving less than 24 hours off anywhere
+        self.employee.contract = None
+        self.employee.save()
+        for offset in range(7):
+            self.shift(MONDAY + timedelta(days=offset), 9, 13)
+
+        self.assertEqual(self.rules(), ['weekly_rest'])
+
+    def test_weekly_hours_over_contract(self):
+        for offset in range(3):
+            self.shift(MONDAY + timedelta(days=offset), 8, 16)
+
+        violations = labor_rules.validate(
+            self.owner, MONDAY, MONDAY + timedelta(days=6)
+        )
+
+        self.assertEqual([v.rule for v in violations], ['weekly_hours'])
+        self.assertEqual(violations[0].value, 24)
+        self.assertEqual(violations[0].limit, 20)
+
+    def test_employees_checked_separately(self):
+        colleague = create_employee(self.owner, email='col@example.com')
+        self.shift(MONDAY, 15, 23)
+        self.shift(MONDAY + timedelta(days=1), 6, 10, employee=colleague)
+
+        self.assertEqual(self.rules(), [])
+
+    def test_weekly_rest_not_measured_from_another_employee(self):
+        # the colleague rests monday and tuesday, after this employee's
+        # sunday shift in the sorted rows
+        colleague = create_employee(self.owner, email='col@example.com')
+        self.shift(MONDAY + timedelta(days=6), 9, 13)
+        for offset in range(2, 7):
+            self.shift(MONDAY + timedelta(days=offset), 9, 13,
+                       employee=colleague)
+
+        self.assertEqual(self.rules(), [])
+
+    def test_neighbouring_week_not_reported(self):
+        self.shift(MONDAY - timedelta(days=1), 15, 23)
+        self.shift(MONDAY, 6, 10)
+
+        self.assertEqual(self.rules(MONDAY + timedelta(days=1)), [])
+        self.assertEqual(self.rules(MONDAY), ['daily_rest'])
+
+    def test_single_query(self):
+        for offset in range(5):
+            self.shift(MONDAY + timedelta(days=offset), 9, 13)
+
+        with self.assertNumQueries(1):
+            labor_rules.validate(
+                self.owner, MONDAY, MONDAY + timedelta(days=6)
+            )
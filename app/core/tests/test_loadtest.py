@@ -0,0 +1,50 @@
+"""
+    Tests for the load test harness
+"""
+from django.test import TestCase, modify_settings
+from django.urls import reverse
+
+from core import loadtest, models
+
+
+class LoadTestTests(TestCase):
+    """Test seeding, the query header and the results summary"""
+
+    def test_seed_replaces_synthetic_data(self):
+        loadtest.seed(owners=2, employees=3, days=4)
+        loadtest.seed(owners=1, employees=3, days=4)
+
+        [target] = loadtest.targets()
+        self.assertEqual(len(target['employees']), 3)
+        self.assertEqual(len(target['schedules']), 4)
+        self.assertEqual(models.Shift.objects.count(), 12)
+        owner = models.User.objects.get(email=target['email'])
+        self.assertTrue(owner.has_perm('core.add_shift'))
+
+    @modify_settings(MIDDLEWARE={
+        'prepend': 'core.middleware.QueryCountMiddleware'})
+    def test_query_count_header(self):
+        [email] = loadtest.seed(owners=1, employees=1, days=1)
+        self.client.force_login(models.User.objects.get(email=email))
+
+        res = self.client.get(reverse('admin:core_shift_changelist'))
+
+        self.assertGreater(int(res[loadtest.QUERY_HEADER]), 0)
+
+    def test_summary(self):
+        samples = {
+            'week_views': [
+                (seconds / 1000, 4, loadtest.OK) for seconds in range(1, 101)
+            ] + [(0.5, 2, loadtest.ERROR), (0.5, 9, loadtest.REJECTED)],
+            'add_shift': [],
+        }
+
+        report = loadtest.summary(samples, elapsed=2)
+
+        self.assertEqual(list(report), ['week_views'])
+        week = report['week_views']
+        self.assertEqual(week['count'], 102)
+        self.assertEqual((week['errors'], week['rejected']), (1, 1))
+        self.assertEqual(week['throughput'], 51)
+        self.assertEqual(week['latency_ms']['p50'], 51.5)
+        self.assertEqual(week['queries']['max'], 9)
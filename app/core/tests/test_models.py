@@ -1,10 +1,18 @@
 """
 Test for models.
 """
+from datetime import date
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.utils import DataError, IntegrityError
+from phonenumber_field.phonenumber import PhoneNumber
 
-# from django.db.utils import IntegrityError
+from core import models
+from core.tests.helpers import create_owner, create_employee, \
+    create_schedule, create_shift
 
 
 class ModelTest(TestCase):
@@ -51,3 +59,156 @@ class ModelTest(TestCase):
         self.assertTrue(user.is_staff)
 
 # ------------- tests for daily shift --------------------------------------
+
+
+class ShiftOwnerTests(TestCase):
+    """Test the denormalized shift owner"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.employee = create_employee(self.owner)
+        self.schedule = create_schedule(self.owner, date(2025, 3, 3))
+
+    def test_owner_copied_from_schedule(self):
+        shift = create_shift(self.schedule, self.employee, 8, 12)
+
+        self.assertEqual(shift.owner_id, self.owner.id)
+
+    def test_for_owner_filters_by_owner_and_range(self):
+        other = create_owner(email='other@example.com')
+        other_employee = create_employee(other, email='oe@example.com')
+        other_schedule = create_schedule(other, date(2025, 3, 3))
+        create_shift(other_schedule, other_employee, 8, 12)
+        late = create_shift(self.schedule, self.employee, 14, 18)
+        early = create_shift(self.schedule, self.employee, 8, 12)
+        april = create_schedule(self.owner, date(2025, 4, 1))
+        create_shift(april, self.employee, 8, 12)
+
+        shifts = models.Shift.objects.for_owner(
+            self.owner, date(2025, 3, 1), date(2025, 3, 31)
+        )
+
+        self.assertEqual(list(shifts), [early, late])
+
+    def test_schedule_owner_change_cascades_to_shifts(self):
+        shift = create_shift(self.schedule, self.employee, 8, 12)
+        other = create_owner(email='other@example.com')
+
+        self.schedule.owner = other
+        self.schedule.save()
+
+        shift.refresh_from_db()
+        self.assertEqual(shift.owner_id, other.id)
+        self.assertFalse(models.Shift.objects.owner_mismatch().exists())
+
+    def test_mismatched_owner_rejected(self):
+        shift = create_shift(self.schedule, self.employee, 8, 12)
+        other = create_owner(email='other@example.com')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.Shift.objects.filter(pk=shift.pk).update(owner=other)
+
+
+class EmployeeActiveOnTests(TestCase):
+    """Test the employee activity period queries"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.open_ended = create_employee(
+            self.owner, email='open@example.com', start=date(2025, 1, 1)
+        )
+        self.ended = create_employee(
+            self.owner, email='ended@example.com',
+            start=date(2024, 1, 1), end=date(2025, 2, 28)
+        )
+        self.future = create_employee(
+            self.owner, email='future@example.com', start=date(2025, 6, 1)
+        )
+
+    def test_active_on_date(self):
+        active = models.Employee.objects.active_on(
+            self.owner, date(2025, 2, 28)
+        )
+
+        self.assertCountEqual(active, [self.open_ended, self.ended])
+
+    def test_active_on_range_overlaps(self):
+        active = models.Employee.objects.active_on(
+            self.owner, (date(2025, 3, 1), date(2025, 6, 1))
+        )
+
+        self.assertCountEqual(active, [self.open_ended, self.future])
+
+    def test_active_on_other_owner_excluded(self):
+        other = create_owner(email='other@example.com')
+
+        self.assertFalse(
+            models.Employee.objects.active_on(other, date(2025, 3, 1))
+        )
+
+    def test_is_active_on_matches_queryset(self):
+        day = date(2025, 3, 1)
+        active = set(models.Employee.objects.active_on(self.owner, day))
+
+        for employee in (self.open_ended, self.ended, self.future):
+            self.assertEqual(employee.is_active_on(day), employee in active)
+
+    def test_shift_clean_rejects_inactive_employee(self):
+        schedule = create_schedule(self.owner, date(2025, 3, 3))
+        shift = models.Shift(
+            schedule=schedule,
+            employee=self.future,
+            shift_date=schedule.date,
+            start_time=schedule.start,
+            end_time=schedule.end
+        )
+
+        with self.assertRaises(ValidationError):
+            shift.clean()
+
+    def test_end_before_start_rejected(self):
+        self.ended.endDate = date(2023, 12, 31)
+
+        with self.assertRaises(ValidationError) as raised:
+            self.ended.full_clean()
+        self.assertIn('endDate', raised.exception.message_dict)
+        # the database refuses it too, computing active_range or checking
+        with self.assertRaises((DataError, IntegrityError)), \
+                transaction.atomic():
+            models.Employee.objects.filter(pk=self.ended.pk).update(
+                endDate=date(2023, 12, 31))
+
+
+class LeanUserLoadingTests(TestCase):
+    """Test lazy phone numbers and the display loading profiles"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.employee = create_employee(
+            self.owner, first_name='Mario', last_name='Rossi',
+            mobile_phone='+393471234567'
+        )
+
+    def test_phone_parsed_on_access(self):
+        user = get_user_model().objects.get(pk=self.employee.user_id)
+
+        self.assertIsInstance(user.__dict__['mobile_phone'], str)
+        self.assertEqual(user.mobile_phone.as_e164, '+393471234567')
+        self.assertIsInstance(user.__dict__['mobile_phone'], PhoneNumber)
+
+    def test_display_defers_detail_fields(self):
+        user = get_user_model().objects.display().get(
+            pk=self.employee.user_id)
+
+        self.assertIn('mobile_phone', user.get_deferred_fields())
+        with self.assertNumQueries(0):
+            self.assertEqual(str(user), 'Mario Rossi')
+
+    def test_shift_names_in_one_query(self):
+        schedule = create_schedule(self.owner, date(2024, 3, 4))
+        create_shift(schedule, self.employee, 8, 12)
+
+        with self.assertNumQueries(1):
+            shift = models.Shift.objects.with_names().get()
+            str(shift)
+        self.assertIn('phone', shift.employee.user.get_deferred_fields())
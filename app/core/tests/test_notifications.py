@@ -0,0 +1,120 @@
+"""
+    Tests for the shift change digests
+"""
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.core import mail
+from django.test import TestCase
+from django.utils import timezone
+
+from core import models, notifications, tasks
+from core.tests.helpers import create_owner, create_employee, \
+    create_schedule, create_shift
+
+
+class ShiftDigestTests(TestCase):
+    """Test collecting and sending the shift digests"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.employee = create_employee(self.owner)
+        self.colleague = create_employee(
+            self.owner, email='colleague@example.com'
+        )
+        self.schedule = create_schedule(self.owner, date(2025, 3, 3))
+
+    def later(self):
+        return timezone.now() + timedelta(hours=1)
+
+    def test_recent_changes_wait_for_debounce(self):
+        create_shift(self.schedule, self.employee, 8, 12)
+
+        self.assertEqual(notifications.ready_owners(), [])
+        self.assertEqual(
+            notifications.ready_owners(self.later()),
+            [(self.owner.pk, models.ChangeLog.objects.last().pk)]
+        )
+
+    def test_one_digest_per_employee(self):
+        create_shift(self.schedule, self.employee, 8, 10)
+        create_shift(self.schedule, self.employee, 14, 16)
+        create_shift(self.schedule, self.colleague, 10, 14)
+        upto = models.ChangeLog.objects.last().pk
+
+        sent = notifications.deliver(self.owner.pk, upto)
+
+        self.assertEqual(sent, 2)
+        self.assertCountEqual(
+            [message.to for message in mail.outbox],
+            [['employee@example.com'], ['colleague@example.com']]
+        )
+        digest = next(message for message in mail.outbox
+                      if message.to == ['employee@example.com'])
+        self.assertIn('2025-03-03 08:00-10:00: new', digest.body)
+        self.assertIn('2025-03-03 14:00-16:00: new', digest.body)
+
+    def test_created_then_removed_shift_not_notified(self):
+        shift = create_shift(self.schedule, self.employee, 8, 12)
+        shift.delete()
+        upto = models.ChangeLog.objects.last().pk
+
+        self.assertEqual(notifications.deliver(self.owner.pk, upto), 0)
+        self.assertEqual(mail.outbox, [])
+
+    def test_reassigned_shift_removed_for_previous_employee(self):
+        shift = create_shift(self.schedule, self.employee, 8, 12)
+        notifications.deliver(self.owner.pk,
+                              models.ChangeLog.objects.last().pk)
+        mail.outbox.clear()
+        # edited, then handed over, within the next digest
+        shift.end_time += timedelta(hours=1)
+        shift.save()
+        shift.employee = self.colleague
+        shift.save()
+
+        self.assertEqual(notifications.deliver(
+            self.owner.pk, models.ChangeLog.objects.last().pk), 2)
+
+        digests = {message.to[0]: message.body for message in mail.outbox}
+        self.assertIn('08:00-13:00: removed',
+                      digests['employee@example.com'])
+        self.assertIn('08:00-13:00: new', digests['colleague@example.com'])
+
+    def test_shift_reassigned_after_its_digest(self):
+        shift = create_shift(self.schedule, self.employee, 8, 12)
+        notifications.deliver(self.owner.pk,
+                              models.ChangeLog.objects.last().pk)
+        mail.outbox.clear()
+        shift.employee = self.colleague
+        shift.save()
+
+        self.assertEqual(notifications.deliver(
+            self.owner.pk, models.ChangeLog.objects.last().pk), 2)
+
+        digests = {message.to[0]: message.body for message in mail.outbox}
+        self.assertIn('08:00-12:00: removed',
+                      digests['employee@example.com'])
+        self.assertIn('08:00-12:00: new', digests['colleague@example.com'])
+
+    def test_delivered_changes_not_sent_again(self):
+        create_shift(self.schedule, self.employee, 8, 12)
+        upto = models.ChangeLog.objects.last().pk
+        notifications.deliver(self.owner.pk, upto)
+
+        self.assertEqual(notifications.deliver(self.owner.pk, upto), 0)
+        self.assertEqual(notifications.ready_owners(self.later()), [])
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_periodic_task_fans_out(self):
+        create_shift(self.schedule, self.employee, 8, 12)
+        models.ChangeLog.objects.update(
+            created=timezone.now() - timedelta(hours=1)
+        )
+
+        with patch('core.tasks.deliver_shift_digests.delay',
+                   side_effect=tasks.deliver_shift_digests) as delay:
+            tasks.send_shift_digests()
+
+        delay.assert_called_once()
+        self.assertEqual(len(mail.outbox), 1)
@@ -0,0 +1,108 @@
+"""
+    Tests for the payroll hours engine
+"""
+from datetime import date
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from core import intervals, models, payroll
+from core.tests.helpers import create_owner, create_employee, \
+    create_schedule, create_shift
+
+
+class IntervalTests(SimpleTestCase):
+    """Test the vectorized interval helpers"""
+
+    def test_merge_joins_overlapping_intervals(self):
+        starts, ends = intervals.merge([10, 0, 5, 30], [20, 6, 8, 40])
+
+        self.assertEqual(starts.tolist(), [0, 10, 30])
+        self.assertEqual(ends.tolist(), [8, 20, 40])
+
+    def test_overlap_measures_window_coverage(self):
+        covered = intervals.overlap(
+            [0, 15, 45, 100], [50, 35, 60, 110],
+            np.array([10, 30]), np.array([20, 40])
+        )
+
+        self.assertEqual(covered.tolist(), [20, 10, 0, 0])
+
+
+class HolidayTests(SimpleTestCase):
+    """Test the Italian holiday calendar"""
+
+    def test_easter(self):
+        self.assertEqual(payroll.easter(2024), date(2024, 3, 31))
+        self.assertEqual(payroll.easter(2025), date(2025, 4, 20))
+
+    def test_holidays_include_easter_monday(self):
+        days = payroll.holidays(2025)
+
+        self.assertIn(date(2025, 4, 21), days)
+        self.assertIn(date(2025, 6, 2), days)
+        self.assertNotIn(date(2025, 4, 22), days)
+
+
+class OwnerHoursTests(TestCase):
+    """Test the payable minutes split"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.employee = create_employee(self.owner)
+        self.task = models.Task.objects.create(owner=self.owner, name='Bar')
+
+    def hours(self, day):
+        return payroll.owner_hours(self.owner, day, day)
+
+    def test_weekday_shift_is_regular(self):
+        schedule = create_schedule(self.owner, date(2025, 3, 4))
+        create_shift(schedule, self.employee, 8, 12)
+
+        minutes = self.hours(date(2025, 3, 4))['employees'][self.employee.pk]
+
+        self.assertEqual(minutes, {
+            'regular': 240, 'night': 0, 'sunday': 0, 'holiday': 0,
+            'total': 240,
+        })
+
+    def test_evening_shift_split_at_local_night_start(self):
+        # 19:00-23:00 UTC is 20:00-24:00 in Rome
+        schedule = create_schedule(self.owner, date(2025, 3, 4))
+        create_shift(schedule, self.employee, 19, 23)
+
+        minutes = self.hours(date(2025, 3, 4))['employees'][self.employee.pk]
+
+        self.assertEqual(minutes['regular'], 120)
+        self.assertEqual(minutes['night'], 120)
+
+    def test_sunday_and_holiday_premiums(self):
+        sunday = create_schedule(self.owner, date(2025, 3, 2))
+        create_shift(sunday, self.employee, 8, 12)
+        liberation = create_schedule(self.owner, date(2025, 4, 25))
+        create_shift(liberation, self.employee, 8, 10)
+
+        result = payroll.owner_hours(
+            self.owner, date(2025, 3, 1), date(2025, 4, 30)
+        )
+        minutes = result['employees'][self.employee.pk]
+
+        self.assertEqual(minutes['sunday'], 240)
+        self.assertEqual(minutes['holiday'], 120)
+        self.assertEqual(minutes['regular'], 0)
+
+    def test_totals_per_task(self):
+        schedule = create_schedule(self.owner, date(2025, 3, 4))
+        create_shift(schedule, self.employee, 8, 12, task=self.task)
+        create_shift(schedule, self.employee, 13, 14)
+
+        tasks = self.hours(date(2025, 3, 4))['tasks']
+
+        self.assertEqual(tasks[self.task.pk]['total'], 240)
+        self.assertEqual(tasks[None]['total'], 60)
+
+    def test_no_shifts(self):
+        self.assertEqual(
+            self.hours(date(2025, 3, 4)),
+            {'employees': {}, 'tasks': {}}
+        )
@@ -0,0 +1,101 @@
+"""
+    Tests for the batched owner purge
+"""
+from datetime import date, time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import models, purge
+from core.tests.helpers import create_owner, create_employee, \
+    create_schedule, create_shift
+
+DAY = date(2024, 3, 4)
+SHIFTS = next(step for step in purge.STEPS if step.name == 'shifts')
+
+
+class PurgeTests(TestCase):
+    """Test the purge steps, batching and resuming"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        contract = models.Contract.objects.create(
+            owner=self.owner, weekHours=20)
+        self.employee = create_employee(self.owner, contract=contract)
+        task = models.Task.objects.create(owner=self.owner, name='Bar')
+        for offset in range(3):
+            schedule = create_schedule(
+                self.owner, date(2024, 3, 4 + offset))
+            create_shift(schedule, self.employee, 8, 12, task)
+            create_shift(schedule, self.employee, 13, 15, task)
+        models.ShiftTemplate.objects.create(
+            owner=self.owner, employee=self.employee, task=task,
+            weekdays=[0], start_time=time(8), end_time=time(12),
+            valid_from=DAY)
+        models.StaffingDemand.objects.create(
+            owner=self.owner, task=task, weekday=0, minute=480, headcount=1)
+
+        self.other = create_owner(email='other@example.com')
+        other_employee = create_employee(
+            self.other, email='staff@example.com')
+        create_shift(create_schedule(self.other, DAY), other_employee, 8, 9)
+
+    def test_purge_removes_the_owner_rows_only(self):
+        untouched = models.Shift.objects.filter(owner=self.other).count()
+
+        done = purge.purge(self.owner.pk, batch_size=2)
+
+        self.assertEqual(done['shifts'], 6)
+        self.assertEqual(done['schedules'], 3)
+        self.assertEqual(done['owner'], 1)
+        self.assertEqual(set(purge.remaining(self.owner.pk).values()), {0})
+        self.assertFalse(models.Owner.objects.filter(
+            pk=self.owner.pk).exists())
+        self.assertFalse(models.ChangeLog.objects.filter(
+            owner_id=self.owner.pk).exists())
+        self.employee.refresh_from_db()
+        self.assertIsNone(self.employee.owner_id)
+        self.assertIsNone(self.employee.contract_id)
+        self.assertEqual(models.Shift.objects.filter(
+            owner=self.other).count(), untouched)
+
+    def test_progress_is_reported_per_batch(self):
+        reported = []
+
+        purge.purge(self.owner.pk, batch_size=4,
+                    progress=lambda *args: reported.append(args))
+
+        self.assertEqual(reported[:2], [('shifts', 4), ('shifts', 6)])
+
+    def test_batch_is_one_select_and_one_delete(self):
+        # savepoint, lock timeout, select, delete, release
+        with self.assertNumQueries(5):
+            purge._batch(SHIFTS, self.owner.pk, 1000)
+
+    def test_interrupted_purge_resumes(self):
+        purge._batch(SHIFTS, self.owner.pk, 4)
+
+        done = purge.purge(self.owner.pk)
+
+        self.assertEqual(done['shifts'], 2)
+        self.assertFalse(models.Owner.objects.filter(
+            pk=self.owner.pk).exists())
+
+    def test_command_dry_run_counts_only(self):
+        out = StringIO()
+
+        call_command('purge_owner', self.owner.pk, '--dry-run', stdout=out)
+
+        self.assertIn('shifts', out.getvalue())
+        self.assertTrue(models.Owner.objects.filter(
+            pk=self.owner.pk).exists())
+
+    def test_command_purges(self):
+        out = StringIO()
+
+        call_command('purge_owner', self.owner.pk, stdout=out)
+
+        self.assertIn(f'owner {self.owner.pk} purged', out.getvalue())
+        self.assertFalse(models.Owner.objects.filter(
+            pk=self.owner.pk).exists())
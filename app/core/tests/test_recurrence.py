@@ -0,0 +1,120 @@
+"""
+    Tests for the recurring shift templates
+"""
+from datetime import date, time
+
+from django.test import TestCase
+
+from core import models, recurrence
+from core.tests.helpers import aware, create_owner, create_employee, \
+    create_schedule, create_shift
+
+
+class RecurrenceTests(TestCase):
+    """Test the lazy expansion and materialization of templates"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.employee = create_employee(self.owner)
+        # mondays and wednesdays of march 2025, 9:00-13:00
+        self.template = models.ShiftTemplate.objects.create(
+            owner=self.owner,
+            employee=self.employee,
+            weekdays=[0, 2],
+            start_time=time(9),
+            end_time=time(13),
+            valid_from=date(2025, 3, 1),
+            valid_until=date(2025, 3, 31)
+        )
+
+    def test_occurrence_dates(self):
+        days = list(recurrence.occurrence_dates(
+            self.template, date(2025, 3, 1), date(2025, 3, 12)
+        ))
+
+        self.assertEqual(days, [
+            date(2025, 3, 3), date(2025, 3, 5),
+            date(2025, 3, 10), date(2025, 3, 12),
+        ])
+
+    def test_interval_skips_weeks(self):
+        self.template.interval = 2
+
+        days = list(recurrence.occurrence_dates(
+            self.template, date(2025, 3, 1), date(2025, 3, 23)
+        ))
+
+        # the week of saturday march 1st is the first one
+        self.assertEqual(days, [date(2025, 3, 10), date(2025, 3, 12)])
+
+    def test_expand_does_not_write(self):
+        shifts = recurrence.expand(
+            self.owner, date(2025, 3, 1), date(2025, 3, 31)
+        )
+
+        self.assertEqual(len(shifts), 9)
+        self.assertTrue(all(shift.pk is None for shift in shifts))
+        self.assertFalse(models.Shift.objects.exists())
+
+    def test_occurrences_keep_local_hours_across_dst(self):
+        before, after = (
+            recurrence.occurrence(self.template, day)
+            for day in (date(2025, 3, 24), date(2025, 3, 31)))
+
+        self.assertEqual(before.start_time, aware(date(2025, 3, 24), 8))
+        self.assertEqual(after.start_time, aware(date(2025, 3, 31), 7))
+        self.assertEqual(after.end_time, aware(date(2025, 3, 31), 11))
+
+    def test_materialize_bulk_creates_shifts_and_schedules(self):
+        with self.assertNumQueries(13):
+            created, conflicts = recurrence.materialize(
+                self.owner, date(2025, 3, 1), date(2025, 3, 12)
+            )
+
+        self.assertEqual(len(created), 4)
+        self.assertEqual(conflicts, [])
+        self.assertEqual(models.Schedule.objects.count(), 4)
+        self.assertFalse(models.Shift.objects.owner_mismatch().exists())
+        self.assertEqual(
+            models.ChangeLog.objects.filter(entity='shift').count(), 4
+        )
+
+    def test_materialize_is_idempotent(self):
+        recurrence.materialize(self.owner, date(2025, 3, 1),
+                               date(2025, 3, 12))
+
+        created, _conflicts = recurrence.materialize(
+            self.owner, date(2025, 3, 1), date(2025, 3, 12)
+        )
+
+        self.assertEqual(created, [])
+        self.assertEqual(
+            len(recurrence.expand(self.owner, date(2025, 3, 1),
+                                  date(2025, 3, 12))),
+            4
+        )
+
+    def test_overlapping_occurrence_reported_as_conflict(self):
+        schedule = create_schedule(self.owner, date(2025, 3, 3))
+        # the occurrence runs 8:00-12:00 utc
+        create_shift(schedule, self.employee, 11, 13)
+
+        created, conflicts = recurrence.materialize(
+            self.owner, date(2025, 3, 3), date(2025, 3, 3)
+        )
+
+        self.assertEqual(created, [])
+        self.assertEqual([shift.shift_date for shift in conflicts],
+                         [date(2025, 3, 3)])
+
+    def test_cancel_occurrence(self):
+        shift = recurrence.materialize_occurrence(
+            self.template, date(2025, 3, 3)
+        )
+
+        recurrence.cancel_occurrence(self.template, date(2025, 3, 3))
+
+        self.assertFalse(models.Shift.objects.filter(pk=shift.pk).exists())
+        days = [shift.shift_date for shift in recurrence.expand(
+            self.owner, date(2025, 3, 1), date(2025, 3, 5))]
+        self.assertEqual(days, [date(2025, 3, 5)])
@@ -0,0 +1,99 @@
+"""
+    Tests for the read replica routing
+"""
+from unittest.mock import patch
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from core import models, replicas
+from core.middleware import ReplicaPinMiddleware
+from core.tests.helpers import create_owner
+
+
+@patch('core.replicas.aliases', return_value=['replica1'])
+@patch('core.replicas.lag', return_value=0)
+class ReplicaRouterTests(TestCase):
+    """Test which reads go to the replicas"""
+
+    def setUp(self):
+        replicas._health.clear()
+        self.router = replicas.ReplicaRouter()
+
+    def test_reads_stay_on_primary_outside_reporting(self, lag, aliases):
+        self.assertIsNone(self.router.db_for_read(models.Shift))
+
+    def test_reporting_reads_use_replica(self, lag, aliases):
+        with replicas.reporting():
+            self.assertEqual(
+                self.router.db_for_read(models.Shift), 'replica1')
+
+    @override_settings(REPLICA_MAX_LAG_SECONDS=10)
+    def test_lagging_replica_skipped_and_checked_once(self, lag, aliases):
+        lag.return_value = 30
+
+        with replicas.reporting():
+            self.assertIsNone(self.router.db_for_read(models.Shift))
+            self.assertIsNone(self.router.db_for_read(models.Task))
+
+        lag.assert_called_once_with('replica1')
+
+    def test_pinned_request_reads_primary(self, lag, aliases):
+        token = replicas.request_state.set({'pinned': True, 'wrote': False})
+        self.addCleanup(replicas.request_state.reset, token)
+
+        with replicas.reporting():
+            self.assertIsNone(self.router.db_for_read(models.Shift))
+
+    def test_writes_always_on_primary(self, lag, aliases):
+        owner = create_owner()
+        owner._state.db = 'replica1'
+
+        self.assertEqual(
+            self.router.db_for_write(models.Owner, instance=owner),
+            'default')
+
+
+class ReplicaPinMiddlewareTests(TestCase):
+    """Test the read-your-writes pin"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_write_sets_pin_cookie(self):
+        owner = create_owner()
+
+        def view(request):
+            models.Task.objects.create(owner=owner, name='Bar')
+            return HttpResponse()
+
+        response = ReplicaPinMiddleware(view)(self.factory.post('/'))
+
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+
+    def test_session_write_does_not_pin(self):
+        def view(request):
+            request.session['seen'] = True
+            request.session.save()
+            return HttpResponse()
+
+        request = self.factory.post('/')
+        request.session = SessionStore()
+        response = ReplicaPinMiddleware(view)(request)
+
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+    def test_pin_cookie_pins_reads(self):
+        seen = []
+
+        def view(request):
+            seen.append(dict(replicas.request_state.get()))
+            return HttpResponse()
+
+        request = self.factory.get('/')
+        request.COOKIES[replicas.PIN_COOKIE] = '1'
+        response = ReplicaPinMiddleware(view)(request)
+
+        self.assertEqual(seen, [{'pinned': True, 'wrote': False}])
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
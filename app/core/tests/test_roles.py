@@ -0,0 +1,118 @@
+"""
+    Tests for the role resolution
+"""
+from datetime import date
+
+from django.contrib.auth.models import Permission
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import checks, models
+from core.tests.helpers import create_owner, create_employee, \
+    create_schedule
+
+
+def role_queries(queries):
+    return [query for query in queries
+            if 'core_owner' in query['sql'] or 'core_employee' in query['sql']]
+
+
+class RoleTests(TestCase):
+    """Test the request role and its session cache"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.employee = create_employee(self.owner)
+
+    def test_role_resolved_once_per_session(self):
+        self.client.force_login(self.owner.user)
+
+        res = self.client.get(reverse('home:home'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('home:home'))
+
+        self.assertTrue(res.context['is_owner'])
+        self.assertFalse(res.context['is_employee'])
+        self.assertEqual(role_queries(queries.captured_queries), [])
+
+    def test_employee_role(self):
+        self.client.force_login(self.employee.user)
+
+        role = self.client.get(reverse('home:home')).wsgi_request.role
+
+        self.assertEqual(
+            tuple(role), (None, self.employee.pk, self.owner.pk))
+        self.assertEqual(role.scope_owner_id, self.owner.pk)
+
+    def test_role_change_invalidates_session(self):
+        self.client.force_login(self.employee.user)
+        self.client.get(reverse('home:home'))
+
+        self.employee.delete()
+        res = self.client.get(reverse('home:home'))
+
+        self.assertFalse(res.context['is_employee'])
+
+    def test_process_local_cache_flagged_for_deploy(self):
+        local = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://redis:6379/1'}}
+
+        with override_settings(CACHES=local):
+            warnings = checks.check_shared_cache(None)
+        with override_settings(CACHES=shared):
+            self.assertEqual(checks.check_shared_cache(None), [])
+        self.assertEqual([warning.id for warning in warnings], ['core.W001'])
+
+
+class OwnerScopedAdminTests(TestCase):
+    """Test staff owners only see their own rows in the admin"""
+
+    def test_staff_owner_sees_own_tasks(self):
+        owner = create_owner(is_staff=True)
+        other = create_owner(email='other@example.com')
+        models.Task.objects.create(owner=owner, name='Bar')
+        models.Task.objects.create(owner=other, name='Kitchen')
+        owner.user.user_permissions.add(
+            Permission.objects.get(codename='view_task'))
+        self.client.force_login(owner.user)
+
+        res = self.client.get(reverse('admin:core_task_changelist'))
+
+        self.assertEqual(
+            [task.name for task in res.context['cl'].result_list], ['Bar'])
+
+    def test_staff_owner_relations_limited_to_own_rows(self):
+        owner = create_owner(is_staff=True)
+        other = create_owner(email='other@example.com')
+        mine = create_employee(owner, email='mine@example.com',
+                               first_name='Ada')
+        stranger = create_employee(other, email='stranger@example.com',
+                                   first_name='Ada')
+        schedule = create_schedule(owner, date(2025, 3, 3))
+        create_schedule(other, date(2025, 3, 3))
+        owner.user.user_permissions.add(*Permission.objects.filter(
+            codename__in=['add_shift', 'view_employee', 'view_task']))
+        self.client.force_login(owner.user)
+
+        form = self.client.get(
+            reverse('admin:core_shift_add')).context['adminform'].form
+        found = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'core', 'model_name': 'shift',
+            'field_name': 'employee', 'term': 'Ada'}).json()
+        res = self.client.post(reverse('admin:core_shift_add'), {
+            'schedule': schedule.pk, 'employee': stranger.pk,
+            'shift_date': '2025-03-03',
+            'start_time_0': '2025-03-03', 'start_time_1': '08:00',
+            'end_time_0': '2025-03-03', 'end_time_1': '12:00'})
+
+        self.assertEqual(list(form.fields['schedule'].queryset), [schedule])
+        self.assertEqual(list(form.fields['employee'].queryset), [mine])
+        self.assertEqual([row['id'] for row in found['results']],
+                         [str(mine.pk)])
+        self.assertIn('employee', res.context['adminform'].form.errors)
+        self.assertFalse(models.Shift.objects.exists())
@@ -0,0 +1,68 @@
+"""
+    Tests for the content addressed rosters
+"""
+import tempfile
+from datetime import date
+from unittest.mock import patch
+
+from django.core.files.storage import storages
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+
+from core import roster, tasks
+from core.tests.helpers import create_owner, create_employee, \
+    create_schedule, create_shift
+
+MONDAY = date(2024, 3, 4)
+
+
+class RosterTests(TestCase):
+    """Test roster rendering and storage"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(STORAGES={
+            'rosters': {
+                'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                'OPTIONS': {'location': directory.name},
+            },
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.owner = create_owner(company_name='Acme')
+        self.employee = create_employee(
+            self.owner, first_name='Mario', last_name='Rossi')
+        self.shift = create_shift(
+            create_schedule(self.owner, MONDAY), self.employee, 8, 12)
+
+    def test_rendered_once_per_content(self):
+        with patch('core.roster.render_to_string',
+                   wraps=render_to_string) as rendered:
+            first = roster.render(self.owner.pk, MONDAY)
+            second = roster.render(self.owner.pk, date(2024, 3, 7))
+
+        self.assertEqual(first, second)
+        self.assertEqual(rendered.call_count, 1)
+        with roster.open_roster(first) as stored:
+            html = stored.read().decode()
+        self.assertIn('Mario Rossi', html)
+        self.assertIn('08:00-12:00', html)
+
+    def test_changed_week_gets_new_key(self):
+        before = roster.render(self.owner.pk, MONDAY)
+
+        self.shift.end_time = self.shift.end_time.replace(hour=13)
+        self.shift.save()
+
+        self.assertNotEqual(roster.render(self.owner.pk, MONDAY), before)
+        self.assertTrue(storages['rosters'].exists(roster._name(before)))
+
+    def test_bulk_task_renders_every_owner(self):
+        other = create_owner(email='other@example.com')
+
+        keys = tasks.render_owner_rosters(
+            [self.owner.pk, other.pk], [MONDAY.isoformat()])
+
+        self.assertEqual(len(set(keys)), 2)
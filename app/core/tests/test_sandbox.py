@@ -0,0 +1,169 @@
+"""
+    Tests for the what-if schedule sandbox
+"""
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core import models
+from core.sandbox import Conflict, Sandbox
+from core.tests.helpers import aware, create_owner, create_employee, \
+    create_schedule, create_shift
+
+MONDAY = date(2024, 3, 4)
+TUESDAY = date(2024, 3, 5)
+
+
+@override_settings(STAFFING_TIME_ZONE='UTC', STAFFING_BUCKET_MINUTES=60,
+                   PAYROLL_TIME_ZONE='UTC')
+class SandboxTests(TestCase):
+    """Test overlay edits, validation, deltas and the bulk commit"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.bar = models.Task.objects.create(owner=self.owner, name='Bar')
+        self.first = create_employee(self.owner, email='a@example.com')
+        self.second = create_employee(self.owner, email='b@example.com')
+        self.monday = create_schedule(self.owner, MONDAY)
+        self.tuesday = create_schedule(self.owner, TUESDAY)
+        self.shift = create_shift(self.monday, self.first, 8, 12, self.bar)
+        self.other = create_shift(self.monday, self.second, 12, 16, self.bar)
+
+    def test_editing_costs_no_query(self):
+        sandbox = Sandbox(self.owner, TUESDAY)
+
+        with self.assertNumQueries(0):
+            key = sandbox.add(self.second.pk, TUESDAY, aware(TUESDAY, 9),
+                              aware(TUESDAY, 13), self.bar.pk)
+            sandbox.change(self.shift.pk, start_time=aware(MONDAY, 9))
+            sandbox.remove(self.other.pk)
+            sandbox.validate()
+            sandbox.deltas()
+
+        self.assertEqual(sandbox.get(key).employee_id, self.second.pk)
+        self.shift.refresh_from_db()
+        self.assertEqual(self.shift.start_time, aware(MONDAY, 8))
+        self.assertEqual(sandbox.base[self.shift.pk].start_time,
+                         aware(MONDAY, 8))
+        self.assertTrue(models.Shift.objects.filter(
+            pk=self.other.pk).exists())
+
+    def test_rollback_to_checkpoint(self):
+        sandbox = Sandbox(self.owner, MONDAY)
+        sandbox.change(self.shift.pk, end_time=aware(MONDAY, 11))
+        checkpoint = sandbox.checkpoint()
+        sandbox.change(self.shift.pk, end_time=aware(MONDAY, 10))
+        sandbox.remove(self.other.pk)
+
+        sandbox.rollback(checkpoint)
+        self.assertEqual(sandbox.get(self.shift.pk).end_time,
+                         aware(MONDAY, 11))
+        self.assertIsNotNone(sandbox.get(self.other.pk))
+
+        sandbox.rollback()
+        self.assertEqual(sandbox.overlay, {})
+
+    def test_validate_reports_broken_rules(self):
+        sandbox = Sandbox(self.owner, MONDAY)
+        overlapping = sandbox.add(self.first.pk, MONDAY, aware(MONDAY, 11),
+                                  aware(MONDAY, 13))
+        no_schedule = sandbox.add(self.first.pk, date(2024, 3, 6),
+                                  aware(date(2024, 3, 6), 9),
+                                  aware(date(2024, 3, 6), 10))
+
+        errors, violations = sandbox.validate()
+
+        self.assertEqual(dict(errors).keys(), {overlapping, no_schedule})
+        self.assertIn('overlaps', dict(errors)[overlapping])
+        with self.assertRaises(ValidationError):
+            sandbox.commit()
+
+    def test_validate_checks_labor_rules_in_memory(self):
+        sandbox = Sandbox(self.owner, MONDAY)
+        # 7 hours of rest between monday 23:00 and tuesday 06:00
+        sandbox.change(self.shift.pk, end_time=aware(MONDAY, 23))
+        late = sandbox.add(self.first.pk, TUESDAY, aware(TUESDAY, 6),
+                           aware(TUESDAY, 7))
+
+        _errors, violations = sandbox.validate()
+
+        rules = {violation.rule: violation for violation in violations}
+        self.assertIn('daily_rest', rules)
+        self.assertEqual(rules['daily_rest'].shift_ids, [self.shift.pk, late])
+
+    def test_deltas_against_live_week(self):
+        sandbox = Sandbox(self.owner, MONDAY)
+        sandbox.change(self.shift.pk, end_time=aware(MONDAY, 10))
+        sandbox.remove(self.other.pk)
+
+        deltas = sandbox.deltas()
+
+        self.assertEqual(deltas['hours'][self.first.pk]['total'], -120)
+        self.assertEqual(deltas['hours'][self.second.pk]['total'], -240)
+        self.assertEqual(
+            [(row['start'], row['delta']) for row in deltas['coverage']],
+            [(600, -1), (660, -1), (720, -1), (780, -1), (840, -1),
+             (900, -1)]
+        )
+
+    def test_commit_applies_bulk_diff(self):
+        sandbox = Sandbox(self.owner, MONDAY)
+        sandbox.change(self.shift.pk, shift_date=TUESDAY,
+                       start_time=aware(TUESDAY, 8),
+                       end_time=aware(TUESDAY, 12))
+        sandbox.remove(self.other.pk)
+        sandbox.add(self.second.pk, TUESDAY, aware(TUESDAY, 13),
+                    aware(TUESDAY, 17), self.bar.pk)
+        log_count = models.ChangeLog.objects.count()
+
+        created, updated, deleted = sandbox.commit()
+
+        self.assertEqual((len(created), len(updated), len(deleted)),
+                         (1, 1, 1))
+        moved = models.Shift.objects.get(pk=self.shift.pk)
+        self.assertEqual(moved.schedule, self.tuesday)
+        self.assertFalse(models.Shift.objects.filter(
+            pk=self.other.pk).exists())
+        self.assertEqual(models.Shift.objects.filter(
+            schedule=self.tuesday).count(), 2)
+        self.assertEqual(models.ChangeLog.objects.count() - log_count, 3)
+        self.monday.refresh_from_db()
+        self.tuesday.refresh_from_db()
+        self.assertEqual((self.monday.version, self.tuesday.version),
+                         (sandbox.versions[self.monday.pk],
+                          sandbox.versions[self.tuesday.pk]))
+        self.assertEqual(sandbox.overlay, {})
+
+    def plan(self, hours):
+        sandbox = Sandbox(self.owner, MONDAY)
+        for hour in hours:
+            sandbox.add(self.second.pk, TUESDAY, aware(TUESDAY, hour),
+                        aware(TUESDAY, hour + 1), self.bar.pk)
+        return sandbox
+
+    def test_commit_queries_do_not_grow_with_edits(self):
+        one, many = self.plan([6]), self.plan(range(8, 22, 2))
+
+        with CaptureQueriesContext(connection) as few_queries:
+            one.commit()
+        one = Sandbox(self.owner, MONDAY)
+        many.versions = one.versions
+        with CaptureQueriesContext(connection) as many_queries:
+            many.commit()
+
+        self.assertEqual(len(few_queries), len(many_queries))
+        self.assertEqual(models.Shift.objects.filter(
+            schedule=self.tuesday).count(), 8)
+
+    def test_commit_refuses_when_week_changed(self):
+        sandbox = Sandbox(self.owner, MONDAY)
+        sandbox.change(self.shift.pk, end_time=aware(MONDAY, 10))
+        create_shift(self.tuesday, self.second, 8, 9)
+
+        with self.assertRaises(Conflict):
+            sandbox.commit()
+        self.shift.refresh_from_db()
+        self.assertEqual(self.shift.end_time, aware(MONDAY, 12))
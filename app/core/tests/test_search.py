@@ -0,0 +1,51 @@
+"""
+    Tests for the ranked search
+"""
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+from core import models, search
+from core.tests.helpers import create_owner, create_employee
+
+
+class SearchTests(TestCase):
+    """Test searching users, employees and tasks"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.mario = create_employee(
+            self.owner, email='mario@example.com',
+            first_name='Mario', last_name='Rossi'
+        )
+        self.maria = create_employee(
+            self.owner, email='m.bianchi@example.com',
+            first_name='Mariangela', last_name='Bianchi'
+        )
+
+    def test_users_match_any_field(self):
+        get_user_model().objects.create_user(
+            email='info@acme.it', company_name='Rossini Srl'
+        )
+
+        found = [user.email for user in search.users('rossi')]
+
+        self.assertCountEqual(found, ['mario@example.com', 'info@acme.it'])
+
+    def test_employees_ranked_by_similarity(self):
+        found = list(search.employees(self.owner, 'mari'))
+
+        self.assertEqual(found, [self.mario, self.maria])
+
+    def test_employees_scoped_to_owner(self):
+        other = create_owner(email='other@example.com')
+
+        self.assertFalse(search.employees(other, 'mario'))
+
+    def test_short_term_matches_nothing(self):
+        self.assertFalse(search.employees(self.owner, 'ma'))
+
+    def test_tasks(self):
+        bar = models.Task.objects.create(owner=self.owner, name='Bar')
+        models.Task.objects.create(owner=self.owner, name='Kitchen')
+
+        self.assertEqual(list(search.tasks(self.owner, 'bar')), [bar])
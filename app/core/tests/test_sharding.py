@@ -0,0 +1,219 @@
+"""
+    Tests for the owner sharding
+
+The shard tests need a second database, e.g. DB_SHARDS=devdb_shard1.
+"""
+from datetime import date
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db.models.deletion import Collector
+from django.test import RequestFactory, SimpleTestCase, TestCase, \
+    override_settings
+from django.urls import reverse
+
+from core import models, purge, roles, sharding
+from core.middleware import ShardMiddleware
+from core.tests.helpers import aware, create_owner, create_employee, \
+    create_schedule, create_shift
+
+DAY = date(2024, 3, 4)
+
+
+class RoutingTests(SimpleTestCase):
+    """Test the routing without an owner placed on a shard"""
+
+    def test_owners_stay_on_default(self):
+        self.assertEqual(sharding.shards()[0], 'default')
+        self.assertEqual(sharding.db_for(None), 'default')
+
+    def test_for_owner_sets_the_owner_of_the_block(self):
+        with sharding.for_owner(lambda: 7):
+            self.assertEqual(sharding.current_owner(), 7)
+            with sharding.for_owner(8):
+                self.assertEqual(sharding.current_owner(), 8)
+        self.assertIsNone(sharding.current_owner())
+
+    def test_unrelated_models_keep_fast_deletes(self):
+        # the receivers of core are connected to the models they handle
+        self.assertTrue(
+            Collector('default').can_fast_delete(Session.objects.all()))
+
+    def test_moving_owner_answered_with_503(self):
+        middleware = ShardMiddleware(lambda request: None)
+
+        response = middleware.process_exception(
+            RequestFactory().post('/'), sharding.ShardMoving('moving'))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+
+@skipUnless('shard1' in settings.DATABASES, 'no shard1 database')
+@override_settings(SHARD_DIRECTORY_SECONDS=0)
+class ShardTests(TestCase):
+    """Test routing, global rows and online moves between shards"""
+    databases = '__all__'
+
+    def setUp(self):
+        sharding.forget()
+        # the directory copy would outlive the rows of the test
+        self.addCleanup(sharding.forget)
+        self.owner = create_owner()
+        sharding.move(self.owner.pk, 'shard1')
+        with sharding.for_owner(self.owner.pk):
+            self.employee = create_employee(self.owner)
+            self.schedule = create_schedule(self.owner, DAY)
+            self.shifts = [
+                create_shift(self.schedule, self.employee, hour, hour + 2)
+                for hour in (8, 11, 14)
+            ]
+
+    def count(self, model, alias):
+        return model.objects.using(alias).filter(owner=self.owner).count()
+
+    def test_owner_rows_go_to_its_shard(self):
+        self.assertEqual(self.count(models.Shift, 'shard1'), 3)
+        self.assertEqual(self.count(models.Shift, 'default'), 0)
+        self.assertEqual(self.count(models.ChangeLog, 'shard1'), 4)
+        self.assertGreaterEqual(self.shifts[0].pk, settings.SHARD_ID_SPAN)
+
+        with sharding.for_owner(self.owner.pk):
+            employee = models.Employee.objects.with_user().get()
+            self.assertEqual(len(self.schedule.daily_shift.all()), 3)
+        self.assertEqual(employee.user.email, 'employee@example.com')
+
+    def test_global_rows_copied_on_every_shard(self):
+        user = self.owner.user
+        user.first_name = 'Ada'
+        user.save()
+
+        copy = models.User.objects.using('shard1').get(pk=user.pk)
+        self.assertEqual(copy.first_name, 'Ada')
+        self.assertTrue(models.Owner.objects.using('shard1').filter(
+            pk=self.owner.pk).exists())
+
+        self.employee.user.delete()
+        self.assertEqual(self.count(models.Employee, 'shard1'), 0)
+        self.assertEqual(self.count(models.Shift, 'shard1'), 0)
+
+    def test_global_rows_kept_off_shards_without_owners(self):
+        sharding.move(self.owner.pk, 'default')
+
+        user = create_employee(self.owner, email='b@example.com').user
+
+        self.assertEqual(sharding.placed(), [])
+        self.assertFalse(models.User.objects.using('shard1').filter(
+            pk=user.pk).exists())
+
+    def test_move_copies_bulk_created_global_rows(self):
+        [user] = models.User.objects.bulk_create(
+            [models.User(email='bulk@example.com')])
+        other = models.Owner.objects.create(user=user)
+
+        sharding.move(other.pk, 'shard1')
+
+        self.assertTrue(models.User.objects.using('shard1').filter(
+            pk=user.pk).exists())
+        self.assertTrue(models.Owner.objects.using('shard1').filter(
+            pk=other.pk).exists())
+
+    def test_superuser_admin_reads_every_shard(self):
+        admin = models.User.objects.create_superuser(
+            email='admin@example.com', password='password123')
+        self.client.force_login(admin)
+        shift = self.shifts[0]
+
+        listed = self.client.get(
+            reverse('admin:core_shift_changelist'), {'shard': 'shard1'})
+        default = self.client.get(reverse('admin:core_shift_changelist'))
+        change = self.client.get(
+            reverse('admin:core_shift_change', args=[shift.pk]))
+
+        self.assertEqual(listed.context['cl'].result_count, 3)
+        self.assertEqual(default.context['cl'].result_count, 0)
+        self.assertEqual(change.status_code, 200)
+        self.assertEqual(change.context['original'], shift)
+
+    def test_role_found_on_the_shard(self):
+        role = roles.resolve(self.employee.user)
+
+        self.assertEqual(role, roles.Role(None, self.employee.pk,
+                                          self.owner.pk))
+
+    def test_frozen_owner_writes_refused(self):
+        models.OwnerShard.objects.filter(owner=self.owner).update(
+            frozen=True)
+
+        with sharding.for_owner(self.owner.pk):
+            self.assertEqual(models.Shift.objects.count(), 3)
+            with self.assertRaises(sharding.ShardMoving):
+                create_shift(self.schedule, self.employee, 17, 19)
+
+    def test_move_copies_then_switches(self):
+        done = sharding.move(self.owner.pk, 'default', batch_size=2)
+
+        self.assertEqual(done['shifts'], 3)
+        self.assertEqual(self.count(models.Shift, 'default'), 3)
+        self.assertEqual(self.count(models.ChangeLog, 'default'), 4)
+        self.assertEqual(self.count(models.Shift, 'shard1'), 0)
+        self.assertEqual(self.count(models.Employee, 'shard1'), 0)
+        self.assertEqual(sharding.db_for(self.owner), 'default')
+        # instances read before the move stay bound to the old shard
+        with sharding.for_owner(self.owner.pk):
+            shift = create_shift(models.Schedule.objects.get(),
+                                 models.Employee.objects.get(), 17, 19)
+        self.assertEqual(self.count(models.Shift, 'default'), 4)
+        # the change sequence keeps growing on the new shard
+        self.assertGreater(
+            models.ChangeLog.objects.filter(entity_id=shift.pk).get().pk,
+            self.shifts[-1].pk)
+
+    def test_move_copies_again_what_changed_meanwhile(self):
+        first, second, third = self.shifts
+
+        def change_source(name, count):
+            # after the first batch of shifts, first and second, is copied
+            if name == 'shifts' and not changed:
+                changed.append(name)
+                with sharding.for_owner(self.owner.pk):
+                    first.delete()
+                    second.end_time = aware(DAY, 12, 30)
+                    second.save()
+                    create_shift(self.schedule, self.employee, 20, 22)
+        changed = []
+
+        sharding.move(self.owner.pk, 'default', batch_size=2,
+                      progress=change_source)
+
+        moved = models.Shift.objects.using('default').filter(
+            owner=self.owner).order_by('start_time')
+        self.assertEqual(
+            [(shift.pk, shift.end_time) for shift in moved],
+            [(second.pk, aware(DAY, 12, 30)), (third.pk, aware(DAY, 16)),
+             (moved[2].pk, aware(DAY, 22))])
+        self.assertEqual(self.count(models.Shift, 'shard1'), 0)
+
+    def test_purge_on_the_owner_shard(self):
+        purge.purge(self.owner.pk)
+
+        self.assertEqual(self.count(models.Shift, 'shard1'), 0)
+        self.assertFalse(models.Owner.objects.using('shard1').filter(
+            pk=self.owner.pk).exists())
+        self.assertFalse(models.Owner.objects.filter(
+            pk=self.owner.pk).exists())
+
+    def test_command(self):
+        out = StringIO()
+
+        call_command('move_owner_shard', self.owner.pk, 'default',
+                     stdout=out)
+        call_command('move_owner_shard', self.owner.pk, 'default',
+                     stdout=out)
+
+        self.assertIn(f'owner {self.owner.pk} moved to default',
+                      out.getvalue())
+        self.assertIn('already on default', out.getvalue())
@@ -0,0 +1,40 @@
+"""
+    Tests for the startup import profile and its budget
+"""
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from core import startup
+from core.models import User
+
+
+class StartupTests(SimpleTestCase):
+    """Test the heavy dependencies load lazily within the budget"""
+
+    def test_setup_within_budget_without_heavy_modules(self):
+        report = startup.profile()
+
+        self.assertEqual(report['heavy'], [])
+        self.assertLess(report['seconds'], settings.STARTUP_BUDGET_SECONDS)
+        self.assertIn('django.urls',
+                      [row[0] for row in report['imports'] if row[3] == 0])
+
+    def test_import_times_parsing(self):
+        lines = [
+            'import time: self [us] | cumulative | imported package',
+            'import time:       228 |        228 |   _io',
+            'import time:      1000 |       1228 | app.celery',
+        ]
+
+        times = startup.import_times(lines)
+
+        self.assertEqual(times, [('_io', 228, 228, 1),
+                                 ('app.celery', 1000, 1228, 0)])
+        self.assertEqual(startup.by_package(times),
+                         [('app', 1000), ('_io', 228)])
+
+    def test_choice_tables_load_on_use(self):
+        user = User(country_name='IT', province_name='MI', region_name='25')
+
+        self.assertEqual(user.get_country_name_display(), 'Italy')
+        self.assertEqual(user.get_province_name_display(), 'Milano')
@@ -0,0 +1,117 @@
+"""
+    Tests for the cover and swap request matching
+"""
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from core import models, swaps
+from core.swaps import Match
+from core.tests.helpers import create_owner, create_employee, \
+    create_schedule, create_shift
+
+MONDAY = date(2024, 3, 4)
+TUESDAY = date(2024, 3, 5)
+
+
+class SwapMatchingTests(TestCase):
+    """Test eligibility, one pass matching and accepting"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.requester = create_employee(self.owner, email='a@example.com')
+        self.free = create_employee(self.owner, email='b@example.com')
+        self.busy = create_employee(self.owner, email='c@example.com')
+        self.monday = create_schedule(self.owner, MONDAY)
+        self.tuesday = create_schedule(self.owner, TUESDAY)
+        self.shift = create_shift(self.monday, self.requester, 8, 12)
+        create_shift(self.monday, self.busy, 10, 14)
+
+    def test_cover_matches_free_active_colleagues(self):
+        create_employee(self.owner, email='gone@example.com',
+                        start=date(2023, 1, 1), end=date(2023, 12, 31))
+        create_employee(create_owner(email='other@example.com'),
+                        email='stranger@example.com')
+        request = swaps.request_change(self.shift, models.ShiftRequest.COVER)
+
+        found = swaps.match([request])
+
+        self.assertEqual(found[request.pk], [Match(self.free.pk, None)])
+
+    def test_cover_respects_contract_week_hours(self):
+        contract = models.Contract.objects.create(
+            owner=self.owner, weekHours=8)
+        self.free.contract = contract
+        self.free.save()
+        create_shift(self.tuesday, self.free, 8, 13)
+        request = swaps.request_change(self.shift, models.ShiftRequest.COVER)
+
+        self.assertEqual(swaps.match([request])[request.pk], [])
+
+    def test_swap_matches_shifts_of_the_week(self):
+        overlapping = models.Shift.objects.get(employee=self.busy)
+        create_shift(self.tuesday, self.busy, 8, 12)
+        given = create_shift(self.tuesday, self.free, 14, 18)
+        request = swaps.request_change(self.shift, models.ShiftRequest.SWAP)
+
+        found = swaps.match([request])
+
+        # busy can only give back its own overlapping monday shift
+        self.assertEqual(sorted(found[request.pk]), sorted([
+            Match(self.free.pk, given.pk),
+            Match(self.busy.pk, overlapping.pk),
+        ]))
+
+    def test_all_requests_matched_with_two_queries(self):
+        for employee, hour in ((self.free, 6), (self.busy, 16)):
+            swaps.request_change(
+                create_shift(self.tuesday, employee, hour, hour + 2),
+                models.ShiftRequest.COVER)
+        swaps.request_change(self.shift, models.ShiftRequest.COVER)
+        requests = list(models.ShiftRequest.objects.select_related('shift'))
+
+        with self.assertNumQueries(2):
+            found = swaps.match(requests)
+
+        self.assertEqual(len(found), 3)
+
+    def test_accept_cover_hands_the_shift_over(self):
+        request = swaps.request_change(self.shift, models.ShiftRequest.COVER)
+
+        swaps.accept(request.pk, self.free.pk)
+
+        self.shift.refresh_from_db()
+        request.refresh_from_db()
+        self.assertEqual(self.shift.employee, self.free)
+        self.assertEqual(request.status, models.ShiftRequest.ACCEPTED)
+        self.assertEqual(request.accepted_by, self.free)
+
+    def test_accept_swap_trades_both_shifts(self):
+        given = create_shift(self.tuesday, self.free, 14, 18)
+        request = swaps.request_change(self.shift, models.ShiftRequest.SWAP)
+        other = swaps.request_change(given, models.ShiftRequest.COVER)
+
+        swaps.accept(request.pk, self.free.pk, given.pk)
+
+        self.shift.refresh_from_db()
+        given.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.shift.employee, self.free)
+        self.assertEqual(given.employee, self.requester)
+        self.assertEqual(other.status, models.ShiftRequest.CANCELLED)
+
+    def test_accept_refuses_ineligible_and_closed(self):
+        request = swaps.request_change(self.shift, models.ShiftRequest.COVER)
+
+        with self.assertRaises(ValidationError):
+            swaps.accept(request.pk, self.busy.pk)
+        swaps.accept(request.pk, self.free.pk)
+        with self.assertRaises(ValidationError):
+            swaps.accept(request.pk, self.free.pk)
+
+    def test_one_open_request_per_shift(self):
+        swaps.request_change(self.shift, models.ShiftRequest.COVER)
+
+        with self.assertRaises(ValidationError):
+            swaps.request_change(self.shift, models.ShiftRequest.SWAP)
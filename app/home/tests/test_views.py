@@ -0,0 +1,423 @@
+"""
+    Tests for the calendar views
+"""
+import tempfile
+from datetime import date, time
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import attendance
+from core.models import AttendanceEvent, ShiftRequest, ShiftTemplate, \
+    StaffingDemand, Task
+from core.tests.helpers import create_owner, create_employee, \
+    create_schedule, create_shift
+
+
+class CalendarViewTests(TestCase):
+    """Test the owner calendar and the employee shifts pages"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = create_owner(company_name='Acme')
+        self.employee = create_employee(
+            self.owner, first_name='Mario', last_name='Rossi'
+        )
+        self.schedule = create_schedule(self.owner, date(2025, 3, 3))
+        self.shift = create_shift(self.schedule, self.employee, 8, 12)
+        self.url = reverse('home:owner_calendar', args=[2025, 3])
+
+    def test_owner_calendar_lists_month_shifts(self):
+        self.client.force_login(self.owner.user)
+
+        res = self.client.get(self.url)
+
+        self.assertContains(res, '08:00-12:00')
+        self.assertContains(res, 'Mario Rossi')
+
+    def test_owner_calendar_single_shift_query(self):
+        self.client.force_login(self.owner.user)
+        self.client.get(self.url)
+
+        # session, user, the month shifts and the shift templates; the role
+        # is in the session
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+
+    def test_changed_day_is_rendered_again(self):
+        self.client.force_login(self.owner.user)
+        self.client.get(self.url)
+
+        self.shift.end_time = self.shift.end_time.replace(hour=13)
+        self.shift.save()
+        res = self.client.get(self.url)
+
+        self.assertContains(res, '08:00-13:00')
+        self.assertNotContains(res, '08:00-12:00')
+
+    def test_renamed_employee_and_task_shown(self):
+        task = Task.objects.create(owner=self.owner, name='Till')
+        self.shift.task = task
+        self.shift.save()
+        self.client.force_login(self.owner.user)
+        self.client.get(self.url)
+
+        self.employee.user.last_name = 'Bianchi'
+        self.employee.user.save()
+        task.name = 'Bar'
+        task.save()
+        res = self.client.get(self.url)
+
+        self.assertContains(res, 'Mario Bianchi (Bar)')
+
+    def test_month_out_of_the_calendar_not_found(self):
+        self.client.force_login(self.owner.user)
+
+        for year, month in ((0, 3), (9999, 12), (2025, 13)):
+            res = self.client.get(
+                reverse('home:owner_calendar', args=[year, month]))
+            self.assertEqual(res.status_code, 404)
+
+    def test_template_occurrences_shown(self):
+        template = ShiftTemplate.objects.create(
+            owner=self.owner, employee=self.employee, weekdays=[1],
+            start_time=time(15), end_time=time(18),
+            valid_from=date(2025, 3, 1), valid_until=date(2025, 3, 31))
+        self.client.force_login(self.owner.user)
+
+        res = self.client.get(self.url)
+
+        # tuesdays of march, local hours
+        self.assertContains(res, '14:00-17:00', count=4)
+        template.end_time = time(19)
+        template.save()
+        res = self.client.get(self.url)
+        self.assertContains(res, '14:00-18:00', count=4)
+        self.client.force_login(self.employee.user)
+        res = self.client.get(reverse('home:my_shifts', args=[2025, 3]))
+        self.assertContains(res, '14:00-18:00', count=4)
+
+    def test_calendar_requires_owner(self):
+        self.client.force_login(self.employee.user)
+
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_my_shifts_lists_only_own_shifts(self):
+        colleague = create_employee(
+            self.owner, email='colleague@example.com', first_name='Luigi'
+        )
+        create_shift(self.schedule, colleague, 12, 16)
+        self.client.force_login(self.employee.user)
+
+        res = self.client.get(reverse('home:my_shifts', args=[2025, 3]))
+
+        self.assertContains(res, '08:00-12:00')
+        self.assertNotContains(res, '12:00-16:00')
+
+
+class ChangesViewTests(TestCase):
+    """Test the delta sync endpoint"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.employee = create_employee(self.owner)
+        self.colleague = create_employee(
+            self.owner, email='colleague@example.com'
+        )
+        self.schedule = create_schedule(self.owner, date(2025, 3, 3))
+        self.shift = create_shift(self.schedule, self.employee, 8, 12)
+        create_shift(self.schedule, self.colleague, 12, 16)
+        self.url = reverse('home:changes')
+
+    def test_owner_pages_through_changes(self):
+        self.client.force_login(self.owner.user)
+
+        first = self.client.get(self.url, {'limit': 2}).json()
+        second = self.client.get(
+            self.url, {'since': first['next'], 'limit': 2}
+        ).json()
+
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(
+            [change['entity'] for change in first['changes']],
+            ['schedule', 'shift']
+        )
+        self.assertEqual(len(second['changes']), 1)
+
+    def test_since_returns_only_new_changes(self):
+        self.client.force_login(self.owner.user)
+        since = self.client.get(self.url).json()['next']
+        shift_id = self.shift.id
+
+        self.shift.delete()
+        res = self.client.get(self.url, {'since': since}).json()
+
+        self.assertEqual(res['changes'], [{
+            'seq': res['next'],
+            'entity': 'shift',
+            'op': 'delete',
+            'id': shift_id,
+            'data': res['changes'][0]['data'],
+        }])
+
+    def test_employee_sees_only_own_shifts(self):
+        self.client.force_login(self.employee.user)
+
+        res = self.client.get(self.url).json()
+
+        shift_ids = [change['id'] for change in res['changes']
+                     if change['entity'] == 'shift']
+        self.assertEqual(shift_ids, [self.shift.id])
+
+    def test_reassigned_shift_deleted_for_previous_employee(self):
+        self.client.force_login(self.owner.user)
+        since = self.client.get(self.url).json()['next']
+
+        self.shift.employee = self.colleague
+        self.shift.save()
+        self.client.force_login(self.employee.user)
+        mine = self.client.get(self.url, {'since': since}).json()
+        self.client.force_login(self.colleague.user)
+        theirs = self.client.get(self.url, {'since': since}).json()
+
+        self.assertEqual(
+            [(change['op'], change['id']) for change in mine['changes']],
+            [('delete', self.shift.id)])
+        self.assertEqual(
+            [(change['op'], change['id']) for change in theirs['changes']],
+            [('create', self.shift.id)])
+
+    def test_invalid_since_rejected(self):
+        self.client.force_login(self.owner.user)
+
+        res = self.client.get(self.url, {'since': 'x'})
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_limit_below_one_rejected(self):
+        self.client.force_login(self.owner.user)
+
+        for limit in ('0', '-3', 'x'):
+            res = self.client.get(self.url, {'limit': limit})
+            self.assertEqual(res.status_code, 400)
+
+
+class DashboardViewTests(TestCase):
+    """Test the owner dashboard page"""
+
+    def setUp(self):
+        cache.clear()
+        self.owner = create_owner()
+        create_employee(self.owner)
+
+    def test_dashboard_shows_headcount(self):
+        self.client.force_login(self.owner.user)
+
+        res = self.client.get(reverse('home:dashboard'))
+
+        self.assertEqual(res.context['figures']['headcount'], 1)
+        self.assertContains(res, 'No contracts expiring')
+
+
+class SearchViewTests(TestCase):
+    """Test the autocomplete endpoint"""
+
+    def test_search_returns_employees_and_tasks(self):
+        owner = create_owner()
+        employee = create_employee(owner, first_name='Mario')
+        task = Task.objects.create(owner=owner, name='Mario bar')
+        self.client.force_login(owner.user)
+
+        res = self.client.get(reverse('home:search'), {'q': 'mario'}).json()
+
+        self.assertEqual([e['id'] for e in res['employees']], [employee.pk])
+        self.assertEqual([t['id'] for t in res['tasks']], [task.pk])
+
+
+class StaffingGapsViewTests(TestCase):
+    """Test the staffing gaps endpoint"""
+
+    def test_owner_gaps(self):
+        owner = create_owner()
+        task = Task.objects.create(owner=owner, name='Bar')
+        StaffingDemand.objects.create(
+            owner=owner, task=task, weekday=timezone.localdate().weekday(),
+            minute=600, headcount=1
+        )
+        self.client.force_login(owner.user)
+
+        res = self.client.get(reverse('home:staffing_gaps')).json()
+
+        # the weekday comes twice in the two weeks horizon
+        self.assertEqual([gap['required'] for gap in res['gaps']], [1, 1])
+
+    def test_employee_not_found(self):
+        employee = create_employee(create_owner())
+        self.client.force_login(employee.user)
+
+        res = self.client.get(reverse('home:staffing_gaps'))
+
+        self.assertEqual(res.status_code, 404)
+
+
+class WeeklyRosterViewTests(TestCase):
+    """Test the printable roster page"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(STORAGES={
+            'rosters': {
+                'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                'OPTIONS': {'location': directory.name},
+            },
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.owner = create_owner()
+        self.employee = create_employee(self.owner, first_name='Mario')
+        create_shift(create_schedule(self.owner, date(2024, 3, 4)),
+                     self.employee, 8, 12)
+        self.url = reverse('home:weekly_roster', args=[2024, 3, 6])
+
+    def test_employee_reads_owner_roster(self):
+        self.client.force_login(self.employee.user)
+
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'08:00-12:00', b''.join(res.streaming_content))
+
+    def test_not_modified_for_known_etag(self):
+        self.client.force_login(self.owner.user)
+        etag = self.client.get(self.url)['ETag']
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+
+
+class ShiftRequestViewTests(TestCase):
+    """Test the cover and swap request endpoints"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.requester = create_employee(self.owner, email='a@example.com')
+        self.colleague = create_employee(self.owner, email='b@example.com')
+        self.shift = create_shift(
+            create_schedule(self.owner, date(2024, 3, 4)),
+            self.requester, 8, 12)
+
+    def test_request_and_accept_cover(self):
+        self.client.force_login(self.requester.user)
+        res = self.client.post(
+            reverse('home:request_shift_change', args=[self.shift.pk]),
+            {'kind': 'cover'})
+        self.assertEqual(res.status_code, 201)
+        request_id = res.json()['id']
+
+        self.client.force_login(self.colleague.user)
+        takeable = self.client.get(
+            reverse('home:shift_requests')).json()['takeable']
+        self.assertEqual([row['id'] for row in takeable], [request_id])
+        res = self.client.post(
+            reverse('home:accept_shift_request', args=[request_id]))
+
+        self.assertEqual(res.status_code, 200)
+        self.shift.refresh_from_db()
+        self.assertEqual(self.shift.employee, self.colleague)
+
+    def test_owner_sees_matches(self):
+        ShiftRequest.objects.create(
+            shift=self.shift, requested_by=self.requester, kind='cover')
+        self.client.force_login(self.owner.user)
+
+        res = self.client.get(reverse('home:shift_requests')).json()
+
+        self.assertEqual(res['requests'][0]['matches'],
+                         [{'employee_id': self.colleague.pk,
+                           'shift_id': None}])
+
+    def test_only_own_shifts_can_be_requested(self):
+        self.client.force_login(self.colleague.user)
+
+        res = self.client.post(
+            reverse('home:request_shift_change', args=[self.shift.pk]))
+
+        self.assertEqual(res.status_code, 404)
+
+
+class AttendanceViewTests(TestCase):
+    """Test the clock-in ingestion endpoint"""
+
+    def setUp(self):
+        self.owner = create_owner()
+        self.employee = create_employee(self.owner)
+        self.stranger = create_employee(
+            create_owner(email='other@example.com'),
+            email='stranger@example.com')
+        self.url = reverse('home:attendance_events')
+
+    def post(self, user, events):
+        self.client.force_login(user)
+        return self.client.post(self.url, events,
+                                content_type='application/json')
+
+    def test_owner_posts_badge_events(self):
+        res = self.post(self.owner.user, [
+            {'employee': self.employee.pk, 'kind': 'in',
+             'at': '2024-03-04T08:02:00+01:00'},
+            {'employee': self.employee.pk, 'kind': 'out',
+             'at': '2024-03-04T12:01:00+01:00'},
+        ])
+        attendance.flush()
+
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(res.json(), {'accepted': 2})
+        self.assertEqual(AttendanceEvent.objects.filter(
+            owner=self.owner, source='badge').count(), 2)
+
+    @override_settings(ATTENDANCE_MAX_BUFFERED=1)
+    def test_events_refused_while_the_buffer_is_full(self):
+        res = self.post(self.employee.user, [
+            {'kind': 'in', 'at': '2024-03-04T08:02:00Z'},
+            {'kind': 'out', 'at': '2024-03-04T12:01:00Z'},
+        ])
+
+        self.assertEqual(res.status_code, 503)
+        self.assertIn('Retry-After', res)
+
+    def test_employee_clocks_in_only_for_itself(self):
+        res = self.post(self.employee.user, [
+            {'kind': 'in', 'at': '2024-03-04T08:02:00Z', 'source': 'mobile'},
+        ])
+        refused = self.post(self.employee.user, [
+            {'employee': self.stranger.pk, 'kind': 'in',
+             'at': '2024-03-04T08:02:00Z'},
+        ])
+        attendance.flush()
+
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(refused.status_code, 400)
+        self.assertEqual(AttendanceEvent.objects.get().employee,
+                         self.employee)
+
+    def test_invalid_events_rejected(self):
+        for events in (
+            {'kind': 'in'},
+            [{'employee': self.employee.pk, 'kind': 'lunch',
+              'at': '2024-03-04T08:02:00Z'}],
+            [{'employee': self.employee.pk, 'kind': 'in', 'at': 'soon'}],
+            [{'employee': self.stranger.pk, 'kind': 'in',
+              'at': '2024-03-04T08:02:00Z'}],
+        ):
+            res = self.post(self.owner.user, events)
+            self.assertEqual(res.status_code, 400)
+        attendance.flush()
+
+        self.assertFalse(AttendanceEvent.objects.exists())
@@ -3,4 +3,29 @@ from . import views
 app_name = "home"
 urlpatterns = [
     path('', views.home, name='home'),
+    path('calendar/', views.owner_calendar, name='owner_calendar'),
+    path(
+        'calendar/<int:year>/<int:month>/',
+        views.owner_calendar,
+        name='owner_calendar'
+    ),
+    path('dashboard/', views.dashboard, name='dashboard'),
+    path('search/', views.search, name='search'),
+    path('roster/<int:year>/<int:month>/<int:day>/', views.weekly_roster,
+         name='weekly_roster'),
+    path('staffing/gaps/', views.staffing_gaps, name='staffing_gaps'),
+    path('changes/', views.changes, name='changes'),
+    path('attendance/events/', views.attendance_events,
+         name='attendance_events'),
+    path('my-shifts/', views.my_shifts, name='my_shifts'),
+    path('my-shifts/<int:shift_id>/request/', views.request_shift_change,
+         name='request_shift_change'),
+    path('shift-requests/', views.shift_requests, name='shift_requests'),
+    path('shift-requests/<int:request_id>/accept/',
+         views.accept_shift_request, name='accept_shift_request'),
+    path(
+        'my-shifts/<int:year>/<int:month>/',
+        views.my_shifts,
+        name='my_shifts'
+    ),
 ]
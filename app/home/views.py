@@ -1,7 +1,429 @@
-from django.shortcuts import render
+import calendar
+import json
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.db.models import F, OuterRef, Q, Subquery
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponseBadRequest,
+    HttpResponseNotModified,
+    JsonResponse
+)
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_POST
+
+from core import attendance, dashboard as owner_dashboard, demand, \
+    recurrence, replicas, roster, search as owner_search, swaps
+from core.models import AttendanceEvent, ChangeLog, Employee, Shift, \
+    ShiftRequest
 
 # Create your views here.
 
 
 def home(request):
-    return render(request, "home/index.html")
+    return render(request, "home/index.html", {
+        'is_owner': request.role.is_owner,
+        'is_employee': request.role.is_employee,
+    })
+
+
+def _owner_id(request):
+    """owner id of the request user, 404 for anyone else"""
+    if not request.role.is_owner:
+        raise Http404
+    return request.role.owner_id
+
+
+def _month(year, month):
+    """first and last day of the requested month, current one by default"""
+    if year is None:
+        today = timezone.localdate()
+        year, month = today.year, today.month
+    # the calendar links the months around it, which have to be dates too
+    if not 1 <= month <= 12 or not date.min.year < year < date.max.year:
+        raise Http404
+    last = calendar.monthrange(year, month)[1]
+    return date(year, month, 1), date(year, month, last)
+
+
+def _calendar_context(shifts, first):
+    """group the month shifts in calendar weeks
+
+    Each day carries the version of its schedule, what its template
+    occurrences not written yet show and the employee and task names of
+    its shifts, which change without the schedule: the day fragments are
+    cached on it, so only days whose shifts changed are rendered again.
+    """
+    days = defaultdict(list)
+    versions = defaultdict(int)
+    pending = defaultdict(list)
+    names = defaultdict(list)
+    for shift in shifts:
+        days[shift.shift_date].append(shift)
+        names[shift.shift_date].append(f'{shift.employee}:{shift.task or ""}')
+        if shift.pk is None:
+            # a template occurrence not written yet, keyed by what it shows
+            pending[shift.shift_date].append(
+                f'{shift.template_id}:{shift.employee_id}:{shift.task_id}:'
+                f'{shift.start_time:%H%M}-{shift.end_time:%H%M}')
+        else:
+            versions[shift.shift_date] = shift.schedule_version
+
+    weeks = [
+        [
+            {
+                'date': day,
+                'in_month': day.month == first.month,
+                'shifts': days.get(day, []),
+                'version': '/'.join(
+                    [str(versions[day])] + pending.get(day, [])
+                    + names.get(day, [])),
+            }
+            for day in week
+        ]
+        for week in calendar.Calendar().monthdatescalendar(
+            first.year, first.month)
+    ]
+    previous = first - timedelta(days=1)
+    following = first.replace(day=28) + timedelta(days=4)
+    return {
+        'weeks': weeks,
+        'month': first,
+        'previous': previous.replace(day=1),
+        'next': following.replace(day=1),
+        'weekdays': [calendar.day_abbr[day] for day in range(7)],
+    }
+
+
+@login_required
+def owner_calendar(request, year=None, month=None):
+    owner_id = _owner_id(request)
+    first, last = _month(year, month)
+    shifts = recurrence.expand(
+        owner_id, first, last,
+        Shift.objects.for_owner(owner_id, first, last).with_names(
+        ).annotate(schedule_version=F('schedule__version')))
+
+    context = _calendar_context(shifts, first)
+    context.update({
+        'cache_prefix': f'owner-{owner_id}',
+        'url_name': 'home:owner_calendar',
+    })
+    return render(request, "home/calendar.html", context)
+
+
+@login_required
+def my_shifts(request, year=None, month=None):
+    if not request.role.is_employee:
+        raise Http404
+    employee_id = request.role.employee_id
+    first, last = _month(year, month)
+    shifts = recurrence.expand(
+        request.role.employer_id, first, last,
+        Shift.objects.filter(
+            employee_id=employee_id,
+            shift_date__range=(first, last)
+        ).with_names().annotate(schedule_version=F('schedule__version')),
+        employee=employee_id)
+
+    context = _calendar_context(shifts, first)
+    context.update({
+        'cache_prefix': f'employee-{employee_id}',
+        'url_name': 'home:my_shifts',
+    })
+    return render(request, "home/calendar.html", context)
+
+
+@login_required
+def dashboard(request):
+    return render(request, "home/dashboard.html", {
+        'figures': owner_dashboard.get(_owner_id(request)),
+    })
+
+
+@login_required
+def weekly_roster(request, year, month, day):
+    """printable roster of the week of a day, for the owner and its staff
+
+    The roster is normally rendered ahead by the workers; the view only
+    hashes the week to find it, and answers 304 to a client holding it.
+    """
+    owner_id = request.role.scope_owner_id
+    if owner_id is None:
+        raise Http404
+    try:
+        requested = date(year, month, day)
+    except ValueError:
+        raise Http404
+    key = roster.render(owner_id, requested)
+    etag = f'"{key}"'
+    if request.headers.get('If-None-Match') == etag:
+        return HttpResponseNotModified()
+    response = FileResponse(
+        roster.open_roster(key), content_type='text/html; charset=utf-8')
+    response['ETag'] = etag
+    return response
+
+
+@login_required
+def search(request):
+    """autocomplete of the owner's employees and tasks, best match first"""
+    owner_id = _owner_id(request)
+    term = request.GET.get('q', '').strip()
+    return JsonResponse({
+        'employees': [
+            {'id': employee.pk, 'label': str(employee),
+             'email': employee.user.email}
+            for employee in owner_search.employees(owner_id, term)
+        ],
+        'tasks': [
+            {'id': task.pk, 'label': task.name}
+            for task in owner_search.tasks(owner_id, term)
+        ],
+    })
+
+
+@login_required
+def staffing_gaps(request):
+    """understaffed buckets of the owner's tasks over the coming days"""
+    owner_id = _owner_id(request)
+    today = timezone.localdate()
+    end = today + timedelta(days=settings.STAFFING_HORIZON_DAYS - 1)
+    with replicas.reporting():
+        gaps = demand.gaps(owner_id, today, end)
+    return JsonResponse({
+        'start': today,
+        'end': end,
+        'gaps': gaps,
+    })
+
+
+CHANGES_LIMIT = 1000
+
+
+def _employee_delta(entry, employee_id):
+    """delta of an entry as an employee sees it"""
+    delta = entry.as_delta()
+    if entry.entity == 'shift' and entry.operation == ChangeLog.UPDATE:
+        if entry.data.get('employee_id') != employee_id:
+            # handed to a colleague
+            delta['op'] = ChangeLog.DELETE
+        elif entry.previous_employee_id != employee_id:
+            # handed over by a colleague
+            delta['op'] = ChangeLog.CREATE
+    return delta
+
+
+@login_required
+def changes(request):
+    """compact deltas of the schedules, shifts and tasks since a sequence
+
+    Owners receive every change; employees receive the schedules and tasks
+    of their owner and only their own shifts: a shift handed to a
+    colleague is deleted for its previous employee and created for the
+    new one. Clients store `next` and pass it back as `since` until
+    `has_more` is false.
+    """
+    try:
+        since = int(request.GET.get('since', 0))
+        limit = min(int(request.GET.get('limit', CHANGES_LIMIT)),
+                    CHANGES_LIMIT)
+    except ValueError:
+        return HttpResponseBadRequest('since and limit must be integers')
+    if since < 0 or limit < 1:
+        return HttpResponseBadRequest(
+            'since must not be negative and limit must be positive')
+
+    role = request.role
+    if role.is_owner:
+        entries = ChangeLog.objects.since(role.owner_id, since)
+    elif role.is_employee:
+        # the employee of the shift before the entry
+        previous = ChangeLog.objects.filter(
+            owner_id=OuterRef('owner_id'),
+            entity='shift',
+            entity_id=OuterRef('entity_id'),
+            id__lt=OuterRef('id')
+        ).order_by('-id').values('data__employee_id')[:1]
+        entries = ChangeLog.objects.since(role.employer_id, since).annotate(
+            previous_employee_id=Subquery(previous)
+        ).filter(
+            ~Q(entity='shift')
+            | Q(data__employee_id=role.employee_id)
+            | Q(previous_employee_id=role.employee_id)
+        )
+    else:
+        raise Http404
+
+    page = list(entries[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    return JsonResponse({
+        'changes': [
+            _employee_delta(entry, role.employee_id) if role.is_employee
+            else entry.as_delta() for entry in page
+        ],
+        'next': page[-1].pk if page else since,
+        'has_more': has_more,
+    })
+
+
+def _request_data(shift_request, matches):
+    shift = shift_request.shift
+    return {
+        'id': shift_request.pk,
+        'kind': shift_request.kind,
+        'requested_by': shift_request.requested_by_id,
+        'shift': {
+            'id': shift.pk,
+            'date': shift.shift_date,
+            'start': shift.start_time,
+            'end': shift.end_time,
+        },
+        'matches': [match._asdict() for match in matches],
+    }
+
+
+@login_required
+def shift_requests(request):
+    """open cover and swap requests with their eligible colleagues
+
+    Owners see every open request; employees see their own and the ones
+    they can take, with only their own matches.
+    """
+    role = request.role
+    if role.is_owner:
+        requests = list(swaps.open_requests(role.owner_id))
+    elif role.is_employee:
+        requests = list(swaps.open_requests(role.employer_id))
+    else:
+        raise Http404
+    matches = swaps.match(requests)
+
+    if role.is_owner:
+        return JsonResponse({'requests': [
+            _request_data(shift_request, matches[shift_request.pk])
+            for shift_request in requests
+        ]})
+    mine, takeable = [], []
+    for shift_request in requests:
+        if shift_request.requested_by_id == role.employee_id:
+            mine.append(_request_data(
+                shift_request, matches[shift_request.pk]))
+            continue
+        own = [match for match in matches[shift_request.pk]
+               if match.employee_id == role.employee_id]
+        if own:
+            takeable.append(_request_data(shift_request, own))
+    return JsonResponse({'mine': mine, 'takeable': takeable})
+
+
+@login_required
+@require_POST
+def request_shift_change(request, shift_id):
+    """open a cover or swap request for one of the employee's shifts"""
+    if not request.role.is_employee:
+        raise Http404
+    shift = get_object_or_404(
+        Shift, pk=shift_id, employee_id=request.role.employee_id)
+    kind = request.POST.get('kind', ShiftRequest.COVER)
+    if kind not in (ShiftRequest.COVER, ShiftRequest.SWAP):
+        return HttpResponseBadRequest('kind must be cover or swap')
+    try:
+        shift_request = swaps.request_change(shift, kind)
+    except ValidationError as error:
+        return JsonResponse({'errors': error.messages}, status=409)
+    return JsonResponse({'id': shift_request.pk}, status=201)
+
+
+@login_required
+@require_POST
+def accept_shift_request(request, request_id):
+    """take the shift of a colleague's request, giving one back to swap"""
+    role = request.role
+    if not role.is_employee:
+        raise Http404
+    get_object_or_404(ShiftRequest, pk=request_id, owner_id=role.employer_id)
+    try:
+        shift_id = int(request.POST['shift']) \
+            if request.POST.get('shift') else None
+    except ValueError:
+        return HttpResponseBadRequest('shift must be an integer')
+    try:
+        swaps.accept(request_id, role.employee_id, shift_id)
+    except ValidationError as error:
+        return JsonResponse({'errors': error.messages}, status=409)
+    return JsonResponse({'id': request_id, 'status': ShiftRequest.ACCEPTED})
+
+
+def _attendance_event(item, role):
+    """unsaved AttendanceEvent of one posted item, ValueError if invalid"""
+    if not isinstance(item, dict):
+        raise ValueError('every event must be an object')
+    employee_id = item.get('employee', role.employee_id)
+    if role.is_employee and employee_id != role.employee_id:
+        raise ValueError('employees clock in only for themselves')
+    if not isinstance(employee_id, int):
+        raise ValueError('employee must be an integer')
+    kind = item.get('kind')
+    if kind not in (AttendanceEvent.IN, AttendanceEvent.OUT):
+        raise ValueError('kind must be in or out')
+    source = item.get('source', AttendanceEvent.BADGE)
+    if source not in (AttendanceEvent.BADGE, AttendanceEvent.MOBILE):
+        raise ValueError('source must be badge or mobile')
+    occurred = parse_datetime(str(item.get('at', '')))
+    if occurred is None:
+        raise ValueError('at must be a date and time')
+    if timezone.is_naive(occurred):
+        occurred = timezone.make_aware(occurred)
+    return AttendanceEvent(owner_id=role.scope_owner_id,
+                           employee_id=employee_id, kind=kind,
+                           occurred=occurred, source=source)
+
+
+@login_required
+@require_POST
+def attendance_events(request):
+    """take a batch of clock-in and clock-out events, written shortly
+
+    The body is a JSON list of {employee, kind, at, source}; owners post
+    the events of their badge readers, employees their own, employee
+    omitted.
+    """
+    role = request.role
+    if not (role.is_owner or role.is_employee):
+        raise Http404
+    try:
+        items = json.loads(request.body)
+    except ValueError:
+        return HttpResponseBadRequest('body must be JSON')
+    if not isinstance(items, list):
+        return HttpResponseBadRequest('body must be a list of events')
+    if len(items) > settings.ATTENDANCE_MAX_EVENTS:
+        return HttpResponseBadRequest(
+            f'at most {settings.ATTENDANCE_MAX_EVENTS} events per request')
+    try:
+        events = [_attendance_event(item, role) for item in items]
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    employee_ids = {event.employee_id for event in events}
+    if role.is_owner and Employee.objects.filter(
+            owner_id=role.owner_id, pk__in=employee_ids
+    ).count() != len(employee_ids):
+        return HttpResponseBadRequest('unknown employee')
+    try:
+        accepted = attendance.accept(events)
+    except attendance.BufferFull:
+        response = JsonResponse(
+            {'errors': ['events cannot be taken now, send them again']},
+            status=503)
+        response['Retry-After'] = str(settings.ATTENDANCE_FLUSH_SECONDS)
+        return response
+    return JsonResponse({'accepted': accepted}, status=202)